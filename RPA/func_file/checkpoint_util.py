@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+流程各阶段（方法）的检查点（uibot中直接调用方法时同样生效）：
+    enableCheckpoint：将流程模块中的阶段方法替换为检查点方法，阶段的输入未变化时直接读取上次的输出，不再执行
+    finishCheckpoint：恢复原方法，返回本次各阶段使用检查点的情况
+
+阶段的输入哈希包括：流程模块文件内容、相关配置（全局变量）、参数（df按内容，文件路径按文件内容，字典、列表逐项计算）
+目录结构：
+    检查点目录/阶段方法名/{输入哈希}.pkl：阶段的输出{"结果": 返回值, "参数": {参数位置: 执行后被修改的参数}, "文件": [输出的文件路径]}
+    检查点目录/文件指纹.json：{路径|大小|修改时间: 文件内容哈希}，文件未变化时无需重新计算内容哈希
+"""
+import hashlib
+import json
+import os
+import pickle
+from datetime import datetime
+from functools import wraps
+
+import pandas as pd
+
+# 已开启检查点的模块{id(模块globals): {"原方法": {方法名: 方法}, "检查点目录": 路径, "配置": [全局变量名],
+#                                    "强制执行": [方法名], "保留数量": 数量, "文件指纹": {}, "记录": []}}
+checkpointStateDict = {}
+
+
+# 计算文件内容的哈希值（按路径、大小、修改时间缓存）
+def getFileHash(state, filePath):
+    stat = os.stat(filePath)
+    fpKey = f"{os.path.abspath(filePath)}|{stat.st_size}|{stat.st_mtime_ns}"
+    if fpKey not in state["文件指纹"]:
+        sha1 = hashlib.sha1()
+        with open(filePath, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha1.update(block)
+        state["文件指纹"][fpKey] = sha1.hexdigest()
+    return state["文件指纹"][fpKey]
+
+
+# 将值的内容写入哈希对象
+def updateHash(state, sha1, value):
+    """
+    :param state: 检查点状态字典
+    :param sha1: hashlib的哈希对象
+    :param value: 参数值：df、Series按内容，已存在的文件路径按文件内容，字典、列表、元组、集合逐项计算
+    :return:
+    """
+    sha1.update(type(value).__name__.encode("utf-8"))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        sha1.update(repr(value.columns.tolist() if isinstance(value, pd.DataFrame) else value.name).encode("utf-8"))
+        sha1.update(repr(value.dtypes.tolist() if isinstance(value, pd.DataFrame) else value.dtype).encode("utf-8"))
+        try:
+            sha1.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+        except TypeError:
+            # 含列表等不可哈希的值
+            sha1.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            updateHash(state, sha1, key)
+            updateHash(state, sha1, item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            updateHash(state, sha1, item)
+    elif isinstance(value, (set, frozenset)):
+        for item in sorted(value, key=repr):
+            updateHash(state, sha1, item)
+    elif isinstance(value, str) and value and os.path.isfile(value):
+        sha1.update(f"{value}|{getFileHash(state, value)}".encode("utf-8"))
+    else:
+        sha1.update(repr(value).encode("utf-8"))
+
+
+# 计算值的哈希
+def getValueHash(state, value):
+    sha1 = hashlib.sha1()
+    updateHash(state, sha1, value)
+    return sha1.hexdigest()
+
+
+# 获取执行后可能被修改的参数位置（df、字典、列表），位置为参数序号或参数名
+def getMutableArgs(args, kwargs):
+    argDict = dict(enumerate(args))
+    argDict.update(kwargs)
+    return {key: value for key, value in argDict.items() if isinstance(value, (pd.DataFrame, dict, list))}
+
+
+# 将参数恢复为执行后的值（原对象上修改）
+def restoreArg(target, value):
+    if isinstance(target, dict):
+        target.clear()
+        target.update(value)
+    elif isinstance(target, list):
+        target[:] = value
+    else:
+        # df：删除原有的行、列后按列插入执行后的数据（插入第一列时同时设置索引）
+        target.drop(index=target.index, columns=target.columns, inplace=True)
+        for i, col in enumerate(value.columns):
+            target.insert(i, col, value.iloc[:, i], allow_duplicates=True)
+        target.index.name = value.index.name
+        target.columns.name = value.columns.name
+
+
+# 获取返回值中的文件路径
+def getResultFiles(result):
+    if isinstance(result, str):
+        return [result] if result and os.path.isfile(result) else []
+    if isinstance(result, (list, tuple)):
+        return [path for item in result for path in getResultFiles(item)]
+    if isinstance(result, dict):
+        return [path for item in result.values() for path in getResultFiles(item)]
+    return []
+
+
+# 读取阶段的检查点，不存在、读取失败或输出的文件已被删除时为None
+def readCheckpoint(checkpointPath):
+    if not os.path.exists(checkpointPath):
+        return None
+    try:
+        with open(checkpointPath, "rb") as f:
+            content = pickle.load(f)
+    except Exception:
+        return None
+    if not all(os.path.exists(path) for path in content["文件"]):
+        return None
+    return content
+
+
+# 写入阶段的检查点（先写临时文件再替换），并删除该阶段多余的旧检查点
+def writeCheckpoint(checkpointPath, content, keepNum):
+    tempPath = f"{checkpointPath}.{os.getpid()}.tmp"
+    with open(tempPath, "wb") as f:
+        pickle.dump(content, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tempPath, checkpointPath)
+    stageDir = os.path.dirname(checkpointPath)
+    pathList = [os.path.join(stageDir, name) for name in os.listdir(stageDir) if name.endswith(".pkl")]
+    for path in sorted(pathList, key=os.path.getmtime, reverse=True)[keepNum:]:
+        os.remove(path)
+
+
+# 生成阶段方法的检查点方法
+def wrapCheckpoint(state, moduleGlobals, stageName, func):
+    @wraps(func)
+    def checkpointFunc(*args, **kwargs):
+        record = {"阶段": stageName, "开始时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+        sha1 = hashlib.sha1()
+        updateHash(state, sha1, moduleGlobals.get("__file__", ""))
+        updateHash(state, sha1, {key: moduleGlobals.get(key) for key in state["配置"]})
+        updateHash(state, sha1, list(args))
+        updateHash(state, sha1, kwargs)
+        inputHash = sha1.hexdigest()
+        checkpointPath = os.path.join(state["检查点目录"], stageName, f"{inputHash[:16]}.pkl")
+        record["输入哈希"] = inputHash[:16]
+
+        content = None if stageName in state["强制执行"] else readCheckpoint(checkpointPath)
+        mutableArgs = getMutableArgs(args, kwargs)
+        if content is not None:
+            for key, value in content["参数"].items():
+                restoreArg(mutableArgs[key], value)
+            record["状态"] = "使用检查点"
+            state["记录"].append(record)
+            return content["结果"]
+
+        record["状态"] = "强制执行" if stageName in state["强制执行"] else "执行"
+        beforeHash = {key: getValueHash(state, value) for key, value in mutableArgs.items()}
+        result = func(*args, **kwargs)
+        # 执行中被修改的参数一并保存，使用检查点时同样修改
+        changedArgs = {key: value for key, value in mutableArgs.items() if getValueHash(state, value) != beforeHash[key]}
+        os.makedirs(os.path.dirname(checkpointPath), exist_ok=True)
+        writeCheckpoint(checkpointPath, {"结果": result, "参数": changedArgs, "文件": getResultFiles(result)},
+                        state["保留数量"])
+        record["被修改的参数"] = [str(key) for key in changedArgs]
+        state["记录"].append(record)
+        return result
+
+    checkpointFunc.originFunc = func
+    return checkpointFunc
+
+
+# 开启检查点：将模块中的阶段方法替换为检查点方法
+def enableCheckpoint(moduleGlobals, stageList, checkpointDir, configList=None, forceStageList=None, keepNum=3):
+    """
+    :param moduleGlobals: 流程模块的globals()
+    :param stageList: 使用检查点的方法名列表
+    :param checkpointDir: 检查点保存目录（如本次运行的结果目录下的检查点文件夹）
+    :param configList: 影响阶段输出的全局变量名列表，值变化时重新执行
+    :param forceStageList: 强制重新执行（不读取检查点）的方法名列表
+    :param keepNum: 每个阶段保留的检查点数量
+    :return:
+    """
+    if id(moduleGlobals) in checkpointStateDict:
+        finishCheckpoint(moduleGlobals)
+    if not os.path.exists(checkpointDir):
+        os.makedirs(checkpointDir)
+    fpPath = os.path.join(checkpointDir, "文件指纹.json")
+    fpDict = {}
+    if os.path.exists(fpPath):
+        with open(fpPath, "r", encoding="utf-8") as f:
+            fpDict = json.load(f)
+    state = {"原方法": {}, "检查点目录": checkpointDir, "配置": list(configList or []),
+             "强制执行": list(forceStageList or []), "保留数量": int(keepNum), "文件指纹": fpDict, "记录": []}
+    for stageName in stageList:
+        state["原方法"][stageName] = moduleGlobals[stageName]
+        moduleGlobals[stageName] = wrapCheckpoint(state, moduleGlobals, stageName, moduleGlobals[stageName])
+    checkpointStateDict[id(moduleGlobals)] = state
+
+
+# 结束检查点：恢复原方法，保存文件指纹
+def finishCheckpoint(moduleGlobals):
+    """
+    :param moduleGlobals: 流程模块的globals()
+    :return: 本次各阶段的执行记录[{"阶段", "开始时间", "输入哈希", "状态"}]，未开启检查点时为[]
+    """
+    state = checkpointStateDict.pop(id(moduleGlobals), None)
+    if state is None:
+        return []
+    moduleGlobals.update(state["原方法"])
+    # 只保留仍存在的文件的指纹
+    fpDict = {key: value for key, value in state["文件指纹"].items() if os.path.exists(key.rsplit("|", 2)[0])}
+    fpPath = os.path.join(state["检查点目录"], "文件指纹.json")
+    tempPath = f"{fpPath}.{os.getpid()}.tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        json.dump(fpDict, f, ensure_ascii=False)
+    os.replace(tempPath, fpPath)
+    return state["记录"]
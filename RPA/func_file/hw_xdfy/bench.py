@@ -0,0 +1,453 @@
+#!/usr/bin/python3
+# -*- coding: UTF-8 -*-
+"""
+下单费用流程（hw_xdfy）的模拟数据及性能基准测试（无需生产数据，linux下无Excel也可运行）：
+    genDataset：按合同数、每个合同的付款笔数、退款比例、授信比例生成模拟的毛利分析结果表、下单费用表、里程碑付款&调整台帐表、
+                授信付款外挂表、激励授信记录文件、超聚变付款外挂表、华为订单表、鲲泰订单跟踪表
+    runBenchmark：在模拟数据上运行下单费用流程，统计各阶段耗时并保存为json文件
+                  （initAnalyzeNoteText使用不打开Excel的方式，setStyle依赖Excel不执行）
+    compareBenchmark：对比两次基准测试结果，列出耗时增加超过阈值的阶段
+
+命令行用法：
+    python bench.py gen 数据目录 --contracts 200 --pays 4 --refund 0.1 --credit 0.05
+    python bench.py run 数据目录 结果目录 --repeat 3 --label 本次修改 [--branch-parallel]
+    python bench.py compare 基准结果.json 本次结果.json --threshold 0.2
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+import func
+import stage_util
+
+
+# 生成随机日期字符串（格式同Excel中读取的日期）
+def randDate(rnd, startDate, endDate):
+    """
+    :param rnd: random.Random对象
+    :param startDate: 开始日期，如2024-01-01
+    :param endDate: 结束日期（包含）
+    :return: 日期字符串，如2024-01-05 00:00:00
+    """
+    start = datetime.strptime(startDate, "%Y-%m-%d")
+    days = (datetime.strptime(endDate, "%Y-%m-%d") - start).days
+    return (start + timedelta(days=rnd.randint(0, days))).strftime("%Y-%m-%d 00:00:00")
+
+
+# 将金额随机拆分为多笔
+def splitAmount(rnd, amount, num):
+    """
+    :param rnd: random.Random对象
+    :param amount: 总金额
+    :param num: 拆分笔数
+    :return: 金额列表（保留两位小数）
+    """
+    weightList = [rnd.uniform(0.5, 1.5) for _ in range(num)]
+    amountList = [round(amount * w / sum(weightList), 2) for w in weightList]
+    amountList[-1] = round(amount - sum(amountList[:-1]), 2)
+    return amountList
+
+
+# 生成单个下单合同号的模拟数据
+def genContract(rnd, orderNum, kind, conf):
+    """
+    :param rnd: random.Random对象
+    :param orderNum: 下单合同号
+    :param kind: 数据类型（华为原厂、鲲泰、超聚变）
+    :param conf: 生成参数字典（同genDataset的参数）
+    :return: 字典{"毛利": [行字典], "下单费用": [行字典], "里程碑付款": [行], "授信付款": [行], "激励记录": [行],
+                  "超聚变付款": [行], "订单表": (账号, 运输方式), "鲲泰订单": 运输方式, "销售明细": 运输方式}
+    """
+    result = {"毛利": [], "下单费用": [], "里程碑付款": [], "授信付款": [], "激励记录": [], "超聚变付款": []}
+    simpleName = rnd.choice(list(func.companySimpleDict.keys()))
+    account = {v: k for k, v in func.accountCompanyDict.items()}[simpleName]
+    dept = rnd.choices(deptList, weights=deptWeightList)[0]
+    transport = rnd.choices(transportList, weights=transportWeightList)[0]
+    buyType = {"华为原厂": rnd.choice(["原厂下单", "服务"]), "鲲泰": "鲲泰", "超聚变": "超聚变"}[kind]
+    baseRow = {"项目名称": f"项目{orderNum[-6:]}", "客户名称": f"客户{rnd.randint(1, 500)}", "销售员": f"销售{rnd.randint(1, 80)}",
+               "销售员编码": f"S{rnd.randint(1, 80):05d}", "事业部": dept, "区域": rnd.choice(["华东", "华南", "华北", "西南"]),
+               "平台": rnd.choice(["政企", "运营商", "分销"]), "产品类别": rnd.choice(["服务器", "存储", "网络", "服务"]),
+               "产品线": rnd.choice(["计算", "数据存储", "数据通信"]), "市场类型": rnd.choice(["政府", "企业", "金融"])}
+
+    # 本期下单数据（毛利分析结果表）
+    orderList = []
+    for _ in range(conf["orderNum"]):
+        orderList.append({"开单日期": randDate(rnd, "2024-01-01", "2024-06-30"),
+                          "开单金额": round(rnd.uniform(1000, 200000), 2), "实际税率": rnd.choice([0.13, 0.13, 0.06, 0.09])})
+    orderList.sort(key=lambda x: x["开单日期"])
+    # 备注为空时由initAnalyzeNoteText通过华为订单表补充
+    noteText = "" if kind == "华为原厂" and rnd.random() < 0.2 else simpleName
+    for order in orderList:
+        result["毛利"].append(dict(baseRow, **{
+            "下单合同号": orderNum, "出具发票日": order["开单日期"], "成本总价": order["开单金额"], "实际税率": order["实际税率"],
+            "备注": noteText, "销售类型": "正常销售", "采购类型": buyType}))
+    # 不参与计算的数据（退货、成本为0）
+    if rnd.random() < 0.05:
+        result["毛利"].append(dict(result["毛利"][0], **{"销售类型": "退货", "成本总价": -orderList[0]["开单金额"]}))
+
+    # 历史数据（下单费用表）：已处理、未付款、剩余付款
+    historyFlag = rnd.random() < conf["historyRatio"]
+    lastPayDate = ""
+    historyPayList = []  # 里程碑付款表中已处理的付款[(收据编号, 付款日期, 付款金额)]
+    if historyFlag:
+        costRow = dict(baseRow, **{"供应商名称": func.companySimpleDict[simpleName], "下单合同号": orderNum,
+                                   "备注": "", "采购类型": buyType})
+        for i in range(rnd.randint(1, 2)):
+            orderDate = randDate(rnd, "2023-01-01", "2023-10-31")
+            payDate = (datetime.strptime(orderDate[:10], "%Y-%m-%d") - timedelta(days=rnd.randint(0, 30))).strftime(
+                "%Y-%m-%d 00:00:00")
+            amount = round(rnd.uniform(1000, 100000), 2)
+            rate = 0.13
+            receipt = f"R{orderNum[-8:]}H{i}" if kind == "华为原厂" else np.nan
+            result["下单费用"].append(dict(costRow, **{
+                "收据编号": receipt, "付款日期": payDate, "付款金额": func.new_round(amount * (1 + rate)),
+                "开单日期": orderDate, "开单金额": amount, "实际税率": rate,
+                "开单金额（含税）": func.new_round(amount * (1 + rate)), "核查": 0, "运输方式": transport}))
+            historyPayList.append((receipt, payDate, func.new_round(amount * (1 + rate))))
+            lastPayDate = max(lastPayDate, payDate)
+        if kind != "鲲泰" and rnd.random() < 0.3:
+            amount = round(rnd.uniform(1000, 50000), 2)
+            result["下单费用"].append(dict(costRow, **{
+                "付款日期": "未付款", "开单日期": randDate(rnd, "2023-11-01", "2023-12-15"), "开单金额": amount,
+                "实际税率": 0.13, "开单金额（含税）": func.new_round(amount * 1.13)}))
+        if kind != "鲲泰" and rnd.random() < 0.3:
+            payDate = randDate(rnd, "2023-12-16", "2023-12-31")
+            receipt = f"R{orderNum[-8:]}L" if kind == "华为原厂" else np.nan
+            amount = round(rnd.uniform(100, 20000), 2)
+            result["下单费用"].append({"下单合同号": orderNum, "收据编号": receipt, "付款日期": payDate,
+                                   "付款金额": amount, "备注": ""})
+            historyPayList.append((receipt, payDate, amount))
+            lastPayDate = max(lastPayDate, payDate)
+
+    # 授信、激励
+    creditFlag = kind != "鲲泰" and rnd.random() < conf["creditRatio"]
+    creditDate = randDate(rnd, "2024-03-01", "2024-05-31") if creditFlag else "9999-12-31"
+    incentiveAmount = round(rnd.uniform(100, 2000), 2) if kind != "鲲泰" and rnd.random() < conf["incentiveRatio"] else 0
+
+    # 本期付款：覆盖本期下单金额的70%~105%，每笔付款按退款比例追加退款
+    totalAmount = sum([o["开单金额"] * (1 + o["实际税率"]) for o in orderList]) * rnd.uniform(0.7, 1.05)
+    firstDate = orderList[0]["开单日期"][:10]
+    payList = []  # [(收据编号, 付款日期, 付款金额)]
+    for i, amount in enumerate(splitAmount(rnd, totalAmount, conf["payNum"])):
+        payDate = randDate(rnd, (datetime.strptime(firstDate, "%Y-%m-%d") - timedelta(days=20)).strftime("%Y-%m-%d"),
+                           "2024-09-30")
+        receipt = f"R{orderNum[-8:]}{i:03d}"
+        payList.append((receipt, payDate, amount))
+        if rnd.random() < conf["refundRatio"]:
+            refundAmount = -round(amount * rnd.choice([1, rnd.uniform(0.1, 0.9)]), 2)
+            refundDate = randDate(rnd, payDate[:10], "2024-09-30")
+            # 一半退款冲减原收据，一半为单独的退款收据
+            payList.append((receipt if rnd.random() < 0.5 else f"{receipt}T", refundDate, refundAmount))
+    payList.sort(key=lambda x: x[1])
+
+    if kind == "华为原厂":
+        for receipt, payDate, amount in sorted(historyPayList, key=lambda x: x[1]) + payList:
+            if pd.isna(receipt):
+                continue
+            result["里程碑付款"].append([orderNum, receipt, payDate, amount])
+        if creditFlag:
+            creditAmount = round(totalAmount * rnd.uniform(0.3, 0.8), 2)
+            result["授信付款"].append({"合同号": orderNum, "付款时间": creditDate, "付款金额": creditAmount})
+            result["授信付款"].append({"合同号": orderNum, "付款时间": randDate(rnd, creditDate[:10], "2024-09-30"),
+                                   "付款金额": round(totalAmount - creditAmount, 2)})
+        if creditFlag or incentiveAmount:
+            result["激励记录"].append({"下单合同号": orderNum, "使用激励金额": str(incentiveAmount),
+                                   "是否使用授信": "Y" if creditFlag else "N"})
+        result["订单表"] = (account, transport)
+    elif kind == "超聚变":
+        for i, (_, payDate, amount) in enumerate(payList):
+            result["超聚变付款"].append({"华为合同号": orderNum, "付款时间": payDate, "付款金额": amount,
+                                    "更改授信时间": np.nan,
+                                    "激励金额": incentiveAmount if i == 0 and incentiveAmount else np.nan})
+        if creditFlag:
+            result["超聚变付款"].append({"华为合同号": orderNum, "付款时间": "授信", "付款金额": round(totalAmount * 0.5, 2),
+                                    "更改授信时间": creditDate, "激励金额": np.nan})
+        result["销售明细"] = transport
+    else:
+        result["鲲泰订单"] = transport
+    return result
+
+
+# 写入里程碑付款&调整台帐表（前8行为表头说明，第5行C列为合同号，第9行为列名）
+def writePayTable(filePath, orderNum, payRowList):
+    """
+    :param filePath: 文件路径
+    :param orderNum: 下单合同号
+    :param payRowList: 付款行列表[[华为合同号, 对应收据, 处理日期, 收据调整金额]]
+    :return:
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("里程碑付款&调整台帐")
+    ws.append(["里程碑付款&调整台帐"])
+    for i in range(2, 9):
+        ws.append(["", "合同号：", orderNum] if i == 5 else [""])
+    ws.append(["序号", "华为合同号", "对应收据", "处理日期", "收据调整金额", "调整类型"])
+    lastDate = ""
+    for i, (orderNum_, receipt, payDate, amount) in enumerate(payRowList):
+        # 同一日期的连续行只在第一行填写处理日期（流程中向下填充）
+        ws.append([i + 1, orderNum_, receipt, payDate if payDate != lastDate else None, amount,
+                   "退款" if amount < 0 else "付款"])
+        lastDate = payDate
+    wb.save(filePath)
+
+
+# 生成模拟数据集
+def genDataset(dataDir, contractNum=200, payNum=4, refundRatio=0.1, creditRatio=0.05, orderNum=3, historyRatio=0.5,
+               incentiveRatio=0.05, seed=0):
+    """
+    :param dataDir: 数据集保存目录
+    :param contractNum: 合同数（华为原厂、鲲泰、超聚变按6:2:2分配）
+    :param payNum: 每个合同本期的付款笔数
+    :param refundRatio: 付款中追加退款的比例
+    :param creditRatio: 使用授信的合同比例
+    :param orderNum: 每个合同本期的下单笔数
+    :param historyRatio: 下单费用表中已有历史数据的合同比例
+    :param incentiveRatio: 使用激励的合同比例
+    :param seed: 随机数种子（相同参数及种子生成的数据相同）
+    :return: 数据集说明json文件路径
+    """
+    conf = {"contractNum": int(contractNum), "payNum": int(payNum), "refundRatio": float(refundRatio),
+            "creditRatio": float(creditRatio), "orderNum": int(orderNum), "historyRatio": float(historyRatio),
+            "incentiveRatio": float(incentiveRatio), "seed": int(seed)}
+    rnd = random.Random(conf["seed"])
+    payDir = os.path.join(dataDir, "里程碑付款&调整台帐表")
+    if not os.path.exists(payDir):
+        os.makedirs(payDir)
+
+    allDict = {"毛利": [], "下单费用": [], "授信付款": [], "激励记录": [], "超聚变付款": []}
+    orderTableDict, ktOrderDict, saleDetailDict = {}, {}, {}
+    for i in range(conf["contractNum"]):
+        kind = rnd.choices(["华为原厂", "鲲泰", "超聚变"], weights=[6, 2, 2])[0]
+        orderNum_ = {"华为原厂": f"1Y01{i:09d}F", "鲲泰": f"KT{i:010d}", "超聚变": f"XF{i:010d}"}[kind]
+        result = genContract(rnd, orderNum_, kind, conf)
+        for key in allDict:
+            allDict[key].extend(result[key])
+        if kind == "华为原厂":
+            account, transport = result["订单表"]
+            orderTableDict.setdefault(account, []).append((orderNum_, transport))
+            writePayTable(os.path.join(payDir, f"{account}_{orderNum_}_里程碑付款&调整台帐表.xlsx"), orderNum_,
+                          result["里程碑付款"])
+        elif kind == "超聚变":
+            saleDetailDict[orderNum_] = result["销售明细"]
+        else:
+            ktOrderDict[orderNum_] = result["鲲泰订单"]
+
+    # 毛利分析结果表：列位置同实际报表（H下单合同号、O成本总价、U备注、V销售类型、W采购类型）
+    analyzePath = os.path.join(dataDir, "毛利核算.xlsx")
+    df_analyze = pd.DataFrame(allDict["毛利"]).rename(columns={"产品类别": "产品"}).reindex(columns=analyzeCol)
+    df_saleDetail = pd.DataFrame({"下单合同号": list(saleDetailDict.keys()), "运输方式": list(saleDetailDict.values())})
+    with pd.ExcelWriter(analyzePath) as writer:
+        df_analyze.to_excel(writer, sheet_name="账面毛利分析", index=False)
+        df_saleDetail.to_excel(writer, sheet_name="销售明细", index=False)
+
+    orderCostPath = os.path.join(dataDir, "下单费用.xlsx")
+    pd.DataFrame(allDict["下单费用"]).reindex(columns=func.resultColadd).to_excel(
+        orderCostPath, sheet_name="下单费用", index=False)
+    creditPayPath = os.path.join(dataDir, "授信付款外挂表.xlsx")
+    pd.DataFrame(allDict["授信付款"], columns=["合同号", "付款时间", "付款金额"]).to_excel(creditPayPath, index=False)
+    incentiveRecordPath = os.path.join(dataDir, "激励、授信记录文件.xlsx")
+    pd.DataFrame(allDict["激励记录"], columns=["下单合同号", "使用激励金额", "是否使用授信"]).to_excel(
+        incentiveRecordPath, index=False)
+    cjbPayPath = os.path.join(dataDir, "超聚变付款表.xlsx")
+    pd.DataFrame(allDict["超聚变付款"], columns=["华为合同号", "付款时间", "付款金额", "更改授信时间", "激励金额"]).to_excel(
+        cjbPayPath, index=False)
+    ktOrderPath = os.path.join(dataDir, "鲲泰订单跟踪表.xlsx")
+    pd.DataFrame({"供货方编号": list(ktOrderDict.keys()), "运输方式": list(ktOrderDict.values())}).to_excel(
+        ktOrderPath, index=False)
+    for account, rowList in orderTableDict.items():
+        pd.DataFrame(rowList, columns=["华为订单号", "运输方式"]).to_excel(
+            os.path.join(dataDir, f"{account}_华为订单表.xlsx"), index=False)
+
+    datasetPath = os.path.join(dataDir, "数据集说明.json")
+    with open(datasetPath, "w", encoding="utf-8") as f:
+        json.dump({"参数": conf, "生成时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                   "数据量": {"毛利分析行数": len(df_analyze), "下单费用行数": len(allDict["下单费用"]),
+                           "里程碑付款表数": sum([len(i) for i in orderTableDict.values()]),
+                           "授信付款行数": len(allDict["授信付款"]), "超聚变付款行数": len(allDict["超聚变付款"])}},
+                  f, ensure_ascii=False, indent=2)
+    return datasetPath
+
+
+# 在数据集上运行一次下单费用流程（不打开Excel），返回下单费用结果表路径
+def runPipeline(dataDir, saveDir):
+    """
+    :param dataDir: 数据集目录
+    :param saveDir: 结果保存目录
+    :return: 下单费用结果表路径
+    """
+    # 里程碑付款表文件名为“账号_下单合同号_里程碑付款&调整台帐表.xlsx”
+    orderFileDict = {}
+    for path in glob.glob(os.path.join(dataDir, "里程碑付款&调整台帐表", "*里程碑付款&调整台帐表*.xlsx")):
+        orderFileDict[os.path.basename(path).split("_")[1]] = path
+    orderFileList = glob.glob(os.path.join(dataDir, "*订单表*.xlsx"))
+    analyzePath = os.path.join(dataDir, "毛利核算.xlsx")
+    orderCostPath = os.path.join(dataDir, "下单费用.xlsx")
+
+    analyzePath = func.initAnalyzeNoteText(orderFileList, analyzePath)
+    initResultDict = func.getOriginOrderData(analyzePath, orderCostPath)
+    initOrderDict = func.initDownLoadOrder(initResultDict["下单df"])
+    incentiveDict = func.readIncentiveRecord(os.path.join(dataDir, "激励、授信记录文件.xlsx"))
+    df_credit = func.validCreditData(incentiveDict, os.path.join(dataDir, "授信付款外挂表.xlsx"), saveDir)
+    branchResultDict = func.calDataBranches(initResultDict, initOrderDict, df_credit, incentiveDict, orderFileDict,
+                                            orderFileList, os.path.join(dataDir, "鲲泰订单跟踪表.xlsx"),
+                                            os.path.join(dataDir, "超聚变付款表.xlsx"), analyzePath)
+    df_originFinal, orderList_YC = branchResultDict["华为原厂"]
+    df_ktFinal = branchResultDict["鲲泰"]
+    df_cjbFinal, orderList_CJB = branchResultDict["超聚变"]
+    # setStyle依赖Excel（xlwings），基准测试中不执行
+    return func.finishOperateAndSave(initResultDict["已处理df"], df_originFinal, df_ktFinal, df_cjbFinal,
+                                     initResultDict["剩余付款df"], orderList_YC, orderList_CJB, saveDir, analyzePath,
+                                     orderCostPath)
+
+
+# 运行基准测试，将各阶段耗时保存为json文件
+def runBenchmark(dataDir, saveDir, repeat=1, label="", stageList=None):
+    """
+    :param dataDir: 数据集目录（genDataset生成）
+    :param saveDir: 结果保存目录
+    :param repeat: 重复运行次数（各阶段耗时取中位数）
+    :param label: 本次测试的标识（如分支名、修改说明）
+    :param stageList: 统计的阶段方法名列表，为None时使用benchStageList
+    :return: 基准测试结果json文件路径
+    """
+    stageList = stageList or benchStageList
+    reportDir = os.path.join(saveDir, "阶段统计")
+    # 不打开Excel处理备注；每次运行前删除上次生成的预处理备注文件，保证每次运行的处理量相同
+    func.headlessNoteFlag = True
+    notePath = os.path.join(dataDir, "毛利核算_预处理备注.xlsx")
+    runList = []
+    for i in range(int(repeat)):
+        if os.path.exists(notePath):
+            os.remove(notePath)
+        func.clearLookup()
+        stage_util.enableStageProfile(vars(func), stageList, reportDir)
+        try:
+            resultPath = runPipeline(dataDir, saveDir)
+        finally:
+            with open(stage_util.finishStageProfile(vars(func)), "r", encoding="utf-8") as f:
+                recordList = json.load(f)["阶段"]
+        runList.append({"结果文件": resultPath, "阶段": recordList})
+
+    # 汇总各阶段耗时（同一次运行中多次调用的阶段耗时相加）
+    stageDict = {}
+    for run in runList:
+        runStage = {}
+        for record in run["阶段"]:
+            stage = runStage.setdefault(record["阶段"], {"耗时(秒)": 0, "CPU时间(秒)": 0, "输入行数": 0, "输出行数": 0})
+            for key in stage:
+                stage[key] += record.get(key) or 0
+        for stageName, stage in runStage.items():
+            stageDict.setdefault(stageName, []).append(stage)
+    summaryDict = {}
+    for stageName in stageList:
+        if stageName not in stageDict:
+            continue
+        timeList = [i["耗时(秒)"] for i in stageDict[stageName]]
+        summaryDict[stageName] = {"耗时中位数(秒)": round(float(np.median(timeList)), 3),
+                                  "耗时最小值(秒)": round(min(timeList), 3),
+                                  "CPU时间中位数(秒)": round(float(np.median([i["CPU时间(秒)"] for i in stageDict[stageName]])), 3),
+                                  "输入行数": stageDict[stageName][0]["输入行数"],
+                                  "输出行数": stageDict[stageName][0]["输出行数"]}
+
+    with open(os.path.join(dataDir, "数据集说明.json"), "r", encoding="utf-8") as f:
+        datasetDict = json.load(f)
+    startTime = datetime.now().strftime("%Y%m%d%H%M%S")
+    benchPath = os.path.join(saveDir, f"基准测试_{label}_{startTime}.json" if label else f"基准测试_{startTime}.json")
+    with open(benchPath, "w", encoding="utf-8") as f:
+        json.dump({"标识": label, "时间": startTime, "数据集": datasetDict,
+                   "环境": {"python": sys.version.split()[0], "pandas": pd.__version__, "numpy": np.__version__,
+                          "系统": platform.platform(), "cpu数": os.cpu_count()},
+                   "配置": {key: getattr(func, key) for key in configKeyList},
+                   "重复次数": int(repeat), "阶段": summaryDict, "运行记录": runList},
+                  f, ensure_ascii=False, indent=2)
+    return benchPath
+
+
+# 对比两次基准测试结果，返回各阶段的耗时变化
+def compareBenchmark(basePath, newPath, threshold=0.2):
+    """
+    :param basePath: 基准结果json文件路径
+    :param newPath: 本次结果json文件路径
+    :param threshold: 耗时增加比例超过该值时标记为退化
+    :return: 列表[{"阶段", "基准耗时(秒)", "本次耗时(秒)", "变化比例", "是否退化"}]
+    """
+    with open(basePath, "r", encoding="utf-8") as f:
+        baseDict = json.load(f)
+    with open(newPath, "r", encoding="utf-8") as f:
+        newDict = json.load(f)
+    if baseDict["数据集"]["参数"] != newDict["数据集"]["参数"]:
+        print("注意：两次测试使用的数据集参数不同，耗时对比仅供参考")
+    compareList = []
+    for stageName, newStage in newDict["阶段"].items():
+        if stageName not in baseDict["阶段"]:
+            continue
+        baseTime, newTime = baseDict["阶段"][stageName]["耗时中位数(秒)"], newStage["耗时中位数(秒)"]
+        ratio = (newTime - baseTime) / baseTime if baseTime else 0
+        compareList.append({"阶段": stageName, "基准耗时(秒)": baseTime, "本次耗时(秒)": newTime,
+                            "变化比例": round(ratio, 3), "是否退化": ratio > float(threshold)})
+    return compareList
+
+
+"""
+deptList：模拟数据的事业部（含未配置的事业部），deptWeightList为对应的权重
+transportList：模拟数据的运输方式（含贷款利率未配置的运输方式），transportWeightList为对应的权重
+analyzeCol：模拟毛利分析结果表“账面毛利分析”sheet的列（列位置同实际报表）
+benchStageList：基准测试统计的阶段方法名列表（分支并行处理时，子进程中的阶段不统计，只统计calDataBranches）
+configKeyList：基准测试结果中记录的流程配置（全局变量名）
+"""
+deptList = ["北区", "南区", "超聚变及商业分销", "新业务", "服务事业部", "其他"]
+deptWeightList = [30, 30, 15, 10, 12, 3]
+transportList = ["自提", "汽运", "空运", "海运"]
+transportWeightList = [40, 45, 13, 2]
+analyzeCol = ["项目名称", "客户名称", "销售员", "销售员编码", "事业部", "区域", "平台", "下单合同号", "出具发票日", "产品",
+              "产品线", "实际税率", "市场类型", "数量", "成本总价", "收入", "毛利", "毛利率", "销售订单号", "物料编码", "备注",
+              "销售类型", "采购类型"]
+benchStageList = ["getOriginOrderData", "calDataBranches", "calDataStep_YC", "calDataStep_KT", "calDataStep_CJB", "finishOperateAndSave"]
+configKeyList = ["vecAllocateFlag", "parallelFlag", "parallelWorkers", "payCacheDir", "ledgerDbPath", "headlessNoteFlag",
+                 "branchParallelFlag"]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="下单费用流程模拟数据及性能基准测试")
+    subParsers = parser.add_subparsers(dest="command", required=True)
+    genParser = subParsers.add_parser("gen", help="生成模拟数据集")
+    genParser.add_argument("dataDir")
+    genParser.add_argument("--contracts", type=int, default=200, help="合同数")
+    genParser.add_argument("--pays", type=int, default=4, help="每个合同的付款笔数")
+    genParser.add_argument("--refund", type=float, default=0.1, help="退款比例")
+    genParser.add_argument("--credit", type=float, default=0.05, help="授信比例")
+    genParser.add_argument("--orders", type=int, default=3, help="每个合同的下单笔数")
+    genParser.add_argument("--seed", type=int, default=0)
+    runParser = subParsers.add_parser("run", help="运行基准测试")
+    runParser.add_argument("dataDir")
+    runParser.add_argument("saveDir")
+    runParser.add_argument("--repeat", type=int, default=1)
+    runParser.add_argument("--label", default="")
+    runParser.add_argument("--branch-parallel", action="store_true", help="华为原厂、鲲泰、超聚变分支同时处理")
+    compareParser = subParsers.add_parser("compare", help="对比两次基准测试结果")
+    compareParser.add_argument("basePath")
+    compareParser.add_argument("newPath")
+    compareParser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.command == "gen":
+        print(genDataset(args.dataDir, args.contracts, args.pays, args.refund, args.credit, args.orders, seed=args.seed))
+    elif args.command == "run":
+        if not os.path.exists(args.saveDir):
+            os.makedirs(args.saveDir)
+        func.setBranchParallelConfig(args.branch_parallel)
+        benchPath = runBenchmark(args.dataDir, args.saveDir, args.repeat, args.label)
+        with open(benchPath, "r", encoding="utf-8") as f:
+            print(json.dumps(json.load(f)["阶段"], ensure_ascii=False, indent=2))
+        print(benchPath)
+    else:
+        for item in compareBenchmark(args.basePath, args.newPath, args.threshold):
+            print(("【退化】" if item["是否退化"] else "") + json.dumps(item, ensure_ascii=False))
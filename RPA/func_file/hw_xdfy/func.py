@@ -5,26 +5,109 @@
 import calendar
 import gc
 import glob
+import hashlib
+import json
 import logging.config
+import multiprocessing
 import os
 import re
+import shutil
+import sqlite3
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from functools import wraps
 
 import numpy as np
+import openpyxl
 import pandas as pd
 import xlwings as xw
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
 from openpyxl.utils import get_column_letter
 
+# 共用的数值处理方法（num_util）、阶段统计方法（stage_util）、xlsx处理方法（xlsx_util）、本地报表库（report_store），均在RPA/func_file目录下
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import checkpoint_util  # noqa: E402
+from num_util import new_round  # noqa: E402
+from partition_util import buildPartIndex, getPart, getPartKeys  # noqa: E402
+import report_store  # noqa: E402
+import stage_util  # noqa: E402
+from xlsx_util import readFirstRows, updateSheetCells, writeStyledSheet  # noqa: E402
+
 
 def judFile(filePath, qryOrderNum):
-    df = pd.read_excel(filePath, dtype=str, header=None)
-    orderNum = df.iloc[4, 2].strip()
+    orderNum = readPayTableOrderNum(filePath)
+    if orderNum is None:
+        raise Exception(f"里程碑付款表中未读取到下单合同号（C5单元格）：{filePath}")
     if orderNum != qryOrderNum:
         os.remove(filePath)
         raise Exception(f"需要下载{qryOrderNum}的里程碑付款表，但实际为{orderNum}")
 
 
+# 读取“里程碑付款&调整台帐表”中的下单合同号（C5单元格，只读取前5行），单元格为空时为None
+def readPayTableOrderNum(filePath):
+    rowList = readFirstRows(filePath, 5)
+    value = rowList[4][2] if len(rowList) >= 5 and len(rowList[4]) >= 3 else None
+    return None if value is None else str(value).strip()
+
+
+# 校验单个“里程碑付款&调整台帐表”（文件名为“账号_下单合同号_里程碑付款&调整台帐表.xlsx”）
+def validatePayFile(filePath):
+    """
+    :param filePath: 文件路径
+    :return: 校验结果{"路径", "文件名合同号", "实际合同号", "状态": 有效/不一致/损坏, "异常信息"}
+    """
+    nameParts = os.path.basename(filePath).split("_")
+    result = {"路径": filePath, "文件名合同号": nameParts[1] if len(nameParts) > 2 else "", "实际合同号": "",
+              "状态": "有效", "异常信息": ""}
+    try:
+        orderNum = readPayTableOrderNum(filePath)
+    except Exception as e:
+        result.update({"状态": "损坏", "异常信息": f"{type(e).__name__}: {e}"})
+        return result
+    if orderNum is None:
+        result.update({"状态": "损坏", "异常信息": "未读取到下单合同号（C5单元格）"})
+    elif orderNum != result["文件名合同号"]:
+        result.update({"实际合同号": orderNum, "状态": "不一致"})
+    else:
+        result["实际合同号"] = orderNum
+    return result
+
+
+# 批量校验文件夹中的“里程碑付款&调整台帐表”（多进程），生成校验清单
+def validatePayFileDir(fileDir, workers=0, manifestPath=""):
+    """
+    :param fileDir: 里程碑付款&调整台帐表所在文件夹
+    :param workers: 进程数，为0时同parallelWorkers，<0时为CPU核数（文件较少时不使用多进程）
+    :param manifestPath: 校验清单json保存路径，为空时不保存
+    :return: 校验清单{"有效": {下单合同号: 路径}, "不一致": [校验结果], "损坏": [校验结果]}，
+             同一下单合同号有多个有效文件时取修改时间最新的文件
+    """
+    pathList = sorted(getSameFormatFile(fileDir, "里程碑付款&调整台帐表"))
+    workers = workers or parallelWorkers
+    workers = workers if workers > 0 else os.cpu_count()
+    if workers <= 1 or len(pathList) < validateParallelMinNum:
+        resultList = [validatePayFile(path) for path in pathList]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            resultList = list(executor.map(validatePayFile, pathList, chunksize=max(len(pathList) // (workers * 4), 1)))
+
+    manifest = {"有效": {}, "不一致": [], "损坏": []}
+    for result in resultList:
+        if result["状态"] != "有效":
+            manifest[result["状态"]].append(result)
+            continue
+        orderNum, path = result["实际合同号"], result["路径"]
+        if orderNum not in manifest["有效"] or os.path.getmtime(path) > os.path.getmtime(manifest["有效"][orderNum]):
+            manifest["有效"][orderNum] = path
+    if logger and (manifest["不一致"] or manifest["损坏"]):
+        logger.warning(f"里程碑付款表校验：不一致{len(manifest['不一致'])}个，损坏{len(manifest['损坏'])}个")
+    if manifestPath:
+        writeCacheFile(manifestPath, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return manifest
+
+
 # 初始化日志
 def initWriteLog(rootDir):
     """
@@ -87,6 +170,37 @@ def logfun(func):
     return logfunStep
 
 
+# 开启各阶段耗时、内存、数据量统计（uibot中调用，开启后直接调用各阶段方法即可统计）
+def enableStageProfile(reportDir, profileStage=""):
+    """
+    :param reportDir: 统计结果保存目录
+    :param profileStage: 需要生成cProfile性能分析文件的阶段方法名，为空时不生成
+    :return:
+    """
+    stage_util.enableStageProfile(globals(), profileStageList, reportDir, profileStage)
+
+
+# 结束统计，返回统计结果json文件路径
+def finishStageProfile():
+    return stage_util.finishStageProfile(globals())
+
+
+# 开启阶段检查点（uibot中调用，开启后直接调用各阶段方法即可：输入未变化的阶段直接读取上次的输出，不再执行）
+def enableCheckpoint(checkpointDir, forceStageList=None):
+    """
+    :param checkpointDir: 检查点保存目录（如本次运行的结果目录下的检查点文件夹）
+    :param forceStageList: 强制重新执行的阶段方法名列表，如["calDataStep_YC"]
+    :return:
+    """
+    checkpoint_util.enableCheckpoint(globals(), checkpointStageList, checkpointDir, checkpointConfigList,
+                                     forceStageList, checkpointKeepNum)
+
+
+# 结束检查点，返回本次各阶段的执行记录（与enableStageProfile同时使用时，按开启的相反顺序结束）
+def finishCheckpoint():
+    return checkpoint_util.finishCheckpoint(globals())
+
+
 # 读取配置文件生成配置字典
 def getConfigDict(baseConfPath):
     """
@@ -131,9 +245,7 @@ def getQryTimeRange(saveDir, keyWord, timeFmtStr, user=""):
         1.日期表示文件保存的截止日期，物料移动汇总会下载截止到昨天的数据，再次下载时无需下载重复日期的数据
         2.下载时的日期即为2021/07/29-昨天
         """
-        fileList = glob.glob(f"{saveDir}\\*{keyWord}_*.xlsx")
-        filePath = fileList[0]
-        lastDateStr = re.search(".*_(\d{8}).xlsx", os.path.basename(filePath)).group(1)
+        filePath, lastDateStr = getReportLastDate(saveDir, keyWord)
         # lastDate： 下载的起始日期
         lastDate = datetime.strptime(lastDateStr, "%Y%m%d") + timedelta(days=1)
         dayDelta = (yesterday - lastDate).days
@@ -151,9 +263,7 @@ def getQryTimeRange(saveDir, keyWord, timeFmtStr, user=""):
         1.日期表示文件保存的截止日期，预提表会下载本年的数据，当年数据会重新下载
         2.下载时的日期即为2021/01/01-当天
         """
-        fileList = glob.glob(f"{saveDir}\\*{keyWord}_*.xlsx")
-        filePath = fileList[0]
-        lastDateStr = re.search(".*_(\d{8}).xlsx", os.path.basename(filePath)).group(1)
+        filePath, lastDateStr = getReportLastDate(saveDir, keyWord)
         lastDate = datetime.strptime(lastDateStr, "%Y%m%d")
         startDate = datetime(lastDate.year, 1, 1)
         endDate = nowday
@@ -190,7 +300,12 @@ def getQryTimeRange(saveDir, keyWord, timeFmtStr, user=""):
         # return filePath, startDate, endDate, lastFlag
 
         """ 变更：订单表不再是不断汇总的形式，每次直接下载近2年的表"""
-        startDay = datetime(year=nowday.year - 2, month=1, day=1)
+        startDay = getOrderStartDay()
+        # 增量模式：该账号已有本地订单表时，只下载最近同步日期前orderOverlapDays天至今的数据（再通过mergeOrderTable合并）
+        storeMeta = readOrderStoreMeta(user) if orderStoreDir and user else None
+        if storeMeta:
+            lastSyncDay = datetime.strptime(storeMeta["最新同步日期"], "%Y-%m-%d")
+            startDay = max(startDay, lastSyncDay - timedelta(days=orderOverlapDays))
         startDate = startDay.strftime(timeFmtStr)
         endDate = nowday.strftime(timeFmtStr)
         return startDate, endDate
@@ -216,6 +331,9 @@ def getQryTimeRange(saveDir, keyWord, timeFmtStr, user=""):
         for filePath in fileList:
             matchObj = re.search("(\d{4})业绩表（(\d{8})）.xlsx", os.path.basename(filePath))
             existYear.append(matchObj.group(1))
+            # 业绩表清单中记录该年份数据已是最新的，无需重新下载
+            if yjManifestDir and isYjYearCurrent(user, matchObj.group(1)):
+                continue
             # 如果非当年数据不是由后几年下载的，则需要重新下载且删除
             if matchObj.group(1) != str(nowday.year):
                 if matchObj.group(1) >= matchObj.group(2)[:4]:
@@ -238,11 +356,9 @@ def getQryTimeRange(saveDir, keyWord, timeFmtStr, user=""):
         2.下载时的日期即为2021/07/28-当天凌晨1点
         """
         timeSuffix = " 01:00:00"
-        fileList = glob.glob(f"{saveDir}\\{user}_{keyWord}_*.xlsx")
-        filePath = fileList[0]
-        matchObj = re.search("订单全字段报表_(\d{8}).xlsx", os.path.basename(filePath))
+        filePath, lastDateStr = getReportLastDate(saveDir, keyWord, user)
 
-        lastDate = datetime.strptime(matchObj.group(1), "%Y%m%d")
+        lastDate = datetime.strptime(lastDateStr, "%Y%m%d")
         dayDelta = (nowday - lastDate).days
         if dayDelta <= 0:
             lastFlag = True
@@ -254,22 +370,40 @@ def getQryTimeRange(saveDir, keyWord, timeFmtStr, user=""):
         return filePath, startDate, endDate, lastFlag
 
 
-# 四舍五入
-def new_round(_float, _len=2):
+# 获取报表汇总表路径及其截止日期（启用本地报表库且库中有该报表时，截止日期取库中已覆盖的最新日期）
+def getReportLastDate(saveDir, keyWord, user=""):
+    """
+    :param saveDir: 汇总表保存的路径
+    :param keyWord: 报表类型（文件名关键词），如物料移动明细汇总、预提表、订单全字段报表
+    :param user: 账号（不区分账号的报表为""）
+    :return: 汇总表路径（启用本地报表库且无汇总表时为""），截止日期%Y%m%d
+    """
+    fileList = glob.glob(f"{saveDir}\\{user}_{keyWord}_*.xlsx" if user else f"{saveDir}\\*{keyWord}_*.xlsx")
+    lastDateStr = report_store.getLastCoverDate(reportStoreDir, keyWord, user) if reportStoreDir else ""
+    if lastDateStr:
+        return (fileList[0] if fileList else ""), lastDateStr
+    filePath = fileList[0]
+    lastDateStr = re.search(f"{keyWord}_(\\d{{8}}).xlsx", os.path.basename(filePath)).group(1)
+    return filePath, lastDateStr
+
+
+# 将下载的报表写入本地报表库，返回库中该报表已覆盖的最新日期（uibot中下载物料移动明细汇总、预提表后调用）
+def saveReportToStore(keyWord, user, filePath, startDate, endDate):
     """
-    :param _float: 需要四舍五入的数
-    :param _len: 保留小数点位数
-    :return: 四舍五入结果
+    :param keyWord: 报表类型，如物料移动明细汇总、预提表、订单全字段报表
+    :param user: 账号（不区分账号的报表为""）
+    :param filePath: 下载的报表路径
+    :param startDate: 下载的开始日期（getQryTimeRange返回的日期，格式不限）
+    :param endDate: 下载的截止日期
+    :return: 已覆盖的最新日期%Y%m%d
     """
-    if isinstance(_float, float):
-        if str(_float)[::-1].find('.') <= _len:
-            return _float
-        if str(_float)[-1] == '5':
-            return round(float(str(_float)[:-1] + '6'), _len)
-        else:
-            return round(_float, _len)
-    else:
-        return round(_float, _len)
+    startDate = pd.to_datetime(startDate).strftime("%Y%m%d")
+    endDate = pd.to_datetime(endDate).strftime("%Y%m%d")
+    df_report = pd.read_excel(filePath, dtype=str)
+    # 预提表每次重新下载当年数据，替换库中当年的原有数据
+    report_store.appendReport(reportStoreDir, keyWord, user, datetime.now().strftime("%Y%m%d"), df_report,
+                              startDate, endDate, replaceCover=keyWord == "预提表")
+    return report_store.getLastCoverDate(reportStoreDir, keyWord, user)
 
 
 # 获取目录下相同文件格式的文件列表
@@ -283,6 +417,356 @@ def getSameFormatFile(rootDir, keyWord):
     return fileList
 
 
+# 获取订单表的下载开始日期（近2年：前年的1月1日），本地订单表中该日期之前的订单在合并时清理
+def getOrderStartDay():
+    return datetime(year=datetime.now().year - 2, month=1, day=1)
+
+
+# 获取某账号本地订单表的数据文件、说明文件路径
+def getOrderStorePath(user):
+    """
+    :param user: 下载华为订单表的账号
+    :return: 数据文件路径（账号_订单表.pkl，文件名规则同下载的订单表，账号在第一个“_”前），说明文件路径
+    """
+    return os.path.join(orderStoreDir, f"{user}_订单表.pkl"), os.path.join(orderStoreDir, f"{user}_订单表.json")
+
+
+# 读取某账号本地订单表的说明，不存在时返回None
+def readOrderStoreMeta(user):
+    metaPath = getOrderStorePath(user)[1]
+    if not os.path.exists(metaPath):
+        return None
+    with open(metaPath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# 将下载的订单表按华为订单号合并到该账号的本地订单表中（同一订单号的数据整体替换），返回本次新增或变化的订单号列表
+def mergeOrderTable(user, downloadPathList):
+    """
+    本地订单表中每行记录“变化时间”（该订单号的数据最近一次新增或变化的时间），用于getChangedOrders获取变化的订单号；
+    合并时清理下载范围（getOrderStartDay）之前的订单
+    :param user: 下载华为订单表的账号
+    :param downloadPathList: 本次下载的订单表路径列表（无数据未下载时传[]）
+    :return: 本次新增或变化的华为订单号列表
+    """
+    if not os.path.exists(orderStoreDir):
+        os.makedirs(orderStoreDir)
+    storePath, metaPath = getOrderStorePath(user)
+    df_store = pd.read_pickle(storePath) if os.path.exists(storePath) else None
+    df_add = pd.concat([pd.DataFrame()] + [pd.read_excel(path, dtype=str).assign(文件序号=i) for i, path in
+                                           enumerate(downloadPathList)])
+    nowStr = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    changedOrder = []
+    addRowNum = df_add.shape[0]
+
+    if not df_add.empty:
+        dataCols = [i for i in df_add.columns if i != "文件序号"]
+        if df_store is not None and [i for i in df_store.columns if i != "变化时间"] != dataCols:
+            raise Exception(f"本地订单表{storePath}和下载的订单表列不同")
+        df_add = df_add.loc[~df_add[orderKeyCol].isna()]
+        # 多个下载文件中的同一订单号以最后一个文件为准
+        df_add = df_add.loc[df_add["文件序号"] == df_add.groupby(orderKeyCol)["文件序号"].transform("max"), dataCols]
+
+        # 比较订单号的数据（同一订单号的所有行）是否变化
+        def getKeyHash(df_):
+            rowHash = pd.util.hash_pandas_object(df_[dataCols].fillna(""), index=False)
+            return rowHash.groupby(df_[orderKeyCol].values).agg(lambda x: hash(tuple(sorted(x))))
+
+        if df_store is None:
+            changedOrder = list(df_add[orderKeyCol].unique())
+        else:
+            addHash = getKeyHash(df_add)
+            oldHash = getKeyHash(df_store.loc[df_store[orderKeyCol].isin(addHash.index)])
+            changedOrder = list(addHash.index[addHash.values != oldHash.reindex(addHash.index).values])
+        df_add = df_add.loc[df_add[orderKeyCol].isin(changedOrder)].assign(变化时间=nowStr)
+        df_store = df_add if df_store is None else pd.concat(
+            [df_store.loc[~df_store[orderKeyCol].isin(changedOrder)], df_add], ignore_index=True)
+
+    # 清理订单日期（orderDateCol为空时为变化时间，变化时间不早于订单日期）在下载范围之前的订单，日期为空的保留
+    pruneNum = 0
+    if df_store is not None and not df_store.empty:
+        dateCol = orderDateCol or "变化时间"
+        if dateCol not in df_store.columns:
+            raise Exception(f"本地订单表{storePath}中没有日期列{dateCol}")
+        orderDate = pd.to_datetime(df_store[dateCol], errors="coerce").groupby(df_store[orderKeyCol].values).transform("max")
+        pruneMask = (orderDate < getOrderStartDay()).values
+        pruneNum = df_store.loc[pruneMask, orderKeyCol].nunique()
+        df_store = df_store.loc[~pruneMask]
+    if changedOrder or pruneNum:
+        writeCacheFile(storePath, df_store.reset_index(drop=True))
+
+    # 更新同步日期（无数据未下载时也更新，下次从该日期继续增量下载）
+    meta = readOrderStoreMeta(user) or {"账号": user, "同步记录": []}
+    meta["最新同步日期"] = nowStr[:10]
+    meta["行数"] = 0 if df_store is None else len(df_store)
+    meta["同步记录"] = (meta["同步记录"] + [{"时间": nowStr, "下载行数": addRowNum,
+                                          "变化订单数": len(changedOrder), "清理订单数": pruneNum}])[-orderSyncLogNum:]
+    writeCacheFile(metaPath, json.dumps(meta, ensure_ascii=False, indent=2))
+    return changedOrder
+
+
+# 获取已同步到本地的订单表路径列表（可直接作为HWOrderPathList使用）
+def getOrderStorePathList():
+    return sorted(glob.glob(os.path.join(orderStoreDir, "*_订单表.pkl")))
+
+
+# 获取某时间之后新增或变化的华为订单号（所有账号）
+def getChangedOrders(sinceTime):
+    """
+    :param sinceTime: 时间（datetime或%Y-%m-%d %H:%M:%S格式的字符串）
+    :return: 华为订单号集合
+    """
+    if isinstance(sinceTime, datetime):
+        sinceTime = sinceTime.strftime("%Y-%m-%d %H:%M:%S")
+    changedSet = set()
+    for path in getOrderStorePathList():
+        df_store = pd.read_pickle(path)
+        changedSet.update(df_store.loc[df_store["变化时间"] > sinceTime, orderKeyCol])
+    return changedSet
+
+
+# 获取某账号业绩表清单的路径、某年份业绩表行指纹文件的路径
+def getYjManifestPath(user, year=""):
+    """
+    :param user: 下载华为业绩表的账号
+    :param year: 年份，为空时只返回清单路径
+    :return: 清单路径（账号_业绩表清单.json），行指纹文件路径（账号_年份业绩表指纹.pkl）
+    """
+    return os.path.join(yjManifestDir, f"{user}_业绩表清单.json"), os.path.join(yjManifestDir,
+                                                                            f"{user}_{year}业绩表指纹.pkl")
+
+
+# 读取某账号的业绩表清单{年份: {"文件", "校验日期", "变化日期", "行数", "内容哈希", "连续未变化次数"}}
+def readYjManifest(user):
+    manifestPath = getYjManifestPath(user)[0]
+    if not os.path.exists(manifestPath):
+        return {}
+    with open(manifestPath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# 计算df每行数据的指纹（16位十六进制字符串）
+def getRowFingerprint(df_):
+    rowHash = pd.util.hash_pandas_object(df_.fillna(""), index=False)
+    return rowHash.map("{:016x}".format)
+
+
+# 判断某账号某年份的业绩表是否已是最新（无需重新下载）
+def isYjYearCurrent(user, year):
+    """
+    1.非当年数据：在该年之后下载校验过即为最新
+    2.当年数据：当天已下载校验过即为最新（同原规则每天重新下载，未变化时由checkYjDownload标记后续步骤无需处理）
+    :param user: 下载华为业绩表的账号
+    :param year: 年份字符串
+    :return: 是否已是最新
+    """
+    record = readYjManifest(user).get(str(year))
+    if record is None:
+        return False
+    nowday = datetime.now()
+    if str(year) != str(nowday.year):
+        return record["校验日期"][:4] > str(year)
+    return record["校验日期"] >= nowday.strftime("%Y%m%d")
+
+
+# 将下载的业绩表与清单中记录的行指纹对比，更新清单，返回是否变化及新增或变化的行
+def diffYjFile(user, year, filePath):
+    """
+    :param user: 下载华为业绩表的账号
+    :param year: 年份字符串
+    :param filePath: 本次下载的业绩表路径
+    :return: 字典{"是否变化": 是否变化（首次记录时为True）, "变化行df": 新增或变化的行, "删除行数": 本次下载中不存在的原有行数}
+    """
+    if not os.path.exists(yjManifestDir):
+        os.makedirs(yjManifestDir)
+    year = str(year)
+    manifestPath, fingerprintPath = getYjManifestPath(user, year)
+    manifest = readYjManifest(user)
+    record = manifest.get(year)
+    df_yj = pd.read_excel(filePath, dtype=str)
+    fingerprint = getRowFingerprint(df_yj)
+
+    if record is None or not os.path.exists(fingerprintPath):
+        changeMask = pd.Series(True, index=df_yj.index)
+        removeNum = 0
+    else:
+        # 按指纹及其出现次数对比（相同的行出现多次时逐个对应）
+        oldFingerprint = pd.read_pickle(fingerprintPath)["行指纹"]
+        newKey = fingerprint + "_" + fingerprint.groupby(fingerprint).cumcount().astype(str)
+        oldKey = oldFingerprint + "_" + oldFingerprint.groupby(oldFingerprint).cumcount().astype(str)
+        changeMask = ~newKey.isin(oldKey)
+        removeNum = int((~oldKey.isin(newKey)).sum())
+    changeFlag = bool(changeMask.any()) or removeNum > 0 or record is None
+
+    todayStr = datetime.now().strftime("%Y%m%d")
+    manifest[year] = {"文件": os.path.basename(filePath), "校验日期": todayStr,
+                      "变化日期": todayStr if changeFlag else record["变化日期"], "行数": len(df_yj),
+                      "内容哈希": hashlib.sha1("".join(sorted(fingerprint)).encode("utf-8")).hexdigest(),
+                      "连续未变化次数": 0 if changeFlag else record["连续未变化次数"] + 1}
+    writeCacheFile(fingerprintPath, fingerprint.to_frame("行指纹"))
+    writeCacheFile(manifestPath, json.dumps(manifest, ensure_ascii=False, indent=2))
+    return {"是否变化": changeFlag, "变化行df": df_yj.loc[changeMask], "删除行数": removeNum}
+
+
+# 校验下载的业绩表（uibot中每下载一个年份的业绩表后调用），返回后续步骤需要处理的文件，未变化的年份无需处理
+def checkYjDownload(user, year, filePath):
+    """
+    :param user: 下载华为业绩表的账号
+    :param year: 年份字符串
+    :param filePath: 本次下载的业绩表路径
+    :return: 字典{"是否变化": 是否变化, "处理路径": 后续步骤需要处理的文件路径（未变化时为""；首次记录或有删除的行时为下载的
+             业绩表；否则为只包含新增或变化的行的文件：清单文件夹/账号_年份业绩表变化行.xlsx）, "变化行数", "删除行数"}
+    """
+    if not yjManifestDir:
+        return {"是否变化": True, "处理路径": filePath, "变化行数": None, "删除行数": None}
+    firstFlag = str(year) not in readYjManifest(user)
+    diffResult = diffYjFile(user, year, filePath)
+    processPath = ""
+    if firstFlag or diffResult["删除行数"] > 0:
+        processPath = filePath
+    elif diffResult["是否变化"]:
+        processPath = os.path.join(yjManifestDir, f"{user}_{year}业绩表变化行.xlsx")
+        diffResult["变化行df"].to_excel(processPath, index=False)
+    return {"是否变化": diffResult["是否变化"], "处理路径": processPath, "变化行数": len(diffResult["变化行df"]),
+            "删除行数": diffResult["删除行数"]}
+
+
+# 读取订单表的指定列（本地订单表为pkl文件，下载的订单表为xlsx文件）
+def readOrderTable(path, usecols, fillValue=None):
+    """
+    :param path: 订单表路径
+    :param usecols: 需要读取的列名列表
+    :param fillValue: 文件中已有列的空值填充值，为None时不填充
+    :return: 订单表df（文件中没有的列补充为nan，同原合并各订单表的结果）
+    """
+    if path.endswith(".pkl"):
+        df_ = pd.read_pickle(path)
+        df_ = df_[[col for col in usecols if col in df_.columns]]
+    else:
+        df_ = pd.read_excel(path, dtype=str, usecols=lambda col: col in usecols)
+    if fillValue is not None:
+        df_ = df_.fillna(fillValue)
+    return df_.reindex(columns=usecols)
+
+
+# 注册查找表的数据来源（仅记录来源，首次查找时才读取文件）
+def registerLookupSource(sourceName, pathList, loadFunc, mapNameList):
+    """
+    :param sourceName: 数据来源名称
+    :param pathList: 数据来源的文件路径列表（路径或修改时间变化时重新读取）
+    :param loadFunc: 读取方法，返回{映射名: {键: 值}}
+    :param mapNameList: 该来源提供的映射名列表
+    :return:
+    """
+    sourceKey = tuple([(path, os.path.getmtime(path)) for path in pathList])
+    source = lookupSourceDict.get(sourceName)
+    if source is None or source[0] != sourceKey:
+        lookupSourceDict[sourceName] = [sourceKey, loadFunc, None]
+    for mapName in mapNameList:
+        lookupMapSource[mapName] = sourceName
+        lookupStatDict.setdefault(mapName, {"命中": 0, "未命中": 0})
+
+
+# 获取映射字典（首次使用时读取数据来源，已读取的来源超出数量上限时释放最久未使用的）
+def getLookupDict(mapName):
+    sourceName = lookupMapSource[mapName]
+    # 移到末尾，lookupSourceDict的顺序即为最近使用顺序
+    source = lookupSourceDict[sourceName] = lookupSourceDict.pop(sourceName)
+    if source[2] is None:
+        source[2] = source[1]()
+        trimLookupSource()
+    return source[2][mapName]
+
+
+# 释放最久未使用的已读取来源的映射字典（只保留来源标识和读取方法，再次查找时重新读取）
+def trimLookupSource():
+    if lookupSourceMaxNum <= 0:
+        return
+    loadedList = [sourceName for sourceName, source in lookupSourceDict.items() if source[2] is not None]
+    for sourceName in loadedList[:max(len(loadedList) - lookupSourceMaxNum, 0)]:
+        lookupSourceDict[sourceName][2] = None
+
+
+# 查找映射值，并记录命中、未命中次数
+def lookupValue(mapName, key, default=""):
+    """
+    :param mapName: 映射名
+    :param key: 单个键或键Series
+    :param default: 未找到时的默认值
+    :return: 单个值或值Series
+    """
+    mapDict = getLookupDict(mapName)
+    if not isinstance(key, pd.Series):
+        hit = key in mapDict
+        lookupStatDict[mapName]["命中" if hit else "未命中"] += 1
+        return mapDict[key] if hit else default
+    hitMask = key.isin(mapDict.keys())
+    hitNum = int(hitMask.sum())
+    lookupStatDict[mapName]["命中"] += hitNum
+    lookupStatDict[mapName]["未命中"] += len(key) - hitNum
+    valueSe = key.map(mapDict).astype(object)
+    valueSe[~hitMask] = default
+    return valueSe
+
+
+# 获取查找表的命中、未命中次数
+def getLookupStat():
+    return {mapName: dict(stat) for mapName, stat in lookupStatDict.items()}
+
+
+# 释放已读取的查找表
+def clearLookup():
+    lookupSourceDict.clear()
+    lookupMapSource.clear()
+    lookupStatDict.clear()
+
+
+# 读取多个文件中的键、值两列，返回字典{键: 值}（后面文件的数据覆盖前面的）
+def readColumnDict(pathList, keyCol, valueCol, sheetName=0, fillValue=None):
+    mapDict = {}
+    for path in pathList:
+        df_ = pd.read_excel(path, sheet_name=sheetName, dtype=str, usecols=[keyCol, valueCol])
+        if fillValue is not None:
+            df_ = df_.fillna(fillValue)
+        mapDict.update(zip(df_[keyCol], df_[valueCol]))
+    return mapDict
+
+
+# 读取华为订单表，返回{"订单运输方式": {华为订单号: 运输方式}, "订单公司": {华为订单号: 公司简称}}
+def readHWOrderLookup(HWOrderPathList):
+    transportDict, companyOrderDict = {}, {}
+    for path in HWOrderPathList:
+        df_ = readOrderTable(path, ["华为订单号", "运输方式"], fillValue="")
+        nameFlag = os.path.basename(path).split("_")[0]
+        if nameFlag in accountCompanyDict:
+            # 同一账号有多个订单表时以最后一个为准
+            companyOrderDict[accountCompanyDict[nameFlag]] = df_["华为订单号"].tolist()
+        transportDict.update(zip(df_["华为订单号"], df_["运输方式"]))
+    # 同一订单号在多个账号中时，优先级为：合神、北神、城投
+    companyDict = {}
+    for company in ["城投", "北神", "合神"]:
+        companyDict.update(dict.fromkeys(companyOrderDict.get(company, []), company))
+    return {"订单运输方式": transportDict, "订单公司": companyDict}
+
+
+# 注册华为订单表的查找表
+def registerHWOrderLookup(HWOrderPathList):
+    registerLookupSource("华为订单表", HWOrderPathList, lambda: readHWOrderLookup(HWOrderPathList),
+                         ["订单运输方式", "订单公司"])
+
+
+# 注册毛利分析结果表“销售明细”sheet的查找表（超聚变运输方式）
+def registerSaleDetailLookup(analyzePath):
+    registerLookupSource("销售明细", [analyzePath], lambda: {
+        "超聚变运输方式": readColumnDict([analyzePath], "下单合同号", "运输方式", sheetName="销售明细")}, ["超聚变运输方式"])
+
+
+# 注册鲲泰订单跟踪表的查找表（鲲泰运输方式）
+def registerKTOrderLookup(ktOrderPath):
+    registerLookupSource("鲲泰订单跟踪表", [ktOrderPath], lambda: {
+        "鲲泰运输方式": readColumnDict([ktOrderPath], "供货方编号", "运输方式")}, ["鲲泰运输方式"])
+
+
 # 预处理毛利结果表的“备注”列（通过订单表补充“备注”列）
 def initAnalyzeNoteText(HWOrderPathList, analyzePath):
     """
@@ -294,20 +778,19 @@ def initAnalyzeNoteText(HWOrderPathList, analyzePath):
     resltPath = os.path.join(os.path.dirname(analyzePath),
                              os.path.basename(analyzePath).replace(".xlsx", "_预处理备注.xlsx"))
     if os.path.exists(resltPath):
+        # 订单表增量模式：预处理后订单表有新增或变化的合同号，只对这些合同号重新补充备注
+        if orderStoreDir and headlessNoteFlag:
+            changedSet = getChangedOrders(datetime.fromtimestamp(os.path.getmtime(resltPath)))
+            if changedSet:
+                registerHWOrderLookup(HWOrderPathList)
+                tempPath = resltPath.replace(".xlsx", "_临时.xlsx")
+                initAnalyzeNoteTextHeadless(resltPath, tempPath, changedSet)
+                os.replace(tempPath, resltPath)
         return resltPath
-    # 读取华为订单表，获取“合神”、“北神”、“城投”的下单合同号列表
-    hs, bs, ct = [], [], []
-    for path in HWOrderPathList:
-        df_ = pd.read_excel(path, dtype=str)
-        nameFlag = os.path.basename(path).split("_")[0]
-        if nameFlag == "13544480167":
-            ct = df_["华为订单号"].tolist()
-        elif nameFlag == "hfszsm":
-            hs = df_["华为订单号"].tolist()
-        elif nameFlag == "szshbj":
-            bs = df_["华为订单号"].tolist()
-        else:
-            pass
+    # 华为订单表的查找表，获取下单合同号对应的“合神”、“北神”、“城投”
+    registerHWOrderLookup(HWOrderPathList)
+    if headlessNoteFlag:
+        return initAnalyzeNoteTextHeadless(analyzePath, resltPath)
 
     app = xw.App(visible=True, add_book=False)
     # app.display_alerts = False
@@ -330,8 +813,7 @@ def initAnalyzeNoteText(HWOrderPathList, analyzePath):
         # 补充符合条件但备注为空的单元格
         if amount > 0 and saleType == "正常销售" and orderNum.startswith("1Y") \
                 and buyType in ['服务', '原厂下单'] and not noteTextFlag:
-            ws[
-                f"U{row}"].value = "合神" if orderNum in hs else "北神" if orderNum in bs else "城投" if orderNum in ct else ""
+            ws[f"U{row}"].value = lookupValue("订单公司", orderNum, "")
 
     wb.save(resltPath)
     wb.close()
@@ -339,6 +821,32 @@ def initAnalyzeNoteText(HWOrderPathList, analyzePath):
     return resltPath
 
 
+# 不打开Excel，批量计算“备注”列后只写回U列（规则同initAnalyzeNoteText）
+def initAnalyzeNoteTextHeadless(analyzePath, resltPath, orderSet=None):
+    """
+    :param analyzePath: 毛利分析结果表
+    :param resltPath: 预处理备注后的结果表路径
+    :param orderSet: 只处理这些下单合同号，为None时处理全部
+    :return: 预处理备注后的结果表路径
+    """
+    # 读取H（下单合同号）~W（采购类型）列的值
+    wb = openpyxl.load_workbook(analyzePath, read_only=True, data_only=True)
+    rowList = list(wb["账面毛利分析"].iter_rows(min_row=2, min_col=8, max_col=23, values_only=True))
+    wb.close()
+    df_ = pd.DataFrame(rowList, columns=[get_column_letter(i) for i in range(8, 24)], dtype=object)
+    df_.index = range(2, len(df_) + 2)
+
+    # 补充符合条件但备注不为"合神"、"北神"、"城投"的单元格（下单合同号为空的是空行）
+    orderNum = df_["H"]
+    noteMask = (~orderNum.isna()) & (pd.to_numeric(df_["O"], errors="coerce") > 0) & (df_["V"] == "正常销售") & (
+        orderNum.astype(str).str.startswith("1Y")) & (df_["W"].isin(['服务', '原厂下单'])) & (
+        ~df_["U"].isin(companySimpleDict.keys()))
+    if orderSet is not None:
+        noteMask &= orderNum.isin(orderSet)
+    noteSe = lookupValue("订单公司", orderNum[noteMask], "")
+    return updateSheetCells(analyzePath, resltPath, "账面毛利分析", {row: {"U": note} for row, note in noteSe.items()})
+
+
 # 合并华为订单全字段报表
 def updateAllFieldFile(addfilePath, finalPath, dateFlag):
     """
@@ -347,6 +855,8 @@ def updateAllFieldFile(addfilePath, finalPath, dateFlag):
     :param dateFlag: 文件名的更新日期 %Y-%m-%d %H:%M:%S
     :return: 返回华为订单全字段报表汇总表路径
     """
+    if reportStoreDir:
+        return updateAllFieldStore(addfilePath, finalPath, dateFlag)
     # 华为订单全字段报表在指定日期内有数据（无数据不下载，addfilePath为None）
     if addfilePath:
         # 初始化App
@@ -389,6 +899,52 @@ def updateAllFieldFile(addfilePath, finalPath, dateFlag):
     return newFilePath
 
 
+# 合并华为订单全字段报表（本地报表库模式：不打开Excel，将下载表写入本地报表库，reportExportFlag为True时导出汇总表）
+def updateAllFieldStore(addfilePath, finalPath, dateFlag):
+    """
+    :param addfilePath: 读取未处理的华为订单全字段报表
+    :param finalPath: 华为订单全字段报表汇总表路径（库中无该账号数据时，先将该汇总表导入库中）
+    :param dateFlag: 文件名的更新日期 %Y-%m-%d %H:%M:%S
+    :return: 返回华为订单全字段报表汇总表路径（reportExportFlag为False时不导出，返回原汇总表路径，无原汇总表时为""）
+    """
+    keyWord = "订单全字段报表"
+    fileUser = os.path.basename(finalPath).split("_")[0]
+    endDate = dateFlag.replace("-", "")[:8]
+    coverDate = report_store.getLastCoverDate(reportStoreDir, keyWord, fileUser)
+    if not coverDate and os.path.exists(finalPath):
+        coverDate = re.search(f"{keyWord}_(\\d{{8}}).xlsx", os.path.basename(finalPath)).group(1)
+        # 原汇总表的数据覆盖范围为截止日期之前的全部日期
+        report_store.appendReport(reportStoreDir, keyWord, fileUser, coverDate, pd.read_excel(finalPath, dtype=str),
+                                  "00000000", coverDate)
+    # 下载的起始日期：截止日期之前已覆盖的最新日期（同一天重复运行时为上次运行的起始日期，替换上次写入的分区）
+    lastDate = report_store.getLastCoverDate(reportStoreDir, keyWord, fileUser, beforeDate=endDate)
+
+    # 华为订单全字段报表在指定日期内有数据（无数据不下载，addfilePath为None）
+    partList = [p for p in report_store.readManifest(reportStoreDir, keyWord) if p["账号"] == fileUser]
+    if addfilePath:
+        df_add = pd.read_excel(addfilePath, dtype=str)
+        if partList and partList[-1]["列"] != [str(i) for i in df_add.columns]:
+            raise Exception(f"本地报表库中{fileUser}的{keyWord}和下载表{addfilePath}列不同")
+        # 覆盖范围与原分区重叠时（如同一天重复运行）替换原分区
+        report_store.appendReport(reportStoreDir, keyWord, fileUser, datetime.now().strftime("%Y%m%d"), df_add,
+                                  lastDate or endDate, endDate, replaceCover=True)
+    elif coverDate < endDate:
+        # 无数据时写入空分区记录已覆盖的日期（已覆盖至截止日期时不替换原分区）
+        df_add = pd.DataFrame(columns=partList[-1]["列"] if partList else [])
+        report_store.appendReport(reportStoreDir, keyWord, fileUser, datetime.now().strftime("%Y%m%d"), df_add,
+                                  lastDate or endDate, endDate, replaceCover=True)
+
+    if not reportExportFlag:
+        return finalPath if os.path.exists(finalPath) else ""
+    # 导出汇总表（文件名同原规则），删除原汇总表
+    newFilePath = os.path.join(os.path.dirname(finalPath), f"{fileUser}_{keyWord}_{endDate}.xlsx")
+    report_store.exportReport(reportStoreDir, keyWord, newFilePath, account=fileUser)
+    if os.path.exists(finalPath) and os.path.abspath(finalPath) != os.path.abspath(newFilePath):
+        os.remove(finalPath)
+    gc.collect()
+    return newFilePath
+
+
 # 获取“激励、授信记录文件”路径，若不存在则进行创建
 def getIncentiveRecordPath(inputPath):
     """
@@ -454,6 +1010,138 @@ def setRemark(series, creditDict):
         return ""
 
 
+# 按分段列对多个df统一编码段号（按首次出现顺序），segCol为None时全部数据为第0段
+def getSegmentCodes(dfList, segCol):
+    """
+    :param dfList: 需要编码的df列表
+    :param segCol: 分段列名
+    :return: 各df的段号数组列表，段数
+    """
+    sizeList = [df.shape[0] for df in dfList]
+    if segCol is None:
+        segCodes = np.zeros(sum(sizeList), dtype=int)
+    else:
+        segKey = pd.concat([df[segCol] for df in dfList], ignore_index=True).fillna("")
+        segCodes = pd.factorize(segKey)[0]
+    segNum = int(segCodes.max()) + 1 if segCodes.size else 0
+    return np.split(segCodes, np.cumsum(sizeList)[:-1]), segNum
+
+
+# 单段退款核销（逐笔处理，用于金额非精确到分的数据）
+def netRefundSegment(posList, negList):
+    """
+    :param posList: 正数付款金额列表，按付款日期升序
+    :param negList: 退款金额列表（负数），按付款日期升序
+    :return: 核销后的正数付款金额列表，正数付款是否被完全核销的列表，未核销完的退款金额列表（0表示已核销完）
+    """
+    posLeft, posClear, negLeft = list(posList), [False] * len(posList), []
+    j = 0
+    for amount in negList:
+        amount_n = amount * -1
+        while j < len(posLeft):
+            amount_p = posLeft[j]
+            if amount_p == 0:
+                j += 1
+                continue
+            # 付款金额>退款金额，将该笔退款清空，并扣除对应的付款金额
+            if amount_p > amount_n:
+                posLeft[j] = new_round(amount_p - amount_n)
+                negLeft.append(0.0)
+                break
+            # 付款金额<=退款金额，扣除部分退款，对应的付款金额清0
+            amount_n = new_round(amount_n - amount_p)
+            posLeft[j] = 0
+            posClear[j] = True
+            j += 1
+        else:
+            # 匹配所有付款数据后仍有剩余退款
+            negLeft.append(amount_n * -1 if amount_n > 0 else 0.0)
+    return posLeft, posClear, negLeft
+
+
+# 退款核销内核：按付款日期由远到近，用正数付款核销退款（可一次处理多个下单合同号）
+def netRefundArrays(posAmt, negAmt, posSeg=None, negSeg=None):
+    """
+    :param posAmt: 正数付款金额数组，段内按付款日期升序
+    :param negAmt: 退款金额数组（负数），段内按付款日期升序
+    :param posSeg: 正数付款的段号数组（按段号升序排列），为None时全部为一段
+    :param negSeg: 退款的段号数组（按段号升序排列），为None时全部为一段
+    :return: 字典{"付款余额": 核销后的正数付款金额数组, "完全核销": 正数付款是否被完全核销的数组,
+                 "退款余额": 未核销完的退款金额数组（0表示已核销完）}
+    """
+    posAmt, negAmt = np.asarray(posAmt, dtype=float), np.asarray(negAmt, dtype=float)
+    posSeg = np.zeros(posAmt.size, dtype=int) if posSeg is None else np.asarray(posSeg, dtype=int)
+    negSeg = np.zeros(negAmt.size, dtype=int) if negSeg is None else np.asarray(negSeg, dtype=int)
+    segNum = int(max(posSeg.max(initial=-1), negSeg.max(initial=-1))) + 1
+    segRange = np.arange(segNum)
+
+    # 金额均精确到分的段，按"分"用整数累计和计算（结果与逐笔new_round一致）；其余段逐笔处理
+    with np.errstate(invalid="ignore"):
+        posCent, negCent = np.round(posAmt * 100), np.round(negAmt * -100)
+        posExact, negExact = posCent / 100 == posAmt, negCent / 100 == -negAmt
+    segExact = np.ones(segNum, dtype=bool)
+    segExact[posSeg[~posExact]] = False
+    segExact[negSeg[~negExact]] = False
+    posCent = np.where(posExact, posCent, 0).astype(np.int64)
+    negCent = np.where(negExact, negCent, 0).astype(np.int64)
+
+    # 每段的累计付款、累计退款
+    posCum, negCum = np.cumsum(posCent), np.cumsum(negCent)
+    posStart, posEnd = np.searchsorted(posSeg, segRange), np.searchsorted(posSeg, segRange, side="right")
+    negStart, negEnd = np.searchsorted(negSeg, segRange), np.searchsorted(negSeg, segRange, side="right")
+    posBase, negBase = np.concatenate([[0], posCum]), np.concatenate([[0], negCum])
+    posTotal, negTotal = posBase[posEnd] - posBase[posStart], negBase[negEnd] - negBase[negStart]
+    posCumSeg, negCumSeg = posCum - posBase[posStart][posSeg], negCum - negBase[negStart][negSeg]
+    # 每段被核销的总金额
+    usedTotal = np.minimum(posTotal, negTotal)
+
+    # 正数付款：累计金额不超过核销总额的被完全核销，跨过核销总额的那笔扣除部分金额
+    posUsed = usedTotal[posSeg]
+    posClear = posCumSeg <= posUsed
+    posTouch = posCumSeg - posCent < posUsed
+    posLeft = np.where(posClear, 0.0, np.where(posTouch, (posCumSeg - posUsed) / 100, posAmt))
+    # 退款：累计退款超过该段付款总额的部分为剩余退款
+    negPrev = np.maximum(negCumSeg - negCent, posTotal[negSeg])
+    negLeftCent = np.maximum(negCumSeg - negPrev, 0)
+    negLeft = np.where(negLeftCent == negCent, negAmt, negLeftCent / -100)
+    negLeft = np.where(negLeftCent == 0, 0.0, negLeft)
+
+    # 非精确到分的段逐笔处理
+    for seg in np.flatnonzero(~segExact):
+        posSlice, negSlice = slice(posStart[seg], posEnd[seg]), slice(negStart[seg], negEnd[seg])
+        segPosLeft, segPosClear, segNegLeft = netRefundSegment(posAmt[posSlice].tolist(), negAmt[negSlice].tolist())
+        posLeft[posSlice], posClear[posSlice], negLeft[negSlice] = segPosLeft, segPosClear, segNegLeft
+
+    return {"付款余额": posLeft, "完全核销": posClear, "退款余额": negLeft}
+
+
+# 对某合同号的付款df做退款核销，返回被完全核销的付款df和核销后剩余的付款df
+def netRefundFrames(df_positive, df_negative, baseCols):
+    """
+    :param df_positive: 正数付款df，按付款日期升序
+    :param df_negative: 退款df，按付款日期升序
+    :param baseCols: 结果df的基础列
+    :return: 字典{"已被核销付款df": 被完全核销的付款df（付款金额为0）, "付款df": 剩余退款 + 剩余付款}
+    """
+    result = netRefundArrays(df_positive["付款金额"].to_numpy(dtype=float),
+                             df_negative["付款金额"].to_numpy(dtype=float))
+    df_positive, df_negative = df_positive.copy(), df_negative.copy()
+    df_positive["付款金额"] = result["付款余额"]
+    df_negative["付款金额"] = result["退款余额"]
+
+    # 已被核销的付款
+    df_record = pd.concat([pd.DataFrame(columns=baseCols), df_positive.loc[result["完全核销"]]])
+    # 剩余付款：剩余退款在前，剩余付款在后
+    negLeftMask = df_negative["付款金额"].to_numpy() != 0
+    posLeftMask = df_positive["付款金额"].to_numpy() > 0
+    finalDfList = [pd.DataFrame(columns=baseCols), df_positive.loc[posLeftMask]]
+    if negLeftMask.any():
+        finalDfList.insert(1, df_negative.loc[negLeftMask])
+    df_final = pd.concat(finalDfList)
+
+    return {"已被核销付款df": df_record, "付款df": df_final}
+
+
 # 初始化华为原厂付款数据，做汇总处理
 def handlePayInfoYC(df_payO, df_pay):
     """
@@ -480,47 +1168,23 @@ def handlePayInfoYC(df_payO, df_pay):
     if df_payPT.loc[df_payPT["付款金额"] <= 0].empty:
         finalPayDf = finalPayDf.append(df_payPT)
     else:
-        # 对透视的付款数据“付款金额”=0的数据，存入payRecordDf；
-        df_temp = df_payPT.loc[df_payPT["付款金额"] == 0]
-        for idx, seriesTemp in df_temp.iterrows():
-            # 被核销的付款数据，需要获取其"付款日期"
-            firstDate = df_payO.loc[df_payO["收据编号"] == seriesTemp["收据编号"], "付款日期"].tolist()[0]
-            seriesTemp["付款日期"] = firstDate
-            payRecordDf = payRecordDf.append(seriesTemp)
+        # 各收据编号在付款表中第一次出现的付款日期
+        firstDateDict = dict(df_payO.drop_duplicates("收据编号", keep="first")[["收据编号", "付款日期"]].values)
+        # 对透视的付款数据“付款金额”=0的数据，存入payRecordDf（被核销的付款数据，需要获取其"付款日期"）
+        df_temp = df_payPT.loc[df_payPT["付款金额"] == 0].copy()
+        df_temp["付款日期"] = [firstDateDict[receipt] for receipt in df_temp["收据编号"]]
+        payRecordDf = payRecordDf.append(df_temp)
 
         # 对透视的付款数据有“付款金额”<0的，需要对“付款金额”>0的数据处理：按照"付款日期"由远到近对<0的数据进行核销；
-        df_negative = df_payPT.loc[df_payPT["付款金额"] < 0].copy()
-        df_positive = df_payPT.loc[df_payPT["付款金额"] > 0].copy()
-        for i, series_n in df_negative.iterrows():
-            amount_n = series_n["付款金额"] * -1
-            for j, series_p in df_positive.iterrows():
-                amount_p = series_p["付款金额"]
-                if amount_p == 0:
-                    continue
-                # 某"收据编号"付款金额>退款金额，将该笔退款清空，并扣除对应的付款金额
-                if amount_p > amount_n:
-                    df_positive.loc[j, "付款金额"] = new_round(amount_p - amount_n)
-                    break
-                else:
-                    # 某"收据编号"付款金额<退款金额，扣除部分退款，对应的付款金额清0并存入payRecordDf
-                    amount_n = new_round(amount_n - amount_p)
-                    # 获取某笔付款的时间时：①如果该收据编号可以在付款表中查询到，取付款表中该收据编号第一次出现的日期；
-                    # ②查询不到说明该笔付款是在下单费用基础表中（一般收据编号为空），取下单费用基础表的日期
-                    dateList = df_payO.loc[df_payO["收据编号"] == series_p["收据编号"], "付款日期"].tolist()
-                    if len(dateList) != 0:
-                        firstDate = dateList[0]
-                    else:
-                        firstDate = series_p["付款日期"]
-                    df_positive.loc[j, ["付款日期", "付款金额"]] = [firstDate, 0]
-                    payRecordDf = payRecordDf.append(df_positive.loc[j])
-            else:
-                # 匹配所有付款数据后，若仍有剩余退款，说明之前部分退款已被开单处理，将这部分退款当做剩余付款存入finalPayDf
-                if amount_n > 0:
-                    series_n["付款金额"] = amount_n * -1
-                    finalPayDf = finalPayDf.append(series_n)
-        else:
-            # 匹配完成后，将剩余付款存入finalPayDf
-            finalPayDf = finalPayDf.append(df_positive.loc[df_positive["付款金额"] > 0])
+        netResult = netRefundFrames(df_payPT.loc[df_payPT["付款金额"] > 0], df_payPT.loc[df_payPT["付款金额"] < 0],
+                                    baseCols)
+        # 获取被核销付款的时间时：①如果该收据编号可以在付款表中查询到，取付款表中该收据编号第一次出现的日期；
+        # ②查询不到说明该笔付款是在下单费用基础表中（一般收据编号为空），取下单费用基础表的日期
+        df_record = netResult["已被核销付款df"]
+        df_record["付款日期"] = [firstDateDict.get(receipt, date) for receipt, date in
+                              zip(df_record["收据编号"], df_record["付款日期"])]
+        payRecordDf = payRecordDf.append(df_record)
+        finalPayDf = finalPayDf.append(netResult["付款df"])
 
     # 判断处理后数据日期是否为最新日期，非最新日期的情况需要记录
     def checkAndUpdateDate(df_):
@@ -542,10 +1206,7 @@ def handlePayInfo_CJB_Credit(df_pay):
     :param df_pay: 某华为合同号新增的付款数据df
     :return: 字典{"已被核销付款df": 已被核销付款df, "付款df": 付款df}
     """
-    # payRecordDf：已被核销的付款df（付款金额因被完全核销变为0）
-    # finalPayDf：汇总后的付款df
     baseCols = ["付款日期", "付款金额", "下单合同号", "最新付款日期"]
-    payRecordDf, finalPayDf = pd.DataFrame(columns=baseCols), pd.DataFrame(columns=baseCols)
 
     # 将付款数据df按照"付款日期"升序
     df_pay = df_pay.sort_values(by="付款日期", ascending=True)
@@ -560,31 +1221,7 @@ def handlePayInfo_CJB_Credit(df_pay):
     if df_positive.empty:
         df_positive = pd.DataFrame(columns=baseCols)
 
-    for i, series_n in df_negative.iterrows():
-        amount_n = series_n["付款金额"] * -1
-        for j, series_p in df_positive.iterrows():
-            amount_p = series_p["付款金额"]
-            if amount_p == 0:
-                continue
-            # 若付款金额>退款金额，将该笔退款清空，并扣除对应的付款金额
-            if amount_p > amount_n:
-                df_positive.loc[j, "付款金额"] = new_round(amount_p - amount_n)
-                break
-            else:
-                # 若付款金额<退款金额，扣除部分退款，对应的付款金额清0并存入payRecordDf
-                amount_n = new_round(amount_n - amount_p)
-                df_positive.loc[j, "付款金额"] = 0
-                payRecordDf = payRecordDf.append(df_positive.loc[j])
-        else:
-            # 匹配所有付款数据后，若仍有剩余退款，说明之前部分退款已被开单处理，将这部分退款当做剩余付款存入finalPayDf
-            if amount_n > 0:
-                series_n["付款金额"] = amount_n * -1
-                finalPayDf = finalPayDf.append(series_n)
-    else:
-        # 匹配完成后，将剩余付款存入finalPayDf
-        finalPayDf = finalPayDf.append(df_positive.loc[df_positive["付款金额"] > 0])
-
-    return {"已被核销付款df": payRecordDf, "付款df": finalPayDf}
+    return netRefundFrames(df_positive, df_negative, baseCols)
 
 
 # 通过下单数据匹配付款数据
@@ -597,6 +1234,10 @@ def matchPayInfo(df_order, df_calPay, incentiveDict, payRenameDict, creditDate):
     :param creditDate: 该合同号的授信日期
     :return: 匹配结果df(包含：正常匹配 + 未付款 + 剩余付款（包括退款）)
     """
+    # 使用向量化匹配引擎（vecAllocateFlag为False时使用下方原逐行匹配逻辑）
+    if vecAllocateFlag:
+        return allocatePayments(df_order, df_calPay, incentiveDict, payRenameDict, creditDate)
+
     resultDf = pd.DataFrame()
     # 设置授信付款备注
     if not df_calPay.empty:
@@ -682,14 +1323,237 @@ def matchPayInfo(df_order, df_calPay, incentiveDict, payRenameDict, creditDate):
     return resultDf
 
 
+# 获取某下单合同号的激励金额
+def getIncentiveAmount(incentiveDict, orderNum):
+    """
+    :param incentiveDict: 使用激励字典{下单合同号: 使用激励金额}
+    :param orderNum: 下单合同号
+    :return: 激励金额
+    """
+    # 原厂数据是个列表，列表第一项为激励金额，而超聚变直接是str或float
+    incentiveMatch = incentiveDict.get(orderNum, [0, ""])
+    if isinstance(incentiveMatch, list):
+        return float(incentiveMatch[0])
+    else:
+        return float(incentiveMatch)
+
+
+# 单段下单数据与付款数据的先进先出逐笔核销（allocatePayments中无法按列批量处理的段使用）
+def allocateSegment(orderAmtList, rateList, payAmtList, creditList):
+    """
+    :param orderAmtList: 下单含税金额列表（开单金额*(1+实际税率)），按开单日期升序
+    :param rateList: 实际税率列表
+    :param payAmtList: 付款金额列表（已去除金额为0的付款），按核销顺序
+    :param creditList: 付款是否为"使用授信"的列表
+    :return: 字典{"下单记录": [(下单位置, 付款位置, 付款金额, 开单金额, 开单金额（含税）, 类型)], "付款余额": 付款余额列表}
+        类型：match-匹配到付款，negative-遇到退款作为未付款，surplus-付款不足的剩余下单
+    """
+    payNum = len(payAmtList)
+    payLeft = list(payAmtList)
+    records = []
+    j = 0  # 当前付款位置（之前的付款均已核销为0）
+    for i, orderAmount in enumerate(orderAmtList):
+        rate = rateList[i]
+        lastPartial = None  # 该下单最近一次拆行匹配的(付款位置, 付款金额, 开单金额)，遇到退款时沿用
+        finished = False
+        while j < payNum:
+            payAmount = payLeft[j]
+            if payAmount == 0:
+                j += 1
+                continue
+            if payAmount < 0:
+                # 如果payAmount有负值，则此次所有下单均为"未付款"
+                if lastPartial is None:
+                    records.append((i, -1, None, None, orderAmount, "negative"))
+                else:
+                    records.append((i, lastPartial[0], lastPartial[1], lastPartial[2], orderAmount, "negative"))
+                finished = True
+                break
+            # 若付款金额和开单金额差额在20内，则将这组数据完全匹配
+            if abs(payAmount - orderAmount) <= 20:
+                payLeft[j] = 0
+                records.append((i, j, payAmount, new_round(orderAmount / (1 + rate)), None, "match"))
+                j += 1
+                finished = True
+                break
+            # 若付款金额 >= 开单金额，对应的付款金额减少
+            if payAmount >= orderAmount:
+                payLeft[j] = new_round(payAmount - orderAmount)
+                records.append((i, j, orderAmount, new_round(orderAmount / (1 + rate)), None, "match"))
+                finished = True
+                break
+            # 若付款金额 < 开单金额：授信开单将开单全部核销；非授信开单对应的开单金额减少，拆行继续匹配
+            payLeft[j] = 0
+            if creditList[j]:
+                records.append((i, j, payAmount, new_round(orderAmount / (1 + rate)), None, "match"))
+                j += 1
+                finished = True
+                break
+            orderAmount = new_round(orderAmount - payAmount)
+            amount = new_round(payAmount / (1 + rate))
+            records.append((i, j, payAmount, amount, None, "match"))
+            lastPartial = (j, payAmount, amount)
+            j += 1
+        if not finished and orderAmount > 0:
+            # 匹配所有付款数据后，若仍有下单数据，作为剩余下单
+            records.append((i, -1, None, new_round(orderAmount / (1 + rate)), orderAmount, "surplus"))
+
+    return {"下单记录": records, "付款余额": payLeft}
+
+
+# 分段向量化匹配下单数据与付款数据（可一次处理多个下单合同号，结果与逐段调用matchPayInfo后拼接一致）
+def allocatePayments(df_order, df_calPay, incentiveDict, payRenameDict, creditDate, segCol=None):
+    """
+    :param df_order: 下单df（段内已按"开单日期"升序）
+    :param df_calPay: 付款df（段内按核销顺序排列）
+    :param incentiveDict: 使用激励字典{下单合同号: 使用激励金额}
+    :param payRenameDict: 付款表列名重命名字典(同时key为需要操作的列名)
+    :param creditDate: 授信日期，单段时可传字符串，多个合同号时传字典{分段列的值: 授信日期}
+    :param segCol: 分段列名（如"下单合同号"），为None时全部数据作为一段处理；否则按该列的值分段独立匹配
+    :return: 匹配结果df(包含：正常匹配 + 未付款 + 剩余付款（包括退款）)，按段在下单df中首次出现的顺序排列，仅有付款的段排在最后
+    """
+    df_calPay = df_calPay.copy()
+    # 设置授信付款备注
+    if not df_calPay.empty:
+        if isinstance(creditDate, dict):
+            payCreditDate = df_calPay[segCol].map(creditDate).fillna("9999-12-31").str[:10]
+        else:
+            payCreditDate = creditDate
+        df_calPay.loc[df_calPay["付款日期"].str[:10] == payCreditDate, "备注"] = "使用授信"
+
+    # 按分段列对下单、付款数据编码，稳定排序后通过searchsorted获取每段的起止位置（金额为0的付款不参与核销）
+    orderTotal, payTotal = df_order.shape[0], df_calPay.shape[0]
+    (orderCodes, payCodes), segNum = getSegmentCodes([df_order, df_calPay], segCol)
+    orderAmtAll = (pd.to_numeric(df_order["开单金额"]) * (1 + pd.to_numeric(df_order["实际税率"]))).to_numpy(dtype=float)
+    rateAll = pd.to_numeric(df_order["实际税率"]).to_numpy(dtype=float)
+    payAmtAll = df_calPay["付款金额"].to_numpy(dtype=float) if payTotal else np.zeros(0)
+    creditAll = (df_calPay["备注"] == "使用授信").to_numpy() if "备注" in df_calPay.columns else np.zeros(payTotal, bool)
+    orderSort = np.argsort(orderCodes, kind="stable")
+    payNonZero = np.flatnonzero(payAmtAll != 0)
+    paySort = payNonZero[np.argsort(payCodes[payNonZero], kind="stable")]
+    orderSeg = orderCodes[orderSort]
+    orderBounds = np.searchsorted(orderSeg, np.arange(segNum + 1))
+    payBounds = np.searchsorted(payCodes[paySort], np.arange(segNum + 1))
+    orderCnt, payCnt = np.diff(orderBounds), np.diff(payBounds)
+
+    # 段内第k笔下单与第k笔付款配对：从第一笔开始连续"付款为正且差额在20内"的下单直接完全匹配（按列批量处理）
+    orderRank = np.arange(orderTotal) - orderBounds[orderSeg]
+    pairMask = orderRank < payCnt[orderSeg]
+    pairPay = np.full(orderTotal, -1)
+    pairPay[pairMask] = paySort[payBounds[orderSeg[pairMask]] + orderRank[pairMask]]
+    orderAmtSort, rateSort = orderAmtAll[orderSort], rateAll[orderSort]
+    pairAmt = np.where(pairMask, payAmtAll[pairPay] if payTotal else np.nan, np.nan)
+    with np.errstate(invalid="ignore"):
+        okArr = pairMask & (pairAmt > 0) & (np.abs(pairAmt - orderAmtSort) <= 20)
+    # 段内累计配对失败次数为0的为连续完全匹配的下单
+    failCum = np.cumsum(~okArr)
+    prefixMask = failCum - np.concatenate([[0], failCum])[orderBounds[orderSeg]] == 0
+    runArr = np.bincount(orderSeg[prefixMask], minlength=segNum)
+    # 付款已全部匹配的段，其余下单均为剩余下单；否则该段剩余的下单、付款逐笔核销
+    payDoneSeg = runArr >= payCnt
+    surplusRow = ~prefixMask & payDoneSeg[orderSeg] & (orderAmtSort > 0)
+    tailSegList = np.flatnonzero((runArr < orderCnt) & ~payDoneSeg)
+
+    payLeftAll = payAmtAll.astype(object)
+    payLeftAll[pairPay[prefixMask]] = 0
+    amountSort = new_round(orderAmtSort / (1 + rateSort)) if orderTotal else np.zeros(0)
+    # 下单记录：(段号, 段内下单序号, 下单位置, 付款位置, 付款金额, 开单金额, 开单金额（含税）, 类型)
+    recordList = [
+        (orderSeg[prefixMask], orderRank[prefixMask], orderSort[prefixMask], pairPay[prefixMask],
+         pairAmt[prefixMask].astype(object), amountSort[prefixMask].astype(object),
+         np.full(prefixMask.sum(), None, dtype=object), np.full(prefixMask.sum(), "match", dtype=object)),
+        (orderSeg[surplusRow], orderRank[surplusRow], orderSort[surplusRow], np.full(surplusRow.sum(), -1),
+         np.full(surplusRow.sum(), None, dtype=object), amountSort[surplusRow].astype(object),
+         orderAmtSort[surplusRow].astype(object), np.full(surplusRow.sum(), "surplus", dtype=object))]
+    tailRecords = []
+    for seg in tailSegList:
+        run = runArr[seg]
+        segOrderPos = orderSort[orderBounds[seg] + run:orderBounds[seg + 1]]
+        segPayPos = paySort[payBounds[seg] + run:payBounds[seg + 1]]
+        result = allocateSegment(orderAmtAll[segOrderPos].tolist(), rateAll[segOrderPos].tolist(),
+                                 payAmtAll[segPayPos].tolist(), creditAll[segPayPos].tolist())
+        for o_, p_, payAmount, amount, taxAmount, kind in result["下单记录"]:
+            tailRecords.append((seg, run + o_, segOrderPos[o_], segPayPos[p_] if p_ >= 0 else -1, payAmount, amount,
+                                taxAmount, kind))
+        payLeftAll[segPayPos] = result["付款余额"]
+    if tailRecords:
+        recordList.append(tuple(np.array(col, dtype=object) for col in zip(*tailRecords)))
+
+    # 剩余付款（包括退款）
+    df_leftPay = df_calPay.copy()
+    if payTotal:
+        df_leftPay["付款金额"] = payLeftAll
+    leftMask = np.array([amount != 0 for amount in payLeftAll], dtype=bool)
+    df_leftPay = df_leftPay.iloc[np.flatnonzero(leftMask)]
+    leftSeg = payCodes[leftMask]
+
+    recordArr = [np.concatenate([records[k] for records in recordList]) for k in range(8)]
+    if len(recordArr[0]) == 0:
+        return df_leftPay
+    # 段内按下单顺序排列（同一下单的多条记录保持核销顺序）
+    recordSort = np.lexsort((np.arange(len(recordArr[0])), recordArr[1].astype(int), recordArr[0].astype(int)))
+    recordArr = [col[recordSort] for col in recordArr]
+
+    # 由下单记录批量生成结果行
+    recordSeg = recordArr[0].astype(int)
+    orderPos = recordArr[2].astype(int)
+    payPos = recordArr[3].astype(int)
+    kindArr = recordArr[7]
+    df_result = df_order.iloc[orderPos].copy()
+
+    def setValues(col, mask, values):
+        if not mask.any():
+            return
+        colArr = df_result[col].to_numpy(dtype=object, copy=True) if col in df_result.columns else np.full(
+            df_result.shape[0], np.nan, dtype=object)
+        colArr[mask] = values[mask] if isinstance(values, np.ndarray) else values
+        df_result[col] = colArr
+
+    hasPay = payPos >= 0
+    matchMask = kindArr == "match"
+    negativeMask = kindArr == "negative"
+    surplusMask = kindArr == "surplus"
+    payAmountArr, amountArr, taxAmountArr = recordArr[4], recordArr[5], recordArr[6]
+
+    # 匹配到付款的行：付款表中的列、"付款金额"、"开单金额"、"备注"、"最新付款日期"
+    payColList = list(payRenameDict.values()) + ["备注", "最新付款日期"]
+    if hasPay.any():
+        payTakePos = np.where(hasPay, payPos, 0)
+        for col in payColList:
+            if col == "付款金额" or col not in df_calPay.columns:
+                continue
+            setValues(col, hasPay, df_calPay[col].to_numpy(dtype=object)[payTakePos])
+    setValues("开单金额", hasPay | surplusMask, amountArr)
+    setValues("付款金额", hasPay, payAmountArr)
+    # 遇到退款的行：标记"未付款"
+    setValues("付款日期", negativeMask, "未付款")
+    setValues("开单金额（含税）", negativeMask | surplusMask, taxAmountArr)
+    # 剩余下单：先判断激励情况，无激励的作为"未付款"
+    if surplusMask.any():
+        incentiveArr = np.array([getIncentiveAmount(incentiveDict, orderNum) if isSurplus else 0.0
+                                 for orderNum, isSurplus in zip(df_result["下单合同号"], surplusMask)], dtype=float)
+        incentiveMask = surplusMask & (incentiveArr > 0)
+        setValues("备注", incentiveMask, "使用激励")
+        setValues("使用激励金额", incentiveMask, incentiveArr.astype(object))
+        setValues("付款日期", surplusMask & ~incentiveMask, "未付款")
+    df_result = df_result.infer_objects()
+
+    # 按"段 -> 下单结果 -> 剩余付款"的顺序合并
+    df_result = pd.concat([df_result, df_leftPay])
+    sortKey = np.lexsort((np.arange(df_result.shape[0]),
+                          np.concatenate([np.zeros(len(recordSeg), dtype=int), np.ones(len(leftSeg), dtype=int)]),
+                          np.concatenate([recordSeg, leftSeg])))
+    return df_result.iloc[sortKey]
+
+
 # 对某个下单合同号的付款数据初始化，汇总处理后匹配付款数据存入结果df
 def matchPayDetail(orderNum, df_operate, df_payO, df_noUsePay, df_orderCredit, creditDict, payRenameDict, incentiveDict,
                    lastPayDateDict, flag):
     """
     :param orderNum: 处理的下单合同号
-    :param df_operate: 操作的数据df（原厂下单、超聚变）
+    :param df_operate: 操作的数据df（原厂下单、超聚变），或其按"下单合同号"建立的分区索引
     :param df_payO: 该下单合同号的所有付款数据
-    :param df_noUsePay: 下单费用表中的剩余付款df
+    :param df_noUsePay: 下单费用表中的剩余付款df，或其按"下单合同号"建立的分区索引
     :param df_orderCredit: 该下单合同号的授信数据df（授信付款外挂表中获取）
     :param creditDict: 华为原厂授信数据的授信字典{合同号：[付款日期, 付款金额]}
     :param payRenameDict: 付款表列名重命名字典(同时key为需要操作的列名)
@@ -698,11 +1562,34 @@ def matchPayDetail(orderNum, df_operate, df_payO, df_noUsePay, df_orderCredit, c
     :param flag: 处理的数据类型（华为原厂、鲲泰、超聚变）
     :return: 某个下单合同号匹配付款后的结果df（包含：已被核销付款 + 正常匹配 + 未付款 + 剩余付款（包括退款））
     """
+    prepare = preparePayDetail(orderNum, df_operate, df_payO, df_noUsePay, df_orderCredit, creditDict, lastPayDateDict,
+                               flag)
+    resultDf = pd.DataFrame().append(prepare["已被核销付款df"])
+    # 授信前开单数据匹配授信前付款数据，授信后开单数据匹配授信后付款数据
+    for key in ["授信前", "授信后"]:
+        df_order, df_calPay = prepare[key]
+        resultDf = resultDf.append(matchPayInfo(df_order, df_calPay, incentiveDict, payRenameDict, prepare["授信日期"]))
 
-    resultDf = pd.DataFrame()
+    return resultDf
+
+
+# 对某个下单合同号的付款数据初始化、汇总处理，返回需要匹配的下单数据和付款数据（matchPayDetail匹配付款前的部分）
+def preparePayDetail(orderNum, df_operate, df_payO, df_noUsePay, df_orderCredit, creditDict, lastPayDateDict, flag):
+    """
+    :param orderNum: 处理的下单合同号
+    :param df_operate: 操作的数据df（原厂下单、超聚变），或其按"下单合同号"建立的分区索引
+    :param df_payO: 该下单合同号的所有付款数据
+    :param df_noUsePay: 下单费用表中的剩余付款df，或其按"下单合同号"建立的分区索引
+    :param df_orderCredit: 该下单合同号的授信数据df（授信付款外挂表中获取）
+    :param creditDict: 华为原厂授信数据的授信字典{合同号：[付款日期, 付款金额]}
+    :param lastPayDateDict: 已有的最新付款时间字典{下单合同号: 付款时间}
+    :param flag: 处理的数据类型（华为原厂、鲲泰、超聚变）
+    :return: 字典{"已被核销付款df": 已被核销付款df, "授信日期": 授信日期, "授信前": [授信前开单df, 授信前付款df],
+                 "授信后": [授信后开单df, 授信后付款df]}
+    """
     creditDate = creditDict.get(orderNum, ["9999-12-31", ""])[0][:10]
     # 该合同号下单df
-    df_order = df_operate.loc[df_operate["下单合同号"] == orderNum].reset_index(drop=True)
+    df_order = getOrderPart(df_operate, orderNum).reset_index(drop=True)
     df_order = df_order.sort_values(by="开单日期", ascending=True)
     # type1：授信前开单
     df_order_sx_before = df_order.loc[df_order["开单日期"].str[:10] < creditDate]
@@ -710,7 +1597,7 @@ def matchPayDetail(orderNum, df_operate, df_payO, df_noUsePay, df_orderCredit, c
     df_order_sx_after = df_order.loc[df_order["开单日期"].str[:10] >= creditDate]
 
     # 该合同号剩余付款df
-    df_orderNoUsePay = df_noUsePay.loc[df_noUsePay["下单合同号"] == orderNum]
+    df_orderNoUsePay = getOrderPart(df_noUsePay, orderNum)
     # type1:授信前剩余付款
     df_noUsePay_sx_before = df_orderNoUsePay.loc[df_orderNoUsePay["付款日期"].str[:10] < creditDate]
     # type2:授信后剩余付款
@@ -742,22 +1629,60 @@ def matchPayDetail(orderNum, df_operate, df_payO, df_noUsePay, df_orderCredit, c
     # 授信后的付款数据汇总处理
     resultCredit = handlePayInfo_CJB_Credit(df_sxPay_after)
 
-    resultDf = resultDf.append(resultHandle["已被核销付款df"]).append(resultCredit["已被核销付款df"])
-
     df_calPayCreditBefore = resultHandle["付款df"].reset_index(drop=True)
-    df_calPayCreditAfter = df_sxPay_inDay.append(resultCredit["付款df"])
+    # 授信当天付款与汇总后的授信后付款索引可能重复（均从0开始），需重置索引，否则按索引核销时会同时修改多行
+    df_calPayCreditAfter = df_sxPay_inDay.append(resultCredit["付款df"]).reset_index(drop=True)
     df_calPayCreditAfter["付款金额"] = pd.to_numeric(df_calPayCreditAfter["付款金额"])
 
-    # 授信前开单数据df_order_sx_before匹配授信前付款数据df_calPayCreditBefore
-    matchResultCreditBeforeDf = matchPayInfo(df_order_sx_before, df_calPayCreditBefore, incentiveDict, payRenameDict,
-                                             creditDate)
-    resultDf = resultDf.append(matchResultCreditBeforeDf)
-    # 授信后开单数据df_order_sx_before匹配授信后付款数据df_calPayCreditAfter
-    matchResultCreditAfterDf = matchPayInfo(df_order_sx_after, df_calPayCreditAfter, incentiveDict, payRenameDict,
-                                            creditDate)
-    resultDf = resultDf.append(matchResultCreditAfterDf)
+    return {"已被核销付款df": pd.DataFrame().append(resultHandle["已被核销付款df"]).append(resultCredit["已被核销付款df"]),
+            "授信日期": creditDate, "授信前": [df_order_sx_before, df_calPayCreditBefore],
+            "授信后": [df_order_sx_after, df_calPayCreditAfter]}
 
-    return resultDf
+
+# 批量匹配多个下单合同号的付款数据：各合同号的下单、付款数据合并后按"下单合同号"分段，一次调用allocatePayments匹配
+def matchPayDetailBatch(prepareDict, payRenameDict, incentiveDict):
+    """
+    :param prepareDict: {下单合同号: preparePayDetail的返回值}，按处理顺序排列
+    :param payRenameDict: 付款表列名重命名字典(同时key为需要操作的列名)
+    :param incentiveDict: 使用激励字典{下单合同号: 使用激励金额}
+    :return: 匹配结果df（同按prepareDict的顺序逐个调用matchPayDetail后拼接的结果）
+    """
+    orderNumList = list(prepareDict.keys())
+    ownerDict = {orderNum: k for k, orderNum in enumerate(orderNumList)}
+    creditDateDict = {orderNum: prepare["授信日期"] for orderNum, prepare in prepareDict.items()}
+    # 结果df列表及每行所属合同号的序号、所属部分（0：已被核销付款，1：授信前匹配结果，2：授信后匹配结果）
+    dfList, ownerList, partList = [], [], []
+
+    def addResult(df_, owner, part):
+        dfList.append(df_)
+        ownerList.append(np.broadcast_to(owner, df_.shape[0]))
+        partList.append(np.full(df_.shape[0], part))
+
+    for k, orderNum in enumerate(orderNumList):
+        addResult(prepareDict[orderNum]["已被核销付款df"], k, 0)
+    for part, key in enumerate(["授信前", "授信后"], 1):
+        orderDfList = [prepareDict[orderNum][key][0] for orderNum in orderNumList]
+        payDfList = [prepareDict[orderNum][key][1] for orderNum in orderNumList]
+        df_order, df_calPay = pd.concat(orderDfList), pd.concat(payDfList)
+        orderOwner = np.repeat(np.array(orderNumList, dtype=object), [df_.shape[0] for df_ in orderDfList])
+        payOwner = np.repeat(np.array(orderNumList, dtype=object), [df_.shape[0] for df_ in payDfList])
+        # 下单、付款数据的"下单合同号"与所属合同号不一致时（无法按合同号分段），该合同号单独匹配
+        singleSet = set(orderOwner[df_order["下单合同号"].to_numpy() != orderOwner]) | set(
+            payOwner[df_calPay["下单合同号"].to_numpy() != payOwner])
+        for orderNum in singleSet:
+            addResult(matchPayInfo(*prepareDict[orderNum][key], incentiveDict, payRenameDict,
+                                   creditDateDict[orderNum]), ownerDict[orderNum], part)
+        if singleSet:
+            df_order = df_order.loc[~pd.Series(orderOwner).isin(singleSet).to_numpy()]
+            df_calPay = df_calPay.loc[~pd.Series(payOwner).isin(singleSet).to_numpy()]
+        df_match = allocatePayments(df_order, df_calPay, incentiveDict, payRenameDict, creditDateDict,
+                                    segCol="下单合同号")
+        addResult(df_match, df_match["下单合同号"].map(ownerDict).to_numpy(), part)
+
+    # 按"合同号 -> 已被核销付款 -> 授信前 -> 授信后"的顺序合并（同一部分内保持原顺序）
+    df_result = pd.concat(dfList)
+    ownerArr, partArr = np.concatenate(ownerList).astype(int), np.concatenate(partList)
+    return df_result.iloc[np.lexsort((np.arange(df_result.shape[0]), partArr, ownerArr))]
 
 
 # 筛选出超聚变付款外挂表中“付款时间”正常的数据
@@ -776,39 +1701,104 @@ def filterValidPayInfoCJB(x):
 
 # 匹配"贷款利率"
 def matchRate(series, flag):
+    rule = costRuleDict
     if flag != "鲲泰":
         # if series["事业部"] in ["区域事业部", "行业事业部", "超聚变业务部", "商业分销及电商业务部"]:
-        if series["事业部"] in ["北区", "南区", "超聚变及商业分销", "新业务"]:
-            if series["付款天数差"] <= 15:
-                return 0.055
+        if series["事业部"] in rule["区域事业部"]:
+            if series["付款天数差"] <= rule["区域宽限天数"]:
+                return rule["基础利率"]
             else:
                 if series["运输方式"] == "自提":
-                    return 0.055
-                elif series["运输方式"] in ["汽运", "空运"]:
-                    return 0.09
+                    return rule["基础利率"]
+                elif series["运输方式"] in rule["超期运输方式"]:
+                    return rule["超期利率"]
                 else:
-                    return f"事业部已配置，付款天数差>15，运输方式为{series['运输方式']}"
-        elif series["事业部"] == "服务事业部":
-            if series["付款天数差"] <= 8:
-                return 0.055
+                    return f"事业部已配置，付款天数差>{rule['区域宽限天数']}，运输方式为{series['运输方式']}"
+        elif series["事业部"] == rule["服务事业部"]:
+            if series["付款天数差"] <= rule["服务宽限天数"]:
+                return rule["基础利率"]
             else:
-                return 0.09
+                return rule["超期利率"]
         else:
             return "事业部未配置"
     else:
-        return 0.055
+        return rule["鲲泰利率"]
+
+
+# 批量匹配"贷款利率"（规则同matchRate）
+def matchRateArray(df, flag):
+    """
+    :param df: 需要匹配的df（需要"事业部"、"付款天数差"、"运输方式"列）
+    :param flag: 处理的数据类型（华为原厂、鲲泰、超聚变）
+    :return: "贷款利率"Series，未配置的数据为说明字符串
+    """
+    rule = costRuleDict
+    rateArr = np.full(len(df), rule["鲲泰利率"] if flag == "鲲泰" else rule["基础利率"], dtype=object)
+    if flag != "鲲泰":
+        dept = df["事业部"].values
+        dayDiff = df["付款天数差"].values
+        transport = df["运输方式"].values
+        areaMask = df["事业部"].isin(rule["区域事业部"]).values
+        serviceMask = dept == rule["服务事业部"]
+        overMask = areaMask & ~(dayDiff <= rule["区域宽限天数"]) & (transport != "自提")
+        overTransportMask = df["运输方式"].isin(rule["超期运输方式"]).values
+        rateArr[overMask & overTransportMask] = rule["超期利率"]
+        otherMask = overMask & ~overTransportMask
+        rateArr[otherMask] = [f"事业部已配置，付款天数差>{rule['区域宽限天数']}，运输方式为{i}" for i in transport[otherMask]]
+        rateArr[serviceMask & ~(dayDiff <= rule["服务宽限天数"])] = rule["超期利率"]
+        rateArr[~areaMask & ~serviceMask] = "事业部未配置"
+    return pd.Series(rateArr, index=df.index, dtype=object).infer_objects() if len(df) != 0 else pd.Series(
+        rateArr, index=df.index, dtype=float)
+
+
+# 批量匹配"下单费用"（规则同matchCost）
+def matchCostArray(df, flag):
+    """
+    :param df: 需要匹配的df（需要"事业部"、"付款天数差"、"付款金额"、"贷款利率"列）
+    :param flag: 处理的数据类型（华为原厂、鲲泰、超聚变）
+    :return: "下单费用"Series，"贷款利率"未配置的数据沿用其说明字符串
+    """
+    rate = df["贷款利率"]
+    if rate.dtype != object:
+        rateMask = np.ones(len(df), dtype=bool)
+        rateValue = rate.values.astype(float)
+    else:
+        # 去重后判断是否为数值（空值为float）
+        codes, uniqRate = pd.factorize(rate)
+        uniqMask = np.array([isinstance(i, float) for i in uniqRate], dtype=bool)
+        uniqValue = np.array([i if isFloat else np.nan for i, isFloat in zip(uniqRate, uniqMask)], dtype=float)
+        rateMask = np.append(uniqMask, True)[codes]
+        rateValue = np.append(uniqValue, np.nan)[codes]
+    dayDiff = df["付款天数差"].values
+    rule = costRuleDict
+    if flag != "鲲泰":
+        dept = df["事业部"].values
+        # 服务事业部宽限8天，其余已配置事业部宽限15天（天数见costRuleDict）
+        graceDay = np.where(dept == rule["服务事业部"], rule["服务宽限天数"], rule["区域宽限天数"])
+        cost = (dayDiff - graceDay) * df["付款金额"].values * rateValue / 365
+        configMask = df["事业部"].isin(list(rule["区域事业部"]) + [rule["服务事业部"]]).values
+    else:
+        cost = dayDiff * df["付款金额"].values * rateValue / 365
+        configMask = np.ones(len(df), dtype=bool)
+    if rateMask.all() and configMask.all():
+        return pd.Series(cost, index=df.index, dtype=float)
+    costArr = cost.astype(object)
+    costArr[~configMask] = "事业部未配置"
+    costArr[~rateMask] = rate.values[~rateMask]
+    return pd.Series(costArr, index=df.index, dtype=object).infer_objects()
 
 
 # 匹配"下单费用"
 def matchCost(series, flag):
     if not isinstance(series["贷款利率"], float):
         return series["贷款利率"]
+    rule = costRuleDict
     if flag != "鲲泰":
         # if series["事业部"] in ["区域事业部", "行业事业部", "超聚变业务部", "商业分销及电商业务部"]:
-        if series["事业部"] in ["北区", "南区", "超聚变及商业分销", "新业务"]:
-            return (series["付款天数差"] - 15) * series["付款金额"] * series["贷款利率"] / 365
-        elif series["事业部"] == "服务事业部":
-            return (series["付款天数差"] - 8) * series["付款金额"] * series["贷款利率"] / 365
+        if series["事业部"] in rule["区域事业部"]:
+            return (series["付款天数差"] - rule["区域宽限天数"]) * series["付款金额"] * series["贷款利率"] / 365
+        elif series["事业部"] == rule["服务事业部"]:
+            return (series["付款天数差"] - rule["服务宽限天数"]) * series["付款金额"] * series["贷款利率"] / 365
         else:
             # 该步一般不会执行，因为匹配"贷款利率"时已经处理
             return "事业部未配置"
@@ -829,6 +1819,43 @@ def matchDeductMonth(orderTime):
     return f"{month_}月"
 
 
+# 批量匹配扣款时间、扣款月份（开单日期只去重一次，规则同matchDeductTime、matchDeductMonth）
+def matchDeductArray(orderTime):
+    """
+    :param orderTime: 开单日期字符串Series
+    :return: (扣款时间Series, 扣款月份Series)
+    """
+    codes, uniqTime = pd.factorize(orderTime)
+    if len(orderTime) == 0 or (codes == -1).any():
+        return mapUniqueTime(orderTime, matchDeductTime), mapUniqueTime(orderTime, matchDeductMonth)
+    timeArr = np.array([matchDeductTime(i) for i in uniqTime], dtype=object)
+    monthArr = np.array([matchDeductMonth(i) for i in uniqTime], dtype=object)
+    return (pd.Series(timeArr[codes], index=orderTime.index, name=orderTime.name),
+            pd.Series(monthArr[codes], index=orderTime.index, name=orderTime.name))
+
+
+# 将日期字符串Series的前10位转为日期（去重后转换，空值为NaT）
+def toDateSeries(timeSeries):
+    codes, uniqTime = pd.factorize(timeSeries)
+    uniqDate = pd.to_datetime(pd.Series([str(i)[:10] for i in uniqTime], dtype=object))
+    return pd.Series(np.append(uniqDate.values, np.datetime64("NaT"))[codes], index=timeSeries.index)
+
+
+# 对开单日期去重后逐个调用func，再按原顺序展开（开单日期重复率高，计算量只与不同日期的数量有关）
+def mapUniqueTime(orderTime, func):
+    """
+    :param orderTime: 开单日期字符串Series
+    :param func: 处理单个开单日期的方法（matchDeductTime、matchDeductMonth、setPayTimeKT）
+    :return: 处理结果Series
+    """
+    codes, uniqTime = pd.factorize(orderTime)
+    if len(orderTime) == 0 or (codes == -1).any():
+        # 空数据或存在空值时按原逐行处理（保持原有的返回类型及报错）
+        return orderTime.apply(func)
+    resultArr = np.array([func(i) for i in uniqTime], dtype=object)
+    return pd.Series(resultArr[codes], index=orderTime.index, name=orderTime.name)
+
+
 # 鲲泰数据匹配“付款日期”
 def setPayTimeKT(orderTimeStr):
     """
@@ -854,6 +1881,26 @@ def setPayTimeKT(orderTimeStr):
         return payTime.strftime(fmt)
 
 
+# 批量匹配鲲泰数据的“付款日期”（规则同setPayTimeKT）
+def setPayTimeKTArray(orderTime):
+    """
+    :param orderTime: 开单日期字符串Series
+    :return: 付款日期字符串Series
+    """
+    codes, uniqTime = pd.factorize(orderTime)
+    if len(orderTime) == 0 or (codes == -1).any() or not pd.Series(uniqTime, dtype=object).str.fullmatch(
+            r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}").all():
+        # 空数据、存在空值或格式不符时按原逐个处理（保持原有的返回类型及报错）
+        return mapUniqueTime(orderTime, setPayTimeKT)
+    # 对去重后的开单日期批量计算：日期<=24时为当月25日，>=25时为下月25日
+    orderDate = pd.to_datetime(pd.Series(uniqTime, dtype=object), format="%Y-%m-%d %H:%M:%S").values
+    monthArr = orderDate.astype("datetime64[M]")
+    dayArr = (orderDate.astype("datetime64[D]") - monthArr.astype("datetime64[D]")).astype(int) + 1
+    payDate = (monthArr + (dayArr >= 25).astype(int)).astype("datetime64[D]") + np.timedelta64(24, "D")
+    payTime = np.array([f"{i} 00:00:00" for i in np.datetime_as_string(payDate, unit="D")], dtype=object)
+    return pd.Series(payTime[codes], index=orderTime.index, name=orderTime.name)
+
+
 # 筛选出本次下单的有效数据
 def filterOrderInfo(orderDf, lastOrderDateDict):
     """
@@ -861,35 +1908,20 @@ def filterOrderInfo(orderDf, lastOrderDateDict):
     :param lastOrderDateDict: 下单费用表中各合同号的最新开单日期字典{下单合同号: 开单日期}
     :return: 有效的下单df
     """
-    allOrderNum = set(orderDf["下单合同号"])
-    resultDf = pd.DataFrame(columns=orderDf.columns)
-    for o_ in allOrderNum:
-        df_temp = orderDf.loc[
-            (orderDf["下单合同号"] == o_) & (orderDf["开单日期"].str[:10] > lastOrderDateDict.get(o_, "")[:10])]
-        resultDf = resultDf.append(df_temp)
-    return resultDf
+    orderPart = buildPartIndex(orderDf, "下单合同号")
+    dfList = [pd.DataFrame(columns=orderDf.columns)]
+    for o_ in getPartKeys(orderPart):
+        df_temp = getPart(orderPart, o_)
+        dfList.append(df_temp.loc[df_temp["开单日期"].str[:10] > lastOrderDateDict.get(o_, "")[:10]])
+    return pd.concat(dfList)
 
 
-# 读取下单费用表和毛利分析结果表，返回字典{"下单df": 下单数据df, "已处理df": 已处理的下单数据df, "剩余付款df": 未处理的付款数据df, "最新付款时间dict":最新付款时间dict}
-def getOriginOrderData(analyzePath, orderCostPath):
+# 读取下单费用表，返回字典{"已处理df": 已处理的下单数据df, "未付款df": 未付款的下单数据df, "剩余付款df": 未处理的付款数据df, "最新付款时间dict": 最新付款时间dict, "最新下单时间dict": 最新下单时间dict}
+def readOrderCostData(orderCostPath):
     """
-    :param analyzePath: 毛利分析结果表路径
     :param orderCostPath: 下单费用表路径
-    :return:字典：{"下单df": 下单数据df, "已处理df": 已处理的下单数据df, "剩余付款df": 未处理的付款数据df, "最新付款时间dict":最新付款时间dict}
+    :return: 字典{"已处理df", "未付款df", "剩余付款df", "最新付款时间dict", "最新下单时间dict"}
     """
-    # 读取毛利分析结果表
-    df_analyze = pd.read_excel(analyzePath, sheet_name="账面毛利分析", dtype=str, na_values=[''], keep_default_na=False)
-    # 筛选出需要的列+["销售类型", "采购类型"]并重命名（"销售类型"和"采购类型"作为判断条件，后续会进行删除）
-    df_analyze = df_analyze[filterCol + ["销售类型", "采购类型"]+ ["市场类型"]].rename(columns=renameColDict)
-    df_analyze["开单金额"] = pd.to_numeric(df_analyze["开单金额"])
-    # 筛选出符合条件的数据
-    df_analyze = df_analyze.loc[
-        (df_analyze["销售类型"] == "正常销售") & (
-            df_analyze["采购类型"].isin(['服务', '原厂下单', '鲲泰', '超聚变'])) & (
-                df_analyze["开单金额"] > 0)]
-    # 将毛利分析结果表中的备注信息->供应商名称
-    df_analyze["供应商名称"] = df_analyze["供应商名称"].apply(lambda x: companySimpleDict.get(x, x))
-
     # 读取下单费用基础表
     df_all = pd.read_excel(orderCostPath, sheet_name="下单费用", dtype=str, na_values=[''], keep_default_na=False)
     # 对下单费用表透视，获取每个订单号的付款最新日期
@@ -911,43 +1943,8 @@ def getOriginOrderData(analyzePath, orderCostPath):
     else:
         lastOrderDateDict = dict(zip(df_pivot.index, df_pivot["开单日期"]))
 
-    """---------------------测试---------------------"""
-    lastCreditDict = {}
+    # 备注为空的数据填充为""
     df_all["备注"] = df_all["备注"].fillna("")
-    a = 0
-    b = 0
-    df_credit = df_all.loc[(df_all["备注"].str.contains("授信")) & (df_all["使用激励金额"].isna())]
-    creditOrderList = list(set(df_credit["下单合同号"].tolist()))
-    for order in creditOrderList:
-        df_match = df_credit.loc[(df_credit["下单合同号"] == order) & (~df_credit["付款日期"].isna())]
-        if order == "1Y01302205010F":
-            print(df_match)
-        allCreditTime = df_match["付款日期"].tolist()
-        allCreditTime = list(set([t_[:10] for t_ in allCreditTime]))
-        if len(allCreditTime) != 1:
-            a += 1
-            continue
-            # raise Exception(f"下单费用基础表中合同号为{order}的授信时间获取到{len(allCreditTime)}个")
-        creditTime = allCreditTime[0]
-        df_creditPay = df_all.loc[
-            (df_all["下单合同号"] == order) & (df_all["付款日期"].str[:10] == creditTime) & (df_all["开单日期"].isna())]
-        if order == "1Y01302205010F":
-            print(df_creditPay)
-        if df_creditPay.shape[0] > 1:
-            b += 1
-            print(order)
-            continue
-            # raise Exception(f"下单费用基础表中合同号为{order}的授信剩余付款获取到{df_creditPay.shape[0]}条")
-        elif df_creditPay.shape[0] == 1:
-            creditAmount = df_creditPay.iloc[0]["付款金额"]
-            lastCreditDict[order] = [creditTime, creditAmount]
-        else:
-            # 数据量为0说明授信额度被使用完
-            lastCreditDict[order] = [creditTime, 0]
-    print(lastCreditDict)
-    print(lastCreditDict["1Y01302205010F"])
-    print(a, b)
-    """---------------------测试---------------------"""
 
     # 筛选出匹配完成，无需操作的数据
     df_base = df_all.query(
@@ -969,13 +1966,6 @@ def getOriginOrderData(analyzePath, orderCostPath):
         raise Exception(
             f"下单费用表获取的数据量总和不等于总数据量，请检查筛选规则及表内容格式，可参考{saveDumpPath}进行排查")
 
-    # 本次需要计算的下单数据 = “毛利分析结果表”中需要计算的数据 + "下单费用表"中标记为未付款的数据：
-    # fixme：新增下单数据的筛选
-    df_analyze = filterOrderInfo(df_analyze, lastOrderDateDict)
-    df_analyze = df_analyze.append(df_nopay).reset_index(drop=True)
-    df_analyze["开单金额"] = pd.to_numeric(df_analyze["开单金额"])
-    df_analyze["实际税率"] = pd.to_numeric(df_analyze["实际税率"])
-
     # 1.对剩余付款的数据处理（可能存在某合同号，其付款表中最新的扣款时间>付款时间，且数据汇总后有剩余付款，导致剩余付款的日期并非最新日期）
     # 2.将“最新付款日期”有值的数据筛选，更新lastPayDateDict（每个订单号的付款最新日期）
     df_updatePay = df_all.loc[~df_all["最新付款日期"].isna()]
@@ -986,6 +1976,228 @@ def getOriginOrderData(analyzePath, orderCostPath):
                                             aggfunc={"最新付款日期": "first"})
         lastPayDateDict.update(dict(zip(df_pivot.index, df_pivot["最新付款日期"])))
 
+    return {"已处理df": df_base, "未付款df": df_nopay, "剩余付款df": df_noUsePay, "最新付款时间dict": lastPayDateDict,
+            "最新下单时间dict": lastOrderDateDict}
+
+
+# 打开下单费用台账（sqlite），不存在时创建表及索引
+def openLedger():
+    """
+    表结构：
+        下单费用：下单费用表的数据（列同resultColadd，均为文本），分类为已处理、未付款、剩余付款、异常，行哈希用于判断数据是否变化
+        合同日期：每个下单合同号的最新付款日期、最新开单日期（写入数据时同步更新）
+    :return: sqlite连接
+    """
+    conn = sqlite3.connect(ledgerDbPath)
+    colSql = ", ".join([f'"{col}" TEXT' for col in resultColadd])
+    conn.execute(f'CREATE TABLE IF NOT EXISTS 下单费用 (行号 INTEGER PRIMARY KEY AUTOINCREMENT, {colSql}, 分类 TEXT, 行哈希 TEXT)')
+    for col in ["下单合同号", "开单日期", "付款日期", "分类"]:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{col}" ON 下单费用 ("{col}")')
+    conn.execute('CREATE TABLE IF NOT EXISTS 合同日期 (下单合同号 TEXT PRIMARY KEY, 最新付款日期 TEXT, 最新开单日期 TEXT)')
+    return conn
+
+
+# 将df的值转为台账中的文本（与保存为xlsx后再按文本读取的结果一致）
+def toLedgerText(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)) or value is pd.NaT:
+        return None
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+# 按下单费用表的规则对数据分类（规则同readOrderCostData）
+def classifyLedgerRows(df_all):
+    """
+    :param df_all: 下单费用数据df（文本）
+    :return: 分类Series（已处理、未付款、剩余付款，无法分类或满足多个分类的为异常）
+    """
+    payDate, orderDate, payAmount, note = df_all["付款日期"], df_all["开单日期"], df_all["付款金额"], df_all["备注"].fillna("")
+    baseMask = ((~payDate.isna()) & (payDate != "未付款") & (~orderDate.isna())) | (payAmount == "0") | (note == "使用激励")
+    nopayMask = payDate == "未付款"
+    noUsePayMask = (~payDate.isna()) & orderDate.isna() & (payAmount != "0") & (note != "使用激励")
+    classSe = pd.Series("异常", index=df_all.index, dtype=object)
+    classSe[baseMask & ~nopayMask & ~noUsePayMask] = "已处理"
+    classSe[nopayMask & ~baseMask & ~noUsePayMask] = "未付款"
+    classSe[noUsePayMask & ~baseMask & ~nopayMask] = "剩余付款"
+    return classSe
+
+
+# 重新计算下单合同号的最新付款日期、最新开单日期（规则同readOrderCostData）
+def updateLedgerDate(conn, orderList=None):
+    """
+    :param conn: sqlite连接
+    :param orderList: 需要更新的下单合同号列表，为None时更新全部
+    :return:
+    """
+    selectSql = '''SELECT 下单合同号, COALESCE(MAX(最新付款日期), MAX(CASE WHEN 付款日期 != '未付款' THEN 付款日期 END)),
+                   MAX(开单日期) FROM 下单费用 WHERE 下单合同号 IS NOT NULL'''
+    if orderList is None:
+        conn.execute("DELETE FROM 合同日期")
+        conn.execute(f"INSERT INTO 合同日期 {selectSql} GROUP BY 下单合同号")
+        return
+    orderList = list(orderList)
+    for i in range(0, len(orderList), 500):
+        subList = orderList[i:i + 500]
+        mark = ",".join(["?"] * len(subList))
+        conn.execute(f"DELETE FROM 合同日期 WHERE 下单合同号 IN ({mark})", subList)
+        conn.execute(f"INSERT INTO 合同日期 {selectSql} AND 下单合同号 IN ({mark}) GROUP BY 下单合同号", subList)
+
+
+# 将下单费用df写入台账：只写入新增或变化的数据，删除这些合同号中已不存在的数据
+def saveLedgerRows(conn, df_all, orderList):
+    """
+    :param conn: sqlite连接
+    :param df_all: 这些下单合同号的全部数据df
+    :param orderList: 本次处理的下单合同号列表
+    :return: {"新增": 新增数据量, "删除": 删除数据量}
+    """
+    df_all = df_all.reindex(columns=resultColadd)
+    rowList = [tuple([toLedgerText(value) for value in row]) for row in df_all.itertuples(index=False)]
+    hashList = [hashlib.sha1("\x1f".join(["\x00" if v is None else v for v in row]).encode("utf-8")).hexdigest()
+                for row in rowList]
+    classList = classifyLedgerRows(pd.DataFrame(rowList, columns=resultColadd, dtype=object)).tolist()
+
+    # 原数据中与本次数据相同（行哈希一致）的数据保留，其余删除
+    newHashDict = {}
+    for idx, rowHash in enumerate(hashList):
+        newHashDict.setdefault(rowHash, []).append(idx)
+    deleteList = []
+    orderList = list(orderList)
+    for i in range(0, len(orderList), 500):
+        subList = orderList[i:i + 500]
+        mark = ",".join(["?"] * len(subList))
+        for rowNum, rowHash in conn.execute(f"SELECT 行号, 行哈希 FROM 下单费用 WHERE 下单合同号 IN ({mark})", subList):
+            if newHashDict.get(rowHash):
+                newHashDict[rowHash].pop()
+            else:
+                deleteList.append((rowNum,))
+    insertIdx = sorted([idx for idxList in newHashDict.values() for idx in idxList])
+
+    conn.executemany("DELETE FROM 下单费用 WHERE 行号 = ?", deleteList)
+    colSql = ", ".join([f'"{col}"' for col in resultColadd])
+    mark = ",".join(["?"] * (len(resultColadd) + 2))
+    conn.executemany(f"INSERT INTO 下单费用 ({colSql}, 分类, 行哈希) VALUES ({mark})",
+                     [rowList[idx] + (classList[idx], hashList[idx]) for idx in insertIdx])
+    updateLedgerDate(conn, set(orderList) | set([rowList[idx][resultColadd.index("下单合同号")] for idx in insertIdx]))
+    conn.commit()
+    return {"新增": len(insertIdx), "删除": len(deleteList)}
+
+
+# 从下单费用表导入台账（清空台账原有数据）
+def importLedger(orderCostPath):
+    """
+    :param orderCostPath: 下单费用表路径
+    :return: 导入的数据量
+    """
+    df_all = pd.read_excel(orderCostPath, sheet_name="下单费用", dtype=str, na_values=[''], keep_default_na=False)
+    conn = openLedger()
+    try:
+        conn.execute("DELETE FROM 下单费用")
+        conn.execute("DELETE FROM 合同日期")
+        saveLedgerRows(conn, df_all, [])
+        updateLedgerDate(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return len(df_all)
+
+
+# 将台账导出为下单费用表格式（按"下单合同号", "开单日期"排序）
+def exportLedger(resultPath, minRowNum=0):
+    """
+    :param resultPath: 导出的下单费用表路径
+    :param minRowNum: 只导出行号大于该值的数据（写入台账前的最大行号，即本次新增或变化的数据），为0时导出全部数据
+    :return: 导出的下单费用表路径
+    """
+    conn = openLedger()
+    try:
+        colSql = ", ".join([f'"{col}"' for col in resultColadd])
+        finialDf = pd.read_sql(f'''SELECT {colSql} FROM 下单费用 WHERE 行号 > ? ORDER BY 下单合同号 IS NULL, 下单合同号,
+                                 开单日期 IS NULL, 开单日期, 行号''', conn, params=(minRowNum,))
+    finally:
+        conn.close()
+    # 数值列按数值写入
+    for col in ledgerNumCol:
+        numSe = pd.to_numeric(finialDf[col], errors="coerce")
+        finialDf[col] = numSe.astype(object).where(numSe.notna() | finialDf[col].isna(), finialDf[col])
+    if styledWriteFlag:
+        saveStyledResult(finialDf, resultPath)
+    else:
+        finialDf.to_excel(resultPath, sheet_name="下单费用", index=False)
+    return resultPath
+
+
+# 读取台账中的下单费用数据
+def readLedgerRows(conn, whereSql, params=()):
+    colSql = ", ".join([f'"{col}"' for col in resultColadd])
+    return pd.read_sql(f"SELECT {colSql} FROM 下单费用 WHERE {whereSql} ORDER BY 付款日期 DESC, 行号", conn,
+                       params=params)
+
+
+# 从台账读取本次需要处理的数据（未付款、剩余付款）及每个合同号的最新日期，返回格式同readOrderCostData（"已处理df"为空）
+def readLedgerOpenData(orderCostPath):
+    """
+    :param orderCostPath: 下单费用表路径（台账为空时从该表导入）
+    :return: 字典{"已处理df", "未付款df", "剩余付款df", "最新付款时间dict", "最新下单时间dict"}
+    """
+    conn = openLedger()
+    try:
+        if conn.execute("SELECT COUNT(1) FROM 下单费用").fetchone()[0] == 0:
+            conn.close()
+            importLedger(orderCostPath)
+            conn = openLedger()
+        errorNum = conn.execute("SELECT COUNT(1) FROM 下单费用 WHERE 分类 = '异常'").fetchone()[0]
+        if errorNum != 0:
+            raise Exception(f"下单费用台账存在无法分类的数据{errorNum}条（无付款日期也无开单日期或满足多个分类），请检查")
+        df_nopay = readLedgerRows(conn, "分类 = '未付款'")
+        df_noUsePay = readLedgerRows(conn, "分类 = '剩余付款'")
+        df_nopay["备注"] = df_nopay["备注"].fillna("")
+        df_noUsePay["备注"] = df_noUsePay["备注"].fillna("")
+        lastPayDateDict, lastOrderDateDict = {}, {}
+        for orderNum, lastPayDate, lastOrderDate in conn.execute("SELECT * FROM 合同日期"):
+            if lastPayDate is not None:
+                lastPayDateDict[orderNum] = lastPayDate
+            if lastOrderDate is not None:
+                lastOrderDateDict[orderNum] = lastOrderDate
+    finally:
+        conn.close()
+    return {"已处理df": pd.DataFrame(columns=resultColadd), "未付款df": df_nopay, "剩余付款df": df_noUsePay,
+            "最新付款时间dict": lastPayDateDict, "最新下单时间dict": lastOrderDateDict}
+
+
+# 读取下单费用表和毛利分析结果表，返回字典{"下单df": 下单数据df, "已处理df": 已处理的下单数据df, "剩余付款df": 未处理的付款数据df, "最新付款时间dict":最新付款时间dict}
+def getOriginOrderData(analyzePath, orderCostPath):
+    """
+    :param analyzePath: 毛利分析结果表路径
+    :param orderCostPath: 下单费用表路径
+    :return:字典：{"下单df": 下单数据df, "已处理df": 已处理的下单数据df, "剩余付款df": 未处理的付款数据df, "最新付款时间dict":最新付款时间dict}
+    """
+    # 读取毛利分析结果表
+    df_analyze = pd.read_excel(analyzePath, sheet_name="账面毛利分析", dtype=str, na_values=[''], keep_default_na=False)
+    # 筛选出需要的列+["销售类型", "采购类型"]并重命名（"销售类型"和"采购类型"作为判断条件，后续会进行删除）
+    df_analyze = df_analyze[filterCol + ["销售类型", "采购类型"]+ ["市场类型"]].rename(columns=renameColDict)
+    df_analyze["开单金额"] = pd.to_numeric(df_analyze["开单金额"])
+    # 筛选出符合条件的数据
+    df_analyze = df_analyze.loc[
+        (df_analyze["销售类型"] == "正常销售") & (
+            df_analyze["采购类型"].isin(['服务', '原厂下单', '鲲泰', '超聚变'])) & (
+                df_analyze["开单金额"] > 0)]
+    # 将毛利分析结果表中的备注信息->供应商名称
+    df_analyze["供应商名称"] = df_analyze["供应商名称"].apply(lambda x: companySimpleDict.get(x, x))
+
+    # 读取下单费用基础表（或下单费用台账）
+    orderCostDict = readLedgerOpenData(orderCostPath) if ledgerDbPath else readOrderCostData(orderCostPath)
+    df_base, df_nopay, df_noUsePay = orderCostDict["已处理df"], orderCostDict["未付款df"], orderCostDict["剩余付款df"]
+    lastPayDateDict, lastOrderDateDict = orderCostDict["最新付款时间dict"], orderCostDict["最新下单时间dict"]
+
+    # 本次需要计算的下单数据 = “毛利分析结果表”中需要计算的数据 + "下单费用表"中标记为未付款的数据：
+    # fixme：新增下单数据的筛选
+    df_analyze = filterOrderInfo(df_analyze, lastOrderDateDict)
+    df_analyze = df_analyze.append(df_nopay).reset_index(drop=True)
+    df_analyze["开单金额"] = pd.to_numeric(df_analyze["开单金额"])
+    df_analyze["实际税率"] = pd.to_numeric(df_analyze["实际税率"])
+
     return {"下单df": df_analyze, "已处理df": df_base, "剩余付款df": df_noUsePay, "最新付款时间dict": lastPayDateDict}
 
 
@@ -1052,6 +2264,253 @@ def validCreditData(incentiveDict, creditPayTable, saveDir):
     return df_credit
 
 
+# 设置“里程碑付款&调整台帐表”的解析缓存参数（uibot中调用）
+def setPayCacheConfig(cacheDir, maxSizeMB=500):
+    """
+    :param cacheDir: 缓存文件夹，为空时不使用缓存
+    :param maxSizeMB: 缓存数据文件的总大小上限（MB），超出时删除最久未使用的缓存
+    :return:
+    """
+    global payCacheDir, payCacheMaxSize
+    payCacheDir = cacheDir
+    payCacheMaxSize = int(float(maxSizeMB) * 1024 * 1024)
+
+
+# 获取当前payTableRenameDict对应的缓存文件夹（payTableRenameDict变化时清除旧缓存）
+def getPayCacheDir():
+    renameKey = hashlib.sha1(json.dumps(list(payTableRenameDict.items()), ensure_ascii=False).encode("utf-8")).hexdigest()
+    cacheDir = os.path.join(payCacheDir, renameKey[:16])
+    if not os.path.exists(cacheDir):
+        for name in os.listdir(payCacheDir) if os.path.exists(payCacheDir) else []:
+            if name != renameKey[:16]:
+                shutil.rmtree(os.path.join(payCacheDir, name), ignore_errors=True)
+        os.makedirs(os.path.join(cacheDir, "fp"), exist_ok=True)
+        os.makedirs(os.path.join(cacheDir, "data"), exist_ok=True)
+    return cacheDir
+
+
+# 计算文件内容的哈希值
+def getFileHash(filePath):
+    sha1 = hashlib.sha1()
+    with open(filePath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+# 写入缓存文件（先写临时文件再替换，避免并行时读到不完整的文件）
+def writeCacheFile(path, content):
+    """
+    :param path: 缓存文件路径
+    :param content: 字符串或df
+    :return:
+    """
+    tempPath = f"{path}.{os.getpid()}.tmp"
+    if isinstance(content, pd.DataFrame):
+        content.to_pickle(tempPath)
+    else:
+        with open(tempPath, "w", encoding="utf-8") as f:
+            f.write(content)
+    os.replace(tempPath, path)
+
+
+# 读取“里程碑付款&调整台帐表”，返回按payTableRenameDict筛选并重命名后的付款df
+def readPayTable(payFilePath):
+    """
+    缓存结构：
+        fp/{路径+大小+修改时间的哈希}：记录该文件内容的哈希值，文件未变化时无需重新计算内容哈希
+        data/{内容哈希}.pkl：解析后的付款df，相同内容的文件（如每日重新下载）共用同一份缓存
+    缓存使用pickle（同本地订单表、检查点、报表库）：parquet需要额外安装pyarrow，缓存只由本流程写入和读取，不需要跨语言读取
+    :param payFilePath: “里程碑付款&调整台帐表”路径
+    :return: 付款df
+    """
+    if not payCacheDir:
+        return pd.read_excel(payFilePath, header=8, dtype=str)[payTableRenameDict.keys()].rename(
+            columns=payTableRenameDict)
+
+    cacheDir = getPayCacheDir()
+    stat = os.stat(payFilePath)
+    fpKey = hashlib.sha1(f"{os.path.abspath(payFilePath)}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")).hexdigest()
+    fpPath = os.path.join(cacheDir, "fp", fpKey)
+    if os.path.exists(fpPath):
+        with open(fpPath, "r", encoding="utf-8") as f:
+            contentKey = f.read().strip()
+    else:
+        contentKey = getFileHash(payFilePath)
+        writeCacheFile(fpPath, contentKey)
+
+    dataPath = os.path.join(cacheDir, "data", f"{contentKey}.pkl")
+    if os.path.exists(dataPath):
+        try:
+            df_payO = pd.read_pickle(dataPath)
+            # 更新修改时间，用于淘汰最久未使用的缓存
+            os.utime(dataPath)
+            return df_payO
+        except Exception:
+            pass
+    df_payO = pd.read_excel(payFilePath, header=8, dtype=str)[payTableRenameDict.keys()].rename(
+        columns=payTableRenameDict)
+    writeCacheFile(dataPath, df_payO)
+    return df_payO
+
+
+# 缓存总大小超出上限时，按最近使用时间删除最久未使用的缓存
+def trimPayCache():
+    if not payCacheDir or not os.path.exists(payCacheDir):
+        return
+    cacheDir = getPayCacheDir()
+    dataDir = os.path.join(cacheDir, "data")
+    fileList = []
+    for name in os.listdir(dataDir):
+        path = os.path.join(dataDir, name)
+        stat = os.stat(path)
+        fileList.append((stat.st_mtime, stat.st_size, path))
+    totalSize = sum([i[1] for i in fileList])
+    for _, size, path in sorted(fileList):
+        if totalSize <= payCacheMaxSize:
+            break
+        os.remove(path)
+        totalSize -= size
+    # 指纹文件按同样的方式清理（每日下载的文件路径不同，指纹文件会不断增加）
+    fpDir = os.path.join(cacheDir, "fp")
+    fpList = sorted([(os.stat(os.path.join(fpDir, name)).st_mtime, name) for name in os.listdir(fpDir)])
+    for _, name in fpList[:max(len(fpList) - payCacheMaxFp, 0)]:
+        os.remove(os.path.join(fpDir, name))
+
+
+# 读取某下单合同号的里程碑付款表并匹配付款数据（华为原厂）
+def matchOrderYC(orderNum, payFilePath, df_origin, df_credit, df_noUsePay, creditDict, incentiveDict,
+                 lastPayDateDict, prepareFlag=False):
+    """
+    :param orderNum: 处理的下单合同号
+    :param payFilePath: 该合同号的“里程碑付款&调整台帐表”路径
+    :param df_origin: 华为原厂df（可只包含该合同号的数据），或其按"下单合同号"建立的分区索引
+    :param df_credit: 华为原厂授信数据df（可只包含该合同号的数据），或其按"下单合同号"建立的分区索引
+    :param df_noUsePay: 下单费用表中的剩余付款df（可只包含该合同号的数据），或其按"下单合同号"建立的分区索引
+    :param creditDict: 授信字典{合同号：[付款日期, 付款金额]}
+    :param incentiveDict: 使用激励字典{下单合同号: 使用激励金额}
+    :param lastPayDateDict: 已有的最新付款时间字典{下单合同号: 付款时间}
+    :param prepareFlag: 是否只汇总付款数据不匹配（用于matchPayDetailBatch批量匹配）
+    :return: 该下单合同号匹配付款后的结果df（prepareFlag为True时为preparePayDetail的结果）
+    """
+    # 读取付款表
+    df_payO = readPayTable(payFilePath)
+    df_payO["付款日期"] = df_payO["付款日期"].fillna(method="ffill")
+    # 获取该合同号的授信数据
+    df_orderCredit = getOrderPart(df_credit, orderNum)
+    # 下单数据匹配付款数据
+    if prepareFlag:
+        return preparePayDetail(orderNum, df_origin, df_payO, df_noUsePay, df_orderCredit, creditDict, lastPayDateDict,
+                                flag="华为原厂")
+    return matchPayDetail(orderNum, df_origin, df_payO, df_noUsePay, df_orderCredit, creditDict, payTableRenameDict,
+                          incentiveDict, lastPayDateDict, flag="华为原厂")
+
+
+# 筛选某下单合同号的超聚变付款数据并匹配
+def matchOrderCJB(orderNum, df_CJB, df_cjbAllPay, df_noUsePay, creditDictCJB, incentiveDictCJB, lastPayDateDict,
+                  prepareFlag=False):
+    """
+    :param orderNum: 处理的下单合同号
+    :param df_CJB: 超聚变下单df（可只包含该合同号的数据），或其按"下单合同号"建立的分区索引
+    :param df_cjbAllPay: 超聚变付款外挂表df（已重命名列，可只包含该合同号的数据），或其按"下单合同号"建立的分区索引
+    :param df_noUsePay: 下单费用表中的剩余付款df（可只包含该合同号的数据），或其按"下单合同号"建立的分区索引
+    :param creditDictCJB: 超聚变授信字典{华为合同号: [更改授信时间, 付款金额]}
+    :param incentiveDictCJB: 超聚变激励字典{华为合同号: 激励金额}
+    :param lastPayDateDict: 已有的最新付款时间字典{下单合同号: 付款时间}
+    :param prepareFlag: 是否只汇总付款数据不匹配（用于matchPayDetailBatch批量匹配）
+    :return: 该下单合同号匹配付款后的结果df（prepareFlag为True时为preparePayDetail的结果）
+    """
+    # 筛选出该下单合同号的付款数据
+    df_payO = getOrderPart(df_cjbAllPay, orderNum)
+    # 获取该合同号的授信数据（授信数据需要保证不含授信前付款）
+    df_orderCredit = df_payO.loc[df_payO["付款日期"].str[:10] >= creditDictCJB.get(orderNum, ["9999-12-31", ""])[0][:10]]
+    # 下单数据匹配付款数据
+    if prepareFlag:
+        return preparePayDetail(orderNum, df_CJB, df_payO, df_noUsePay, df_orderCredit, creditDictCJB, lastPayDateDict,
+                                flag="超聚变")
+    return matchPayDetail(orderNum, df_CJB, df_payO, df_noUsePay, df_orderCredit, creditDictCJB,
+                          payTableRenameDictCJB, incentiveDictCJB, lastPayDateDict, flag="超聚变")
+
+
+# 获取某下单合同号的数据（data为df时先按"下单合同号"建立分区索引，结果同df.loc[df["下单合同号"] == orderNum]）
+def getOrderPart(data, orderNum):
+    """
+    :param data: df，或buildPartIndex按"下单合同号"建立的分区索引
+    :param orderNum: 下单合同号
+    :return: 该下单合同号的子df（切片，需要修改时先copy）
+    """
+    if not isinstance(data, dict):
+        data = buildPartIndex(data, "下单合同号")
+    return getPart(data, orderNum)
+
+
+# 获取字典中某个key的子字典（key不存在时为空字典）
+def getSubDict(dict_, key):
+    return {key: dict_[key]} if key in dict_ else {}
+
+
+# 设置下单合同号的并行处理参数（uibot中调用）
+def setParallelConfig(enable, workers=0, chunkSize=20):
+    """
+    :param enable: 是否开启并行处理
+    :param workers: 进程数，<=0时为CPU核数
+    :param chunkSize: 每次提交给进程的合同号数量
+    :return:
+    """
+    global parallelFlag, parallelWorkers, parallelChunkSize
+    parallelFlag = bool(enable)
+    parallelWorkers = int(workers)
+    parallelChunkSize = max(int(chunkSize), 1)
+
+
+# 初始化子进程的全局配置（与主进程保持一致）
+def initParallelWorker(globalDict):
+    globals().update(globalDict)
+
+
+# 子进程中依次处理一组合同号，记录每个合同号的异常信息
+def runTaskChunk(matchFunc, chunk):
+    """
+    :param matchFunc: 单个下单合同号的处理方法
+    :param chunk: 任务列表[(下单合同号, 参数元组)]
+    :return: [(下单合同号, 结果df, 异常信息)]
+    """
+    resultList = []
+    for orderNum, args in chunk:
+        try:
+            resultList.append((orderNum, matchFunc(*args), ""))
+        except Exception:
+            resultList.append((orderNum, None, traceback.format_exc()))
+    return resultList
+
+
+# 多进程执行各下单合同号的匹配任务，结果按任务顺序返回（与串行处理顺序一致）
+def runOrderTasks(matchFunc, taskList):
+    """
+    :param matchFunc: 单个下单合同号的处理方法
+    :param taskList: 任务列表[(下单合同号, 参数元组)]
+    :return: 按taskList顺序排列的结果df列表
+    """
+    chunkList = [taskList[i:i + parallelChunkSize] for i in range(0, len(taskList), parallelChunkSize)]
+    workers = parallelWorkers if parallelWorkers > 0 else os.cpu_count()
+    globalDict = {key: globals()[key] for key in parallelGlobalKeys}
+    resultList = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=initParallelWorker, initargs=(globalDict,)) as executor:
+        futureList = [executor.submit(runTaskChunk, matchFunc, chunk) for chunk in chunkList]
+        for future in futureList:
+            resultList.extend(future.result())
+
+    # 汇总处理失败的合同号，记录日志后抛出异常
+    errorList = [(orderNum, errorMsg) for orderNum, _, errorMsg in resultList if errorMsg]
+    if len(errorList) != 0:
+        if logger:
+            for orderNum, errorMsg in errorList:
+                logger.error(f"下单合同号{orderNum}处理失败：\n{errorMsg}")
+        errorStr = "；".join([f"{orderNum}：{errorMsg.strip().splitlines()[-1]}" for orderNum, errorMsg in errorList])
+        raise Exception(f"共{len(errorList)}个下单合同号处理失败，{errorStr}")
+    return [resultDf for _, resultDf, _ in resultList]
+
+
 # 计算华为原厂数据的匹配结果
 def calDataStep_YC(df_origin, df_credit, incentiveDict, orderFileDict, df_noUsePay, HWOrderPathList, lastPayDateDict):
     """
@@ -1079,18 +2538,31 @@ def calDataStep_YC(df_origin, df_credit, incentiveDict, orderFileDict, df_noUseP
     #     df_originFinal = df_originFinal.append(df_origin_sx)
 
     # 处理数据
-    allOrder = set(df_origin["下单合同号"])
-    for orderNum in allOrder:
-        # 读取付款表
-        df_payO = pd.read_excel(orderFileDict[orderNum], header=8, dtype=str)[payTableRenameDict.keys()]
-        df_payO.rename(columns=payTableRenameDict, inplace=True)
-        df_payO["付款日期"] = df_payO["付款日期"].fillna(method="ffill")
-        # 获取该合同号的授信数据
-        df_orderCredit = df_credit.loc[df_credit["下单合同号"] == orderNum]
-        # 下单数据匹配付款数据
-        matchResultDf = matchPayDetail(orderNum, df_origin, df_payO, df_noUsePay, df_orderCredit, creditDict,
-                                       payTableRenameDict, incentiveDict, lastPayDateDict, flag="华为原厂")
-        df_originFinal = df_originFinal.append(matchResultDf)
+    # 按合同号建立分区索引，各合同号通过分区索引取数据（不需要每次筛选整个df）；
+    # 按数据中的顺序处理各合同号，每次运行的结果顺序相同（检查点的输入哈希不随运行变化）
+    originPart, creditPart, noUsePayPart = buildPartIndex(df_origin, "下单合同号"), buildPartIndex(
+        df_credit, "下单合同号"), buildPartIndex(df_noUsePay, "下单合同号")
+    allOrder = getPartKeys(originPart)
+    if parallelFlag:
+        # 并行模式：子进程中只传入该合同号相关的数据
+        taskList = []
+        for orderNum in allOrder:
+            taskList.append((orderNum, (
+                orderNum, orderFileDict[orderNum], getPart(originPart, orderNum), getPart(creditPart, orderNum),
+                getPart(noUsePayPart, orderNum), getSubDict(creditDict, orderNum), getSubDict(incentiveDict, orderNum),
+                getSubDict(lastPayDateDict, orderNum))))
+        matchResultList = runOrderTasks(matchOrderYC, taskList)
+    elif vecAllocateFlag:
+        # 向量化匹配引擎：逐个合同号汇总付款数据后，所有合同号一次匹配
+        prepareDict = {orderNum: matchOrderYC(orderNum, orderFileDict[orderNum], originPart, creditPart, noUsePayPart,
+                                              creditDict, incentiveDict, lastPayDateDict, prepareFlag=True)
+                       for orderNum in allOrder}
+        matchResultList = [matchPayDetailBatch(prepareDict, payTableRenameDict, incentiveDict)]
+    else:
+        matchResultList = [matchOrderYC(orderNum, orderFileDict[orderNum], originPart, creditPart, noUsePayPart,
+                                        creditDict, incentiveDict, lastPayDateDict) for orderNum in allOrder]
+    df_originFinal = pd.concat([df_originFinal] + matchResultList)
+    trimPayCache()
 
     # 对匹配到付款的下单数据（开单日期、付款日期有值）计算“下单费用等字段”
     df_temp = df_originFinal.loc[
@@ -1116,36 +2588,37 @@ def calDataStep2(df_temp, HWOrderPathList, analyzePath, flag):
     :return: 匹配后的df
     """
     # 计算“开单金额（含税）”列
-    df_temp["开单金额（含税）"] = df_temp.apply(lambda x: new_round(x["开单金额"] * (1 + x["实际税率"])), axis=1)
+    df_temp["开单金额（含税）"] = new_round(df_temp["开单金额"] * (1 + df_temp["实际税率"]))
     # 计算“核查”列
     df_temp["付款金额"] = pd.to_numeric(df_temp["付款金额"])
     df_temp["核查"] = df_temp["开单金额（含税）"] - df_temp["付款金额"]
     # 计算"付款天数差"
-    df_temp["付款天数差"] = (pd.to_datetime(df_temp["开单日期"].astype(str).str[:10]) - pd.to_datetime(
-        df_temp["付款日期"].astype(str).str[:10])).dt.days
+    df_temp["付款天数差"] = (toDateSeries(df_temp["开单日期"]) - toDateSeries(df_temp["付款日期"])).dt.days
 
     if flag == "华为原厂":
         # 超聚变数据传入的订单表路径字典为[]，“运输方式”从外挂表中去而不是华为订单表
         # 匹配"运输方式"
-        df_HWOrder = pd.DataFrame()
-        for path in HWOrderPathList:
-            orderTempDf = pd.read_excel(path, dtype=str).fillna("")
-            df_HWOrder = df_HWOrder.append(orderTempDf)
-        HWOrderDict = dict(zip(df_HWOrder["华为订单号"], df_HWOrder["运输方式"]))
+        registerHWOrderLookup(HWOrderPathList)
         # todo: 未找到的运输方式默认值
-        df_temp["运输方式"] = df_temp["下单合同号"].apply(lambda x: HWOrderDict.get(x, "自提"))
+        df_temp["运输方式"] = lookupValue("订单运输方式", df_temp["下单合同号"], "自提")
     elif flag == "超聚变":
-        df_saleDetail = pd.read_excel(analyzePath, sheet_name="销售明细", dtype=str)
-        transportDict = dict(zip(df_saleDetail["下单合同号"], df_saleDetail["运输方式"]))
+        registerSaleDetailLookup(analyzePath)
         # fixme: 实际上需要匹配运输方式的下单合同号就来源于销售明细中的数据，所以当期数据不会存在未匹配到的情况
-        df_temp["运输方式"] = df_temp["下单合同号"].apply(lambda x: transportDict.get(x, "自提"))
+        df_temp["运输方式"] = lookupValue("超聚变运输方式", df_temp["下单合同号"], "自提")
 
-    # 匹配"贷款利率"、"下单费用"、"扣款时间"、"扣款月份"
-    df_temp["贷款利率"] = df_temp.apply(matchRate, args=(flag,), axis=1)
-    df_temp["下单费用"] = df_temp.apply(matchCost, args=(flag,), axis=1)
-    df_temp["扣款时间"] = df_temp["开单日期"].apply(matchDeductTime)
-    df_temp["扣款月份"] = df_temp["开单日期"].apply(matchDeductMonth)
+    return applyCostRule(df_temp, flag)
 
+
+# 匹配"贷款利率"、"下单费用"、"扣款时间"、"扣款月份"（按costRuleDict，重新计算下单费用时同样使用）
+def applyCostRule(df_temp, flag):
+    """
+    :param df_temp: 已匹配付款的df（需要"事业部"、"付款天数差"、"运输方式"、"付款金额"、"开单日期"列）
+    :param flag: 处理的数据类型（华为原厂、鲲泰、超聚变）
+    :return: 匹配后的df
+    """
+    df_temp["贷款利率"] = matchRateArray(df_temp, flag)
+    df_temp["下单费用"] = matchCostArray(df_temp, flag)
+    df_temp["扣款时间"], df_temp["扣款月份"] = matchDeductArray(df_temp["开单日期"])
     return df_temp
 
 
@@ -1162,8 +2635,8 @@ def calDataStep_KT(df_analyze):
     df_KT["备注"] = ""
     df_KT["收据编号"] = ""
     df_KT["使用激励金额"] = ""
-    df_KT["付款日期"] = df_KT["开单日期"].apply(setPayTimeKT)
-    df_KT["付款金额"] = df_KT.apply(lambda x: new_round(x["开单金额"] * (1 + x["实际税率"])), axis=1)
+    df_KT["付款日期"] = setPayTimeKTArray(df_KT["开单日期"])
+    df_KT["付款金额"] = new_round(df_KT["开单金额"] * (1 + df_KT["实际税率"]))
     df_KT["运输方式"] = "汽运"
 
     # 对所有鲲泰数据计算“下单费用等字段”
@@ -1173,9 +2646,8 @@ def calDataStep_KT(df_analyze):
 
 # 处理鲲泰运输方式
 def transport_KT(df_ktFinal, ktOrderPath):
-    df_saleDetail = pd.read_excel(ktOrderPath, dtype=str)
-    transportDict = dict(zip(df_saleDetail["供货方编号"], df_saleDetail["运输方式"]))
-    df_ktFinal["运输方式"] = df_ktFinal["下单合同号"].apply(lambda x: transportDict.get(x, "汽运"))
+    registerKTOrderLookup(ktOrderPath)
+    df_ktFinal["运输方式"] = lookupValue("鲲泰运输方式", df_ktFinal["下单合同号"], "汽运")
     return df_ktFinal
 
 # 计算超聚变数据的匹配结果
@@ -1214,18 +2686,31 @@ def calDataStep_CJB(df_analyze, df_noUsePay, cjbPayDetailPath, lastPayDateDict,
     #     df_cjbFinal = df_cjbFinal.append(df_sjb_sx)
 
     # 处理数据
-    allOrder = set(df_CJB["下单合同号"])
+    # 按合同号建立分区索引，各合同号通过分区索引取数据（不需要每次筛选整个df）；
+    # 按数据中的顺序处理各合同号，每次运行的结果顺序相同（检查点的输入哈希不随运行变化）
     df_cjbAllPay = df_cjbAllPay[payTableRenameDictCJB.keys()].rename(columns=payTableRenameDictCJB)
-    for orderNum in allOrder:
-        # 筛选出该下单合同号的付款数据
-        df_payO = df_cjbAllPay.loc[(df_cjbAllPay["下单合同号"] == orderNum)]
-        # 获取该合同号的授信数据（授信数据需要保证不含授信前付款）
-        df_orderCredit = df_cjbAllPay.loc[(df_cjbAllPay["下单合同号"] == orderNum) & (
-                df_cjbAllPay["付款日期"].str[:10] >= creditDictCJB.get(orderNum, ["9999-12-31", ""])[0][:10])]
-        # 下单数据匹配付款数据
-        matchResultDf = matchPayDetail(orderNum, df_CJB, df_payO, df_noUsePay, df_orderCredit, creditDictCJB,
-                                       payTableRenameDictCJB, incentiveDictCJB, lastPayDateDict, flag="超聚变")
-        df_cjbFinal = df_cjbFinal.append(matchResultDf)
+    cjbPart, payPart, noUsePayPart = buildPartIndex(df_CJB, "下单合同号"), buildPartIndex(
+        df_cjbAllPay, "下单合同号"), buildPartIndex(df_noUsePay, "下单合同号")
+    allOrder = getPartKeys(cjbPart)
+    if parallelFlag:
+        # 并行模式：子进程中只传入该合同号相关的数据
+        taskList = []
+        for orderNum in allOrder:
+            taskList.append((orderNum, (
+                orderNum, getPart(cjbPart, orderNum), getPart(payPart, orderNum), getPart(noUsePayPart, orderNum),
+                getSubDict(creditDictCJB, orderNum), getSubDict(incentiveDictCJB, orderNum),
+                getSubDict(lastPayDateDict, orderNum))))
+        matchResultList = runOrderTasks(matchOrderCJB, taskList)
+    elif vecAllocateFlag:
+        # 向量化匹配引擎：逐个合同号汇总付款数据后，所有合同号一次匹配
+        prepareDict = {orderNum: matchOrderCJB(orderNum, cjbPart, payPart, noUsePayPart, creditDictCJB,
+                                               incentiveDictCJB, lastPayDateDict, prepareFlag=True)
+                       for orderNum in allOrder}
+        matchResultList = [matchPayDetailBatch(prepareDict, payTableRenameDictCJB, incentiveDictCJB)]
+    else:
+        matchResultList = [matchOrderCJB(orderNum, cjbPart, payPart, noUsePayPart, creditDictCJB, incentiveDictCJB,
+                                         lastPayDateDict) for orderNum in allOrder]
+    df_cjbFinal = pd.concat([df_cjbFinal] + matchResultList)
 
     # 对匹配到付款的下单数据（开单日期、付款日期有值）计算“下单费用等字段”
     df_temp = df_cjbFinal.loc[
@@ -1242,9 +2727,139 @@ def calDataStep_CJB(df_analyze, df_noUsePay, cjbPayDetailPath, lastPayDateDict,
     return df_cjbFinal, list(allOrder)
 
 
+# 鲲泰分支：计算鲲泰数据并处理运输方式
+def calDataBranch_KT(df_analyze, ktOrderPath):
+    return transport_KT(calDataStep_KT(df_analyze), ktOrderPath)
+
+
+# 设置华为原厂、鲲泰、超聚变分支的并行处理（uibot中调用）
+def setBranchParallelConfig(enable):
+    """
+    :param enable: 是否开启分支并行处理（三个分支同时在各自的子进程中执行）
+    :return:
+    """
+    global branchParallelFlag
+    branchParallelFlag = bool(enable)
+
+
+# 子进程中执行一个处理分支，记录异常信息
+def runBranchTask(branchName, funcName, args):
+    """
+    :param branchName: 分支名
+    :param funcName: 分支的处理方法名
+    :param args: 参数元组，为None时使用branchArgsDict中的参数（fork方式启动的子进程直接继承主进程的数据）
+    :return: (结果, 异常信息, 耗时（秒）)
+    """
+    startTime = datetime.now()
+    try:
+        args = branchArgsDict[branchName] if args is None else args
+        result = globals()[funcName](*args)
+        return result, "", (datetime.now() - startTime).total_seconds()
+    except Exception:
+        return None, traceback.format_exc(), (datetime.now() - startTime).total_seconds()
+
+
+# 多进程同时执行互不依赖的处理分支，全部分支结束后返回结果（各分支的异常分别记录）
+def runBranchTasks(branchDict):
+    """
+    :param branchDict: {分支名: (处理方法名, 参数元组)}
+    :return: {分支名: 结果}
+    """
+    global branchArgsDict
+    # 支持fork时，子进程直接继承参数数据，不需要序列化传递
+    forkFlag = "fork" in multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if forkFlag else "spawn")
+    globalDict = {key: globals()[key] for key in branchGlobalKeys}
+    branchArgsDict = {branchName: args for branchName, (_, args) in branchDict.items()} if forkFlag else {}
+    resultDict, errorList = {}, []
+    try:
+        with ProcessPoolExecutor(max_workers=len(branchDict), mp_context=context, initializer=initParallelWorker,
+                                 initargs=(globalDict,)) as executor:
+            futureDict = {branchName: executor.submit(runBranchTask, branchName, funcName,
+                                                      None if forkFlag else args)
+                          for branchName, (funcName, args) in branchDict.items()}
+            for branchName, future in futureDict.items():
+                try:
+                    result, errorMsg, seconds = future.result()
+                except Exception:
+                    # 子进程异常退出
+                    result, errorMsg, seconds = None, traceback.format_exc(), 0
+                if errorMsg:
+                    errorList.append((branchName, errorMsg))
+                    continue
+                resultDict[branchName] = result
+                if logger:
+                    logger.info(f"{branchName}分支处理完成，耗时{seconds:.1f}秒")
+    finally:
+        branchArgsDict = {}
+
+    # 汇总处理失败的分支，记录日志后抛出异常
+    if len(errorList) != 0:
+        if logger:
+            for branchName, errorMsg in errorList:
+                logger.error(f"{branchName}分支处理失败：\n{errorMsg}")
+        errorStr = "；".join([f"{branchName}：{errorMsg.strip().splitlines()[-1]}" for branchName, errorMsg in errorList])
+        raise Exception(f"共{len(errorList)}个分支处理失败，{errorStr}")
+    return resultDict
+
+
+# 计算华为原厂、鲲泰、超聚变数据的匹配结果（branchParallelFlag为True时三个分支同时在子进程中执行）
+def calDataBranches(initResultDict, initOrderDict, df_credit, incentiveDict, orderFileDict, HWOrderPathList,
+                    ktOrderPath, cjbPayDetailPath, analyzePath):
+    """
+    :param initResultDict: getOriginOrderData的返回结果
+    :param initOrderDict: initDownLoadOrder的返回结果
+    :param df_credit: 华为原厂授信数据df
+    :param incentiveDict: 激励、授信记录字典
+    :param orderFileDict: {下单合同号: 里程碑付款&调整台帐表路径}
+    :param HWOrderPathList: 华为订单表路径列表
+    :param ktOrderPath: 鲲泰订单跟踪表路径
+    :param cjbPayDetailPath: 超聚变付款外挂表路径
+    :param analyzePath: 毛利分析结果表路径
+    :return: {"华为原厂": [华为原厂df结果数据, 华为原厂数据的下单合同号列表], "鲲泰": 鲲泰df结果数据,
+              "超聚变": [超聚变df结果数据, 超聚变数据的下单合同号列表]}
+    """
+    branchDict = {
+        "华为原厂": ("calDataStep_YC", (initOrderDict["华为原厂df"].copy(), df_credit, incentiveDict, orderFileDict,
+                                    initResultDict["剩余付款df"], HWOrderPathList, initResultDict["最新付款时间dict"])),
+        "鲲泰": ("calDataBranch_KT", (initResultDict["下单df"], ktOrderPath)),
+        "超聚变": ("calDataStep_CJB", (initResultDict["下单df"], initResultDict["剩余付款df"], cjbPayDetailPath,
+                                    initResultDict["最新付款时间dict"], analyzePath))}
+    if not branchParallelFlag:
+        return {branchName: globals()[funcName](*args) for branchName, (funcName, args) in branchDict.items()}
+    return runBranchTasks(branchDict)
+
+
+# 按最新的订单表重新匹配已处理的华为原厂数据的“运输方式”，运输方式变化的数据重新计算下单费用
+def refreshOrderTransport(df_base, orderSet, HWOrderPathList):
+    """
+    :param df_base: 下单费用表中已处理df
+    :param orderSet: 订单表有新增或变化的下单合同号集合
+    :param HWOrderPathList: 华为订单表路径列表
+    :return: 更新后的已处理df（运输方式未变化时为原df）
+    """
+    calMask = df_base["下单合同号"].isin(orderSet) & df_base["采购类型"].isin(['服务', '原厂下单']) & (
+        ~df_base["开单日期"].isna()) & (~df_base["付款日期"].isna()) & (df_base["付款日期"] != "未付款")
+    if not calMask.any():
+        return df_base
+    registerHWOrderLookup(HWOrderPathList)
+    df_base = df_base.reset_index(drop=True)
+    calMask = calMask.values
+    transport = lookupValue("订单运输方式", df_base.loc[calMask, "下单合同号"], "自提")
+    changeIndex = transport.index[(transport != df_base.loc[calMask, "运输方式"]).values]
+    if changeIndex.empty:
+        return df_base
+    df_ = df_base.loc[changeIndex].copy()
+    df_["运输方式"] = transport[changeIndex]
+    df_["付款天数差"] = pd.to_numeric(df_["付款天数差"])
+    df_["付款金额"] = pd.to_numeric(df_["付款金额"])
+    df_base.loc[changeIndex] = applyCostRule(df_, "华为原厂")
+    return df_base
+
+
 # 合并基础数据和处理的数据
 def finishOperateAndSave(df_base, df_originFinal, df_ktFinal, df_cjbFinal, df_noUsePay, orderList_YC, orderList_CJB,
-                         saveDir, analyzePath, orderCostPath):
+                         saveDir, analyzePath, orderCostPath, HWOrderPathList=None):
     """
     :param df_base: 下单费用表中已处理df
     :param df_originFinal: 华为原厂df结果数据
@@ -1256,14 +2871,60 @@ def finishOperateAndSave(df_base, df_originFinal, df_ktFinal, df_cjbFinal, df_no
     :param saveDir: 结果文件保存目录
     :param analyzePath: 毛利分析结果表路径
     :param orderCostPath: 下单费用表路径
+    :param HWOrderPathList: 本地订单表路径列表（订单表增量模式时传入，上次结果之后订单有变化的已处理数据重新匹配运输方式）
+    :return: 下单费用结果表保存路径
+    """
+    # 上次生成下单费用表（台账）之后订单表有新增或变化的合同号
+    changedSet = set()
+    lastPath = ledgerDbPath or orderCostPath
+    if orderStoreDir and HWOrderPathList and os.path.exists(lastPath):
+        changedSet = getChangedOrders(datetime.fromtimestamp(os.path.getmtime(lastPath)))
+    touchOrder = []
+    if ledgerDbPath:
+        # 台账模式：只读取本次涉及的合同号（结果数据、未付款、剩余付款的合同号）的已处理数据
+        conn = openLedger()
+        try:
+            ledgerOrder = set([i[0] for i in conn.execute(
+                "SELECT DISTINCT 下单合同号 FROM 下单费用 WHERE 分类 IN ('未付款', '剩余付款')")])
+            touchOrder = list(ledgerOrder | changedSet | set(pd.concat(
+                [df_originFinal, df_ktFinal, df_cjbFinal, df_noUsePay])["下单合同号"].dropna()))
+            df_base = pd.concat([pd.DataFrame(columns=resultColadd)] + [readLedgerRows(
+                conn, f"分类 = '已处理' AND 下单合同号 IN ({','.join(['?'] * len(touchOrder[i:i + 500]))})",
+                touchOrder[i:i + 500]) for i in range(0, len(touchOrder), 500)])
+        finally:
+            conn.close()
+        df_base["备注"] = df_base["备注"].fillna("")
+    if changedSet:
+        df_base = refreshOrderTransport(df_base, changedSet, HWOrderPathList)
+
+    matchResult = {"已处理df": df_base, "华为原厂df": df_originFinal, "鲲泰df": df_ktFinal, "超聚变df": df_cjbFinal,
+                   "剩余付款df": df_noUsePay, "华为原厂合同号": orderList_YC, "超聚变合同号": orderList_CJB,
+                   "台账合同号": touchOrder, "毛利分析结果表路径": analyzePath, "下单费用表路径": orderCostPath}
+    timestamp = int(datetime.now().timestamp())
+    if matchResultFlag:
+        # 保存匹配结果，费用规则变化时通过recostOrderCost重新计算，不需要重新匹配付款
+        saveMatchResult(matchResult, saveDir, timestamp)
+    return saveOrderCostResult(matchResult, saveDir, timestamp)
+
+
+# 合并匹配结果，生成下单费用结果表（台账模式下同时更新台账）
+def saveOrderCostResult(matchResult, saveDir, timestamp, sourceNote=""):
+    """
+    :param matchResult: 匹配结果字典（同saveMatchResult）
+    :param saveDir: 结果文件保存目录
+    :param timestamp: 结果文件名中的时间戳
+    :param sourceNote: 写入表源文件说明的补充内容（如重新计算使用的匹配结果文件）
     :return: 下单费用结果表保存路径
     """
+    df_base, df_noUsePay = matchResult["已处理df"], matchResult["剩余付款df"]
+    analyzePath, orderCostPath = matchResult["毛利分析结果表路径"], matchResult["下单费用表路径"]
     # 可能存在部分合同号，本次无下单数据但有剩余付款，需要将这部分添加到原数据中
-    alreadyMatchOrder = orderList_YC + orderList_CJB
-    df_noUsePay.drop(df_noUsePay[df_noUsePay["下单合同号"].isin(alreadyMatchOrder)].index, inplace=True)
+    alreadyMatchOrder = matchResult["华为原厂合同号"] + matchResult["超聚变合同号"]
+    df_noUsePay = df_noUsePay.loc[~df_noUsePay["下单合同号"].isin(alreadyMatchOrder)]
 
     # 合并数据
-    finialDf = pd.concat([df_base, df_originFinal, df_ktFinal, df_cjbFinal, df_noUsePay]).reset_index(drop=True)
+    finialDf = pd.concat([df_base, matchResult["华为原厂df"], matchResult["鲲泰df"], matchResult["超聚变df"],
+                          df_noUsePay]).reset_index(drop=True)
     finialDf["使用激励金额"] = pd.to_numeric(finialDf["使用激励金额"], errors="coerce")
 
     # 将使用激励金额的数据筛选出来，同一个下单合同号只保留最新的使用激励金额（将第一次使用激励数据的金额进行更新）
@@ -1293,27 +2954,134 @@ def finishOperateAndSave(df_base, df_originFinal, df_ktFinal, df_cjbFinal, df_no
             finialDf.drop(index, inplace=True)
 
     # 将使用的毛利分析和下单费用基础表保存在标识文件中
-    timestamp = int(datetime.now().timestamp())
     resultPathFlag = os.path.join(saveDir, f"下单费用{timestamp}表源文件说明.txt")
     with open(resultPathFlag, "w") as f:
         writeStr = f"使用的毛利分析结果表路径为-{analyzePath}\n使用的下单费用基础表路径为-{orderCostPath}"
-        f.write(writeStr)
+        f.write(writeStr + (f"\n{sourceNote}" if sourceNote else ""))
 
     # 将结果数据保存在下单费用结果路径
     resultPath = os.path.join(saveDir, f"下单费用{timestamp}.xlsx")
-    finialDf.to_excel(resultPath, sheet_name="下单费用", index=False)
+    if ledgerDbPath:
+        # 台账模式：只写入本次涉及合同号中新增或变化的数据，再导出为下单费用表（默认只导出这些数据，耗时不随历史数据增长）
+        conn = openLedger()
+        try:
+            lastRowNum = conn.execute("SELECT COALESCE(MAX(行号), 0) FROM 下单费用").fetchone()[0]
+            saveLedgerRows(conn, finialDf, matchResult["台账合同号"])
+        finally:
+            conn.close()
+        exportLedger(resultPath, 0 if ledgerFullExportFlag else lastRowNum)
+    elif styledWriteFlag:
+        saveStyledResult(finialDf, resultPath)
+    else:
+        finialDf.to_excel(resultPath, sheet_name="下单费用", index=False)
 
     # 清理内存
     gc.collect()
     return resultPath
 
 
+# 保存匹配结果（pickle文件及说明json），文件名中的时间戳与下单费用结果表相同
+def saveMatchResult(matchResult, saveDir, timestamp):
+    """
+    :param matchResult: 匹配结果字典{"已处理df", "华为原厂df", "鲲泰df", "超聚变df", "剩余付款df", "华为原厂合同号", "超聚变合同号",
+                        "台账合同号", "毛利分析结果表路径", "下单费用表路径"}
+    :param saveDir: 结果文件保存目录（匹配结果保存在其中的“匹配结果”文件夹）
+    :param timestamp: 时间戳
+    :return: 匹配结果文件路径
+    """
+    resultDir = os.path.join(saveDir, "匹配结果")
+    if not os.path.exists(resultDir):
+        os.makedirs(resultDir)
+    matchPath = os.path.join(resultDir, f"匹配结果{timestamp}.pkl")
+    content = {"版本": matchResultVersion, "生成时间": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+               "费用规则": costRuleDict, "台账模式": bool(ledgerDbPath), "数据": matchResult}
+    tempPath = f"{matchPath}.{os.getpid()}.tmp"
+    pd.to_pickle(content, tempPath)
+    os.replace(tempPath, matchPath)
+    infoDict = {key: value for key, value in content.items() if key != "数据"}
+    infoDict["行数"] = {key: len(value) for key, value in matchResult.items() if isinstance(value, pd.DataFrame)}
+    writeCacheFile(matchPath.replace(".pkl", ".json"), json.dumps(infoDict, ensure_ascii=False, indent=2))
+    return matchPath
+
+
+# 读取匹配结果
+def readMatchResult(matchPath):
+    """
+    :param matchPath: 匹配结果文件路径
+    :return: 匹配结果文件内容{"版本", "生成时间", "费用规则", "台账模式", "数据": 匹配结果字典}
+    """
+    content = pd.read_pickle(matchPath)
+    if content.get("版本") != matchResultVersion:
+        raise Exception(f"匹配结果文件版本为{content.get('版本')}，当前版本为{matchResultVersion}，需要重新运行流程生成：{matchPath}")
+    if content["台账模式"] != bool(ledgerDbPath):
+        raise Exception(f"匹配结果文件与当前是否使用台账（ledgerDbPath）不一致：{matchPath}")
+    return content
+
+
+# 设置下单费用的计算规则（uibot中调用，只需传入需要修改的项）
+def setCostRule(ruleDict):
+    """
+    :param ruleDict: 需要修改的规则，如{"超期利率": 0.08, "区域宽限天数": 20}，可修改的项见costRuleDict
+    :return: 修改后的规则字典
+    """
+    unknownKey = [key for key in ruleDict if key not in costRuleDict]
+    if unknownKey:
+        raise Exception(f"未知的费用规则：{unknownKey}，可设置的规则为：{list(costRuleDict.keys())}")
+    costRuleDict.update(ruleDict)
+    return costRuleDict
+
+
+# 使用保存的匹配结果，按当前费用规则重新计算"贷款利率"、"下单费用"、"扣款时间"、"扣款月份"，生成新的下单费用结果表（不重新匹配付款）
+def recostOrderCost(matchPath, ruleDict=None, saveDir=""):
+    """
+    :param matchPath: 匹配结果文件路径（saveMatchResult生成）
+    :param ruleDict: 需要修改的费用规则（同setCostRule，只在本次重新计算时使用，结束后恢复原规则），为None时使用当前规则
+    :param saveDir: 结果文件保存目录，为空时保存在匹配结果文件夹的上级目录
+    :return: 下单费用结果表保存路径
+    """
+    lastRuleDict = dict(costRuleDict)
+    try:
+        if ruleDict:
+            setCostRule(ruleDict)
+        return recostMatchResult(matchPath, saveDir)
+    finally:
+        costRuleDict.clear()
+        costRuleDict.update(lastRuleDict)
+
+
+# 按当前费用规则重新计算匹配结果中的下单费用并保存（recostOrderCost调用）
+def recostMatchResult(matchPath, saveDir):
+    """
+    :param matchPath: 匹配结果文件路径（saveMatchResult生成）
+    :param saveDir: 结果文件保存目录，为空时保存在匹配结果文件夹的上级目录
+    :return: 下单费用结果表保存路径
+    """
+    matchResult = dict(readMatchResult(matchPath)["数据"])
+    # 华为原厂、超聚变只计算匹配到付款的数据，鲲泰计算全部数据（规则同calDataStep_YC、calDataStep_CJB、calDataStep_KT）
+    for key, flag in [("华为原厂df", "华为原厂"), ("鲲泰df", "鲲泰"), ("超聚变df", "超聚变")]:
+        df_ = matchResult[key].copy()
+        if df_.empty:
+            continue
+        if flag == "鲲泰":
+            df_ = applyCostRule(df_, flag)
+        else:
+            calMask = (~df_["开单日期"].isna()) & (~df_["付款日期"].isna()) & (df_["付款日期"] != "未付款")
+            df_.loc[calMask] = applyCostRule(df_.loc[calMask].copy(), flag)
+        matchResult[key] = df_
+    saveDir = saveDir or os.path.dirname(os.path.dirname(os.path.abspath(matchPath)))
+    return saveOrderCostResult(matchResult, saveDir, int(datetime.now().timestamp()),
+                               f"按费用规则{json.dumps(costRuleDict, ensure_ascii=False)}重新计算，使用的匹配结果为-{matchPath}")
+
+
 # 设置下单费用结果表格式
 def setStyle(finalPath):
     """
     :param finalPath: 下单费用结果表路径
     :return:
     """
+    # 结果表写入时已设置格式
+    if styledWriteFlag:
+        return
 
     app = xw.App(visible=True, add_book=False)
     # app.display_alerts = False
@@ -1404,6 +3172,48 @@ def setStyle(finalPath):
     app.quit()
 
 
+# 写入带格式的下单费用结果表（格式同setStyle，流式写入，不需要打开Excel）
+def saveStyledResult(finialDf, resultPath):
+    """
+    :param finialDf: 下单费用结果数据
+    :param resultPath: 下单费用结果表路径
+    :return: 下单费用结果表路径
+    """
+    columns = list(finialDf.columns)
+    # setStyle设置格式的范围为resultCol对应的列，其余列（如市场类型）保持默认格式
+    styleColList = [col for col in columns if col in resultCol]
+    font = Font(name="微软雅黑", size=9)
+    colStyleDict = {col: {"font": font, "number_format": "General"} for col in styleColList}
+    for col in ["下单合同号", "销售员编码", "收据编号"]:
+        colStyleDict[col]["number_format"] = "@"
+    for col, numberFormat in {"付款金额": "#,##0_ ", "开单金额": "#,##0_ ", "开单金额（含税）": "#,##0_ ",
+                              "贷款利率": "0.00%", "实际税率": "0.00", "核查": "#,##0_);[Red](#,##0)",
+                              "下单费用": "#,##0_);[Red](#,##0)", "使用激励金额": "#,##0_);[Red](#,##0)",
+                              "付款日期": "yyyy/m/d", "开单日期": "yyyy/m/d"}.items():
+        if col in colStyleDict:
+            colStyleDict[col]["number_format"] = numberFormat
+
+    # 表头：背景色按列区间设置，字体黑色不加粗，保留边框、居中
+    border = Border(left=Side(style="thin"), right=Side(style="thin"), top=Side(style="thin"),
+                    bottom=Side(style="thin"))
+    alignment = Alignment(horizontal="center", vertical="top")
+    headerStyleDict = {col: {"font": Font(bold=True), "border": border, "alignment": alignment} for col in columns}
+    # 平台及之前的列、收据编号~付款金额、开单日期~开单金额（含税）、核查~最后一列
+    colorList = [("平台", "B4C6E7"), ("付款金额", "C6E0B4"), ("开单金额（含税）", "FFC000"), (resultCol[-1], "B4C6E7")]
+    colorIndexList = [(resultCol.index(col), color) for col, color in colorList]
+    for col in styleColList:
+        color = [color for index, color in colorIndexList if resultCol.index(col) <= index][0]
+        headerStyleDict[col] = {"font": Font(name="微软雅黑", size=9, color="FF000000"), "border": border,
+                                "alignment": alignment, "fill": PatternFill("solid", fgColor=color)}
+
+    widthDict = {col: 10 for col in columns}
+    widthDict.update({col: 15 for col in ["下单合同号", "项目名称", "客户名称"]})
+    textColList = ["下单合同号", "销售员编码", "收据编号"]
+    return writeStyledSheet(finialDf, resultPath, "下单费用", colStyleDict, headerStyleDict, widthDict,
+                            hiddenColList=["最新付款日期"], freezeCell="A2",
+                            convertColList=[col for col in columns if col not in textColList])
+
+
 """
 companySimpleDict:供应商名称字典
 filterCol:毛利分析结果表中需要筛选的列名列表
@@ -1413,6 +3223,46 @@ creditPayTableRenameDict：华为原厂数据的授信付款外挂表中需要
 payTableRenameDictCJB：超聚变付款外挂表中需要重命名的列名字典(同时key为需要操作的列名)
 resultCol：下单费用结果表的列名列表
 matchFlag：用于防止df.apply对第一条数据重复操作
+vecAllocateFlag：matchPayInfo是否使用向量化匹配引擎allocatePayments（False时使用原逐行匹配逻辑）
+parallelFlag：calDataStep_YC、calDataStep_CJB是否多进程并行处理各下单合同号（通过setParallelConfig设置）
+parallelWorkers：并行处理的进程数，<=0时为CPU核数
+parallelChunkSize：并行处理时每次提交给进程的合同号数量
+parallelGlobalKeys：并行处理时需要同步到子进程的全局变量名
+payCacheDir：“里程碑付款&调整台帐表”解析缓存文件夹，为空时不使用缓存（通过setPayCacheConfig设置）
+payCacheMaxSize：解析缓存的总大小上限（字节）
+payCacheMaxFp：解析缓存中保留的文件指纹数量上限
+accountCompanyDict：华为订单表文件名中的账号对应的公司简称
+ledgerDbPath：下单费用台账（sqlite）路径，为空时每次读取完整的下单费用表（首次使用台账时从下单费用表导入）
+ledgerNumCol：下单费用台账导出时按数值写入的列
+ledgerFullExportFlag：台账模式下结果表是否导出台账的全部数据（耗时随历史数据增长），为False时只导出本次新增或变化的数据
+headlessNoteFlag：initAnalyzeNoteText是否不打开Excel直接修改xlsx文件（False时通过Excel逐个单元格处理）
+lookupSourceDict：查找表的数据来源{来源名: [来源标识, 读取方法, 已读取的映射字典]}，按最近使用的顺序排列（来源名固定，
+                  同名来源重新注册时替换）
+lookupSourceMaxNum：同时保留已读取映射字典的来源数量上限，超出时释放最久未使用的，<=0时不限制
+lookupMapSource：查找表映射名对应的数据来源名
+lookupStatDict：查找表的命中、未命中次数{映射名: {"命中": 次数, "未命中": 次数}}
+profileStageList：enableStageProfile统计的阶段方法名列表
+orderStoreDir：本地订单表（按账号合并的华为订单表）文件夹，为空时每次下载近2年的订单表（不使用增量模式）
+orderOverlapDays：增量下载订单表时，从最近同步日期往前多下载的天数（用于更新近期变化的订单）
+orderKeyCol：本地订单表合并数据的键（列名）
+orderDateCol：本地订单表中订单日期的列名（合并时清理近2年之前的订单），为空时按订单号的变化时间清理
+orderSyncLogNum：本地订单表说明文件中保留的同步记录数量
+yjManifestDir：业绩表清单（各账号、年份业绩表的行指纹）文件夹，为空时不校验（后续步骤按原规则处理全部下载的业绩表）
+reportStoreDir：本地报表库（订单全字段报表、物料移动明细汇总、预提表按报表类型、账号、下载日期分区保存）目录，为空时使用原汇总表
+reportExportFlag：本地报表库模式下updateAllFieldFile是否导出汇总表（兼容原汇总表的使用方式，每次导出该账号的全部数据；
+                  为False时原汇总表不更新）
+styledWriteFlag：下单费用结果表是否在写入时直接设置格式（不需要通过Excel执行setStyle）
+validateParallelMinNum：validatePayFileDir使用多进程校验的最少文件数
+costRuleDict：下单费用的计算规则：基础利率、超期利率（付款天数差超过宽限天数且运输方式为超期运输方式时）、区域事业部及其宽限天数、
+              服务事业部及其宽限天数、鲲泰利率（通过setCostRule修改）
+matchResultFlag：finishOperateAndSave是否保存匹配结果（用于费用规则变化时通过recostOrderCost重新计算，不需要重新匹配付款）
+matchResultVersion：匹配结果文件的版本，匹配结果的内容结构变化时修改
+branchParallelFlag：calDataBranches是否将华为原厂、鲲泰、超聚变三个分支同时在子进程中处理（通过setBranchParallelConfig设置）
+branchGlobalKeys：分支并行处理时需要同步到子进程的全局变量名（spawn方式启动子进程时使用）
+branchArgsDict：分支并行处理时各分支的参数（fork方式启动的子进程直接继承）
+checkpointStageList：enableCheckpoint使用检查点的阶段方法名列表（setStyle直接修改结果表，不使用检查点）
+checkpointConfigList：影响阶段输出的全局变量名列表，值变化时阶段重新执行
+checkpointKeepNum：每个阶段保留的检查点数量
 logger：用于打印日志
 """
 companySimpleDict = {"城投": "广州城投信息科技有限公司", "合神": "合肥神州数码有限公司", "北神": "北京神州数码有限公司"}
@@ -1430,6 +3280,52 @@ resultCol = ['供应商名称', '下单合同号', '项目名称', '客户名称
              '产品线', '特殊备注', '采购类型', "最新付款日期"]
 resultColadd = resultCol + ["市场类型"]
 matchFlag = False
+vecAllocateFlag = True
+parallelFlag = False
+parallelWorkers = 0
+parallelChunkSize = 20
+parallelGlobalKeys = ["vecAllocateFlag", "payCacheDir", "payCacheMaxSize", "costRuleDict"]
+payCacheDir = ""
+payCacheMaxSize = 500 * 1024 * 1024
+payCacheMaxFp = 20000
+accountCompanyDict = {"13544480167": "城投", "hfszsm": "合神", "szshbj": "北神"}
+ledgerDbPath = ""
+ledgerNumCol = ["付款金额", "开单金额", "实际税率", "开单金额（含税）", "核查", "使用激励金额", "付款天数差", "贷款利率", "下单费用"]
+ledgerFullExportFlag = False
+headlessNoteFlag = False
+lookupSourceDict = {}
+lookupSourceMaxNum = 3
+lookupMapSource = {}
+lookupStatDict = {}
+profileStageList = ["initAnalyzeNoteText", "getOriginOrderData", "initDownLoadOrder", "validCreditData",
+                    "calDataStep_YC", "calDataStep_KT", "transport_KT", "calDataStep_CJB", "finishOperateAndSave",
+                    "setStyle"]
+orderStoreDir = ""
+orderOverlapDays = 7
+orderKeyCol = "华为订单号"
+orderDateCol = ""
+orderSyncLogNum = 30
+yjManifestDir = ""
+reportStoreDir = ""
+reportExportFlag = True
+styledWriteFlag = True
+validateParallelMinNum = 50
+costRuleDict = {"基础利率": 0.055, "超期利率": 0.09, "超期运输方式": ["汽运", "空运"],
+                "区域事业部": ["北区", "南区", "超聚变及商业分销", "新业务"], "区域宽限天数": 15, "服务事业部": "服务事业部",
+                "服务宽限天数": 8, "鲲泰利率": 0.055}
+matchResultFlag = True
+matchResultVersion = 1
+branchParallelFlag = False
+branchGlobalKeys = parallelGlobalKeys + ["parallelFlag", "parallelWorkers", "parallelChunkSize", "headlessNoteFlag",
+                                         "styledWriteFlag", "lookupSourceMaxNum"]
+branchArgsDict = {}
+checkpointStageList = ["initAnalyzeNoteText", "getOriginOrderData", "initDownLoadOrder", "validCreditData",
+                       "calDataStep_YC", "calDataStep_KT", "transport_KT", "calDataStep_CJB", "finishOperateAndSave"]
+checkpointConfigList = ["companySimpleDict", "filterCol", "renameColDict", "payTableRenameDict",
+                        "creditPayTableRenameDict", "payTableRenameDictCJB", "resultCol", "resultColadd",
+                        "vecAllocateFlag", "accountCompanyDict", "ledgerDbPath", "ledgerFullExportFlag", "headlessNoteFlag",
+                        "orderStoreDir", "styledWriteFlag", "costRuleDict", "matchResultFlag"]
+checkpointKeepNum = 3
 logger = None
 
 if __name__ == "__main__":
@@ -1450,15 +3346,18 @@ if __name__ == "__main__":
                     }
     g_dictGlobal["incentiveRecordPath"] = getIncentiveRecordPath(g_dictGlobal["文件下载路径"])
     print(g_dictGlobal["incentiveRecordPath"])
-    list_ = getSameFormatFile(g_dictGlobal["文件下载路径"] + "\\里程碑付款&调整台帐表", "里程碑付款&调整台帐表")
-    orderFileDict = {}
-    for i in list_:
-        k = os.path.basename(i).split("_")[1]
-        orderFileDict[k] = i
-    print(len(orderFileDict))
-    orderFileList = getSameFormatFile(g_dictGlobal["文件下载路径"], "订单表")
+    # 校验下载的里程碑付款表（只读取C5单元格的下单合同号），按文件内容中的下单合同号生成orderFileDict
+    payFileManifest = validatePayFileDir(os.path.join(g_dictGlobal["文件下载路径"], "里程碑付款&调整台帐表"),
+                                         manifestPath=os.path.join(g_dictGlobal["文件下载路径"], "里程碑付款表校验清单.json"))
+    orderFileDict = payFileManifest["有效"]
+    print(len(orderFileDict), len(payFileManifest["不一致"]), len(payFileManifest["损坏"]))
+    # 订单表增量模式（orderStoreDir不为空）时，下载后先通过mergeOrderTable合并，再使用本地订单表
+    orderFileList = getOrderStorePathList() if orderStoreDir else getSameFormatFile(g_dictGlobal["文件下载路径"], "订单表")
     print(len(orderFileList))
 
+    # 开启阶段检查点：中途失败后重新运行时，输入未变化的阶段直接读取上次的输出（forceStageList中的阶段强制重新执行）
+    enableCheckpoint(os.path.join(g_dictGlobal["结果保存路径"], "检查点"), forceStageList=[])
+
     g_analyzePath = initAnalyzeNoteText(orderFileList, g_analyzePath)
 
     # 读取下单费用表和毛利分析结果表，返回字典{"下单df": 下单数据df, "已处理df": 已处理的下单数据df, "剩余付款df": 未处理的付款数据df}
@@ -1472,27 +3371,22 @@ if __name__ == "__main__":
     # 校验授信付款外挂表数据完整性，若存在授信的合同但外挂表中无对应数据，将这些数据保存并抛出异常, 返回：华为原厂授信数据df
     df_credit = validCreditData(g_incentiveDict, g_dictGlobal["授信付款外挂表路径"], g_dictGlobal["结果保存路径"])
 
-    # 处理"华为原厂"数据，返回列表[华为原厂df结果数据，华为原厂数据的下单合同号列表]
-    ycResultDict = calDataStep_YC(initOrderDict["华为原厂df"].copy(), df_credit, g_incentiveDict, orderFileDict,
-                                  initResultDict["剩余付款df"], orderFileList, initResultDict["最新付款时间dict"])
-    df_originFinal = ycResultDict[0]
-    orderList_YC = ycResultDict[1]
-
-    # 处理"鲲泰"数据，返回：鲲泰df结果数据
-    df_ktFinal = calDataStep_KT(initResultDict["下单df"])
-    df_ktFinal = transport_KT(df_ktFinal, g_dictGlobal["鲲泰订单跟踪表路径"])
-
-    # 处理"超聚变"数据，返回列表[超聚变df结果数据，超聚变数据的下单合同号列表]
-    cjbResultDict = calDataStep_CJB(initResultDict["下单df"], initResultDict["剩余付款df"],
-                                    g_dictGlobal["超聚变付款外挂表路径"],
-                                    initResultDict["最新付款时间dict"], g_analyzePath)
-    df_cjbFinal = cjbResultDict[0]
-    orderList_CJB = cjbResultDict[1]
+    # 处理"华为原厂"、"鲲泰"、"超聚变"数据（branchParallelFlag为True时三个分支同时处理），
+    # 返回{"华为原厂": [华为原厂df结果数据，华为原厂数据的下单合同号列表], "鲲泰": 鲲泰df结果数据, "超聚变": [超聚变df结果数据，超聚变数据的下单合同号列表]}
+    branchResultDict = calDataBranches(initResultDict, initOrderDict, df_credit, g_incentiveDict, orderFileDict,
+                                       orderFileList, g_dictGlobal["鲲泰订单跟踪表路径"],
+                                       g_dictGlobal["超聚变付款外挂表路径"], g_analyzePath)
+    df_originFinal, orderList_YC = branchResultDict["华为原厂"]
+    df_ktFinal = branchResultDict["鲲泰"]
+    df_cjbFinal, orderList_CJB = branchResultDict["超聚变"]
 
     # 合并基础数据和处理的数据，返回"下单费用结果表"路径
     resultPath = finishOperateAndSave(initResultDict["已处理df"], df_originFinal, df_ktFinal, df_cjbFinal,
                                       initResultDict["剩余付款df"], orderList_YC, orderList_CJB,
-                                      g_dictGlobal["结果保存路径"], g_analyzePath, g_orderCostPath)
+                                      g_dictGlobal["结果保存路径"], g_analyzePath, g_orderCostPath,
+                                      orderFileList if orderStoreDir else None)
+
+    print(finishCheckpoint())
 
     # 设置下单费用结果表格式
     setStyle(resultPath)
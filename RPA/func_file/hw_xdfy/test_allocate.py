@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+向量化匹配引擎（allocatePayments、matchPayDetailBatch）与原逐行匹配逻辑（vecAllocateFlag=False）的结果对比：
+    python -m pytest RPA/func_file/hw_xdfy/test_allocate.py -q
+"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import func
+
+pytestmark = pytest.mark.filterwarnings("ignore::FutureWarning")
+
+orderNum = "1Y01000000006F"
+orderCol = ["下单合同号", "开单日期", "开单金额", "实际税率", "付款日期", "付款金额", "备注", "最新付款日期"]
+payCol = ["下单合同号", "付款日期", "付款金额", "最新付款日期"]
+
+
+# 生成超聚变下单、付款数据（付款外挂表已重命名列）
+def getOrderPay(orderList, payList):
+    df_order = pd.DataFrame([[orderNum, f"{day} 00:00:00", amount, 0.13, "", np.nan, "", ""] for day, amount in orderList],
+                            columns=orderCol)
+    df_pay = pd.DataFrame([[orderNum, f"{day} 00:00:00", amount, ""] for day, amount in payList], columns=payCol)
+    return df_order, df_pay
+
+
+# 分别使用两种匹配逻辑匹配某合同号的超聚变数据
+def matchBothPaths(monkeypatch, df_order, df_pay, creditDate):
+    resultDict = {}
+    creditDict = {orderNum: [f"{creditDate} 00:00:00", 0]} if creditDate else {}
+    for flag in (False, True):
+        monkeypatch.setattr(func, "vecAllocateFlag", flag)
+        df_noUsePay = pd.DataFrame(columns=payCol + ["备注"])
+        resultDict[flag] = func.matchOrderCJB(orderNum, df_order.copy(), df_pay.copy(), df_noUsePay, creditDict, {}, {})
+    return resultDict[False], resultDict[True]
+
+
+def assertSameResult(legacyDf, vecDf):
+    cols = ["开单日期", "开单金额", "付款日期", "付款金额", "备注", "开单金额（含税）"]
+    legacyDf = legacyDf.reindex(columns=cols).reset_index(drop=True).replace("", np.nan)
+    vecDf = vecDf.reindex(columns=cols).reset_index(drop=True).replace("", np.nan)
+    pd.testing.assert_frame_equal(legacyDf, vecDf, check_dtype=False)
+
+
+# 授信当天付款与汇总后的授信后付款索引重复（均从0开始）
+def test_duplicatePayLabels(monkeypatch):
+    df_order, df_pay = getOrderPay([("2024-09-01", 1000.0), ("2024-09-05", 2000.0), ("2024-09-12", 500.0)],
+                                   [("2024-09-01", 1130.0), ("2024-09-10", 800.0), ("2024-09-22", 3000.0)])
+    legacyDf, vecDf = matchBothPaths(monkeypatch, df_order, df_pay, "2024-09-01")
+    assertSameResult(legacyDf, vecDf)
+    # 授信后付款的800需核销第二笔下单，剩余付款只有一行
+    leftDf = vecDf.loc[vecDf["开单日期"].isna()]
+    assert leftDf["付款金额"].tolist() == [975.0]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_randomContracts(monkeypatch, seed):
+    rnd = random.Random(seed)
+    days = [f"2024-09-{day:02d}" for day in range(1, 29)]
+    orderList = [(rnd.choice(days), round(rnd.uniform(100, 5000), 2)) for _ in range(rnd.randint(1, 6))]
+    payList = [(rnd.choice(days), round(rnd.uniform(-500, 6000), 2)) for _ in range(rnd.randint(1, 6))]
+    creditDate = rnd.choice([None] + [day for day, _ in payList])
+    df_order, df_pay = getOrderPay(sorted(orderList), payList)
+    legacyDf, vecDf = matchBothPaths(monkeypatch, df_order, df_pay, creditDate)
+    assertSameResult(legacyDf, vecDf)
+
+
+# 生成多个合同号的随机下单、付款数据（receiptFlag为True时付款数据带收据编号，同里程碑付款表）
+def getRandomContracts(rnd, contractNum, receiptFlag=False):
+    days = [f"2024-09-{day:02d}" for day in range(1, 29)]
+    orderDict, payDict, creditDict = {}, {}, {}
+    for k in range(contractNum):
+        num = f"1Y0100000{k:04d}F"
+        orderList = sorted((rnd.choice(days), round(rnd.uniform(100, 5000), 2)) for _ in range(rnd.randint(0, 5)))
+        payList = []
+        for _ in range(rnd.randint(0, 6)):
+            # 部分付款与下单金额相差30以内（包括20的完全匹配边界两侧），部分为退款
+            amount = round(orderList[len(payList) % len(orderList)][1] * 1.13 + rnd.uniform(-30, 30), 2) if (
+                    orderList and rnd.random() < 0.6) else round(rnd.uniform(-500, 6000), 2)
+            payList.append((rnd.choice(days), amount))
+        orderDict[num] = pd.DataFrame([[num, f"{day} 00:00:00", amount, 0.13, "", np.nan, "", ""]
+                                       for day, amount in orderList], columns=orderCol)
+        payDict[num] = pd.DataFrame([[num, f"{day} 00:00:00", amount, ""] for day, amount in payList], columns=payCol)
+        if receiptFlag:
+            payDict[num]["收据编号"] = [f"R{k}{rnd.randint(0, 3)}" for _ in payList]
+        if payList and rnd.random() < 0.3:
+            creditDict[num] = [f"{rnd.choice(payList)[0]} 00:00:00", 0]
+    return orderDict, payDict, creditDict
+
+
+def assertSameFrame(legacyDf, vecDf):
+    assert set(legacyDf.columns) == set(vecDf.columns)
+    vecDf = vecDf.reindex(columns=legacyDf.columns).reset_index(drop=True).replace("", np.nan)
+    legacyDf = legacyDf.reset_index(drop=True).replace("", np.nan)
+    pd.testing.assert_frame_equal(legacyDf, vecDf, check_dtype=False)
+
+
+# 多个合同号按"下单合同号"分段一次匹配，与逐个合同号匹配后拼接的结果相同（付款数据各合同号交错排列）
+@pytest.mark.parametrize("seed", range(10))
+def test_segColAllocate(monkeypatch, seed):
+    rnd = random.Random(seed)
+    orderDict, payDict, creditDict = getRandomContracts(rnd, 8)
+    creditDateDict = {num: value[0][:10] for num, value in creditDict.items()}
+    df_order = pd.concat(orderDict.values())
+    df_pay = pd.concat(payDict.values()).sample(frac=1, random_state=seed)
+    df_pay["付款金额"] = pd.to_numeric(df_pay["付款金额"])
+    renameDict = func.payTableRenameDictCJB
+    segDf = func.allocatePayments(df_order, df_pay, {}, renameDict, creditDateDict, segCol="下单合同号")
+
+    # 逐段匹配：按段在下单df中首次出现的顺序，仅有付款的段排在最后
+    segList = list(dict.fromkeys(df_order["下单合同号"])) + [
+        num for num in dict.fromkeys(df_pay["下单合同号"]) if num not in set(df_order["下单合同号"])]
+    dfList = []
+    for num in segList:
+        for flag in (False, True):
+            monkeypatch.setattr(func, "vecAllocateFlag", flag)
+            resultDf = func.matchPayInfo(df_order.loc[df_order["下单合同号"] == num].copy(),
+                                         df_pay.loc[df_pay["下单合同号"] == num].copy(), {}, renameDict,
+                                         creditDateDict.get(num, "9999-12-31"))
+            if flag:
+                dfList.append(resultDf)
+            else:
+                legacyDf = resultDf
+        if not legacyDf.empty:
+            assertSameResult(legacyDf, dfList[-1])
+    assertSameResult(pd.concat(dfList), segDf)
+
+
+# 超聚变：所有合同号汇总付款后一次匹配（matchPayDetailBatch），与逐个合同号按原逻辑匹配的结果相同
+@pytest.mark.parametrize("seed", range(10))
+def test_batchCJB(monkeypatch, seed):
+    rnd = random.Random(seed)
+    orderDict, payDict, creditDict = getRandomContracts(rnd, 10)
+    orderDict = {num: df for num, df in orderDict.items() if not df.empty}
+    incentiveDict = {num: 300 for num in list(orderDict)[::3]}
+    monkeypatch.setattr(func, "vecAllocateFlag", False)
+    df_noUsePay = pd.DataFrame(columns=payCol + ["备注"])
+    legacyList = [func.matchOrderCJB(num, df.copy(), payDict[num].copy(), df_noUsePay, creditDict, incentiveDict, {})
+                  for num, df in orderDict.items()]
+
+    prepareDict = {num: func.matchOrderCJB(num, df.copy(), payDict[num].copy(), df_noUsePay, creditDict,
+                                           incentiveDict, {}, prepareFlag=True) for num, df in orderDict.items()}
+    assertSameFrame(pd.concat(legacyList), func.matchPayDetailBatch(prepareDict, func.payTableRenameDictCJB, incentiveDict))
+
+
+# 华为原厂：付款数据按收据编号汇总（handlePayInfoYC）后一次匹配，与逐个合同号按原逻辑匹配的结果相同
+@pytest.mark.parametrize("seed", range(10))
+def test_batchYC(monkeypatch, seed):
+    rnd = random.Random(seed)
+    orderDict, payDict, creditDict = getRandomContracts(rnd, 10, receiptFlag=True)
+    orderDict = {num: df.assign(收据编号="") for num, df in orderDict.items() if not df.empty}
+    # 付款表中华为合同号为空的付款（该合同号无法按"下单合同号"分段，单独匹配）
+    num = next(num for num in orderDict if not payDict[num].empty)
+    payDict[num]["下单合同号"] = np.nan
+    monkeypatch.setattr(func, "readPayTable", lambda path: payDict[path][["下单合同号", "付款日期", "付款金额", "收据编号"]].copy())
+    df_credit = pd.DataFrame([[num, value[0], 500.0] for num, value in creditDict.items()],
+                             columns=["下单合同号", "付款日期", "付款金额"])
+    df_noUsePay = pd.DataFrame(columns=payCol + ["备注", "收据编号"])
+    monkeypatch.setattr(func, "vecAllocateFlag", False)
+    legacyList = [func.matchOrderYC(num, num, df.copy(), df_credit, df_noUsePay, creditDict, {}, {})
+                  for num, df in orderDict.items()]
+
+    prepareDict = {num: func.matchOrderYC(num, num, df.copy(), df_credit, df_noUsePay, creditDict, {}, {},
+                                          prepareFlag=True) for num, df in orderDict.items()}
+    assertSameFrame(pd.concat(legacyList), func.matchPayDetailBatch(prepareDict, func.payTableRenameDict, {}))
+
+
+# 传入分区索引（calDataStep_CJB中的用法）与传入按"下单合同号"筛选后的df的结果相同（数据各合同号交错排列、包括剩余付款）
+@pytest.mark.parametrize("seed", range(5))
+def test_partIndexInput(monkeypatch, seed):
+    rnd = random.Random(seed)
+    orderDict, payDict, creditDict = getRandomContracts(rnd, 8)
+    df_order = pd.concat(orderDict.values()).sample(frac=1, random_state=seed)
+    df_pay = pd.concat(payDict.values()).sample(frac=1, random_state=seed)
+    df_noUsePay = pd.DataFrame([[num, "2024-08-31 00:00:00", 200.0, "", ""] for num in list(orderDict)[::2]],
+                               columns=payCol + ["备注"])
+    for df_ in [df_order, df_pay, df_noUsePay]:
+        for num in orderDict:
+            assert func.getOrderPart(df_, num).equals(df_.loc[df_["下单合同号"] == num])
+    partList = [func.buildPartIndex(df_, "下单合同号") for df_ in [df_order, df_pay, df_noUsePay]]
+    for flag in (False, True):
+        monkeypatch.setattr(func, "vecAllocateFlag", flag)
+        for num in orderDict:
+            maskList = [df_.loc[df_["下单合同号"] == num].copy() for df_ in [df_order, df_pay, df_noUsePay]]
+            assertSameFrame(func.matchOrderCJB(num, *maskList, creditDict, {}, {}),
+                            func.matchOrderCJB(num, *partList, creditDict, {}, {}))
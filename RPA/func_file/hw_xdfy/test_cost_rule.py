@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+批量匹配贷款利率、下单费用、扣款时间（matchRateArray、matchCostArray、matchDeductArray）与逐行匹配
+（matchRate、matchCost、matchDeductTime、matchDeductMonth）的结果对比：
+    python -m pytest RPA/func_file/hw_xdfy/test_cost_rule.py -q
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import func
+
+deptList = ["北区", "南区", "超聚变及商业分销", "新业务", "服务事业部", "行业事业部", ""]
+transportList = ["自提", "汽运", "空运", "海运", ""]
+# 宽限天数（8、15、20）前后及负数、小数、空值
+dayDiffList = [-5, 0, 7, 8, 8.5, 9, 14, 15, 16, 20, 21, 40, np.nan]
+
+
+# 生成事业部、运输方式、付款天数差的全部组合
+def getRuleDf():
+    rowList = list(itertools.product(deptList, transportList, dayDiffList))
+    df_ = pd.DataFrame(rowList, columns=["事业部", "运输方式", "付款天数差"])
+    df_["付款金额"] = np.resize([1130.0, 0.0, -250.5, 99999.99], len(df_))
+    return df_
+
+
+# 逐个比较匹配结果：数值近似相等（空值相同），说明字符串相等
+def assertSameResult(resultList, expectList):
+    assert len(resultList) == len(expectList)
+    for result, expect in zip(resultList, expectList):
+        if isinstance(expect, str):
+            assert result == expect
+        elif pd.isna(expect):
+            assert pd.isna(result)
+        else:
+            assert not isinstance(result, str) and result == pytest.approx(expect)
+
+
+@pytest.mark.parametrize("ruleDict", [{}, {"区域宽限天数": 20, "服务宽限天数": 15, "超期利率": 0.08,
+                                           "超期运输方式": ["汽运"], "区域事业部": ["北区", "新业务"]}])
+@pytest.mark.parametrize("flag", ["华为原厂", "超聚变", "鲲泰"])
+def test_matchRateCost(monkeypatch, flag, ruleDict):
+    monkeypatch.setattr(func, "costRuleDict", {**func.costRuleDict, **ruleDict})
+    df_ = getRuleDf()
+
+    expectRate = df_.apply(lambda x: func.matchRate(x, flag), axis=1)
+    assertSameResult(func.matchRateArray(df_, flag).tolist(), expectRate.tolist())
+
+    df_["贷款利率"] = expectRate
+    expectCost = df_.apply(lambda x: func.matchCost(x, flag), axis=1)
+    assertSameResult(func.matchCostArray(df_, flag).tolist(), expectCost.tolist())
+    # 贷款利率全为数值时的结果
+    df_["贷款利率"] = func.costRuleDict["基础利率"]
+    expectCost = df_.apply(lambda x: func.matchCost(x, flag), axis=1)
+    assertSameResult(func.matchCostArray(df_, flag).tolist(), expectCost.tolist())
+
+
+# 全部为数值的结果为float类型，空数据不报错
+def test_matchRateCostDtype():
+    df_ = getRuleDf()
+    df_ = df_.loc[df_["事业部"].isin(func.costRuleDict["区域事业部"]) & (df_["运输方式"] != "海运") &
+                  (df_["运输方式"] != "")].reset_index(drop=True)
+    df_["贷款利率"] = func.matchRateArray(df_, "华为原厂")
+    assert df_["贷款利率"].dtype == float
+    assert func.matchCostArray(df_, "华为原厂").dtype == float
+    assert func.matchRateArray(df_.iloc[:0], "华为原厂").tolist() == []
+    assert func.matchCostArray(df_.iloc[:0], "华为原厂").tolist() == []
+
+
+def test_matchDeductArray():
+    timeList = [f"{year}-{month:02d}-{day:02d} 00:00:00" for year in [2019, 2024, 2025] for month in range(1, 13)
+                for day in [1, 28]]
+    orderTime = pd.Series(timeList * 2, index=range(100, 100 + len(timeList) * 2), name="开单日期")
+    deductTime, deductMonth = func.matchDeductArray(orderTime)
+    assert deductTime.tolist() == [func.matchDeductTime(i) for i in orderTime]
+    assert deductMonth.tolist() == [func.matchDeductMonth(i) for i in orderTime]
+    assert deductTime.index.equals(orderTime.index) and deductMonth.index.equals(orderTime.index)
+    assert deductTime.tolist()[:6] == ["FY19-Q1"] * 6 and deductTime.tolist()[-2:] == ["FY25-Q4"] * 2
+    assert deductMonth.tolist()[:3] == ["1月", "1月", "2月"]
+
+    # 存在空值时与逐行处理相同（报错）
+    with pytest.raises(TypeError):
+        func.matchDeductArray(pd.Series(["2024-01-01 00:00:00", None]))
+    with pytest.raises(TypeError):
+        pd.Series(["2024-01-01 00:00:00", None]).apply(func.matchDeductTime)
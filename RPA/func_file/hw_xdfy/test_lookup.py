@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+查找表（registerLookupSource、lookupValue）的延迟读取、重新读取及已读取来源数量上限的测试：
+    python -m pytest RPA/func_file/hw_xdfy/test_lookup.py -q
+"""
+import os
+
+import pandas as pd
+import pytest
+
+import func
+
+
+@pytest.fixture
+def loadList(tmp_path, monkeypatch):
+    for name in ["lookupSourceDict", "lookupMapSource", "lookupStatDict"]:
+        monkeypatch.setattr(func, name, {})
+    loadList = []
+    for i in range(4):
+        path = tmp_path / f"来源{i}.xlsx"
+        path.write_bytes(b"")
+        registerSource(str(path), i, loadList)
+    return loadList
+
+
+# 注册来源i（映射名为“映射i”），读取时记录来源编号
+def registerSource(path, i, loadList):
+    def loadFunc():
+        loadList.append(i)
+        return {f"映射{i}": {"a": i}}
+
+    func.registerLookupSource(f"来源{i}", [path], loadFunc, [f"映射{i}"])
+
+
+def getLoadedList():
+    return [sourceName for sourceName, source in func.lookupSourceDict.items() if source[2] is not None]
+
+
+def test_lookupLoad(loadList, tmp_path):
+    assert loadList == []
+    assert func.lookupValue("映射0", "a") == 0 and func.lookupValue("映射0", "b", None) is None
+    assert func.lookupValue("映射0", pd.Series(["a", "b", "a"])).tolist() == [0, "", 0]
+    assert loadList == [0]
+    assert func.getLookupStat()["映射0"] == {"命中": 3, "未命中": 2}
+
+    # 文件未变化时重新注册不重新读取，修改时间变化时重新读取
+    path = str(tmp_path / "来源0.xlsx")
+    registerSource(path, 0, loadList)
+    func.lookupValue("映射0", "a")
+    assert loadList == [0]
+    os.utime(path, (os.path.getmtime(path) + 10, os.path.getmtime(path) + 10))
+    registerSource(path, 0, loadList)
+    func.lookupValue("映射0", "a")
+    assert loadList == [0, 0]
+
+
+def test_lookupSourceMaxNum(loadList, monkeypatch):
+    monkeypatch.setattr(func, "lookupSourceMaxNum", 2)
+    for i in [0, 1, 0, 2]:
+        assert func.lookupValue(f"映射{i}", "a") == i
+    # 来源1最久未使用，被释放
+    assert loadList == [0, 1, 2]
+    assert sorted(getLoadedList()) == ["来源0", "来源2"]
+    assert len(func.lookupSourceDict) == 4
+
+    # 释放的来源再次查找时重新读取
+    assert func.lookupValue("映射1", "a") == 1
+    assert loadList == [0, 1, 2, 1]
+    assert sorted(getLoadedList()) == ["来源1", "来源2"]
+    assert func.getLookupStat()["映射1"] == {"命中": 2, "未命中": 0}
+
+    # <=0时不限制
+    monkeypatch.setattr(func, "lookupSourceMaxNum", 0)
+    for i in range(4):
+        func.lookupValue(f"映射{i}", "a")
+    assert sorted(getLoadedList()) == ["来源0", "来源1", "来源2", "来源3"]
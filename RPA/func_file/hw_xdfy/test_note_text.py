@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+不打开Excel预处理“备注”列（initAnalyzeNoteTextHeadless）与原逐个单元格处理逻辑的结果对比：
+    python -m pytest RPA/func_file/hw_xdfy/test_note_text.py -q
+"""
+import random
+
+import openpyxl
+import pandas as pd
+import pytest
+from openpyxl.styles import Font
+
+import func
+
+companyDict = {"1Y001": "合神", "1Y002": "北神", "1Y003": "城投"}
+
+
+@pytest.fixture(autouse=True)
+def lookupSource(tmp_path, monkeypatch):
+    for name in ["lookupSourceDict", "lookupMapSource", "lookupStatDict"]:
+        monkeypatch.setattr(func, name, {})
+    sourcePath = tmp_path / "订单表.xlsx"
+    sourcePath.write_bytes(b"")
+    func.registerLookupSource("华为订单表", [str(sourcePath)], lambda: {"订单运输方式": {}, "订单公司": companyDict},
+                              ["订单运输方式", "订单公司"])
+
+
+# 生成毛利分析结果表（H：下单合同号，O：成本总价，U：备注，V：销售类型，W：采购类型）
+def writeAnalyzeFile(path, seed):
+    rnd = random.Random(seed)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "账面毛利分析"
+    wb.create_sheet("销售明细")["A1"] = "下单合同号"
+    ws.append([f"列{i}" for i in range(1, 24)])
+    for row in range(2, 60):
+        if rnd.random() < 0.1:
+            ws[f"A{row}"] = "合计"
+            continue
+        ws[f"A{row}"] = row
+        ws[f"H{row}"] = rnd.choice(list(companyDict) + ["1Y009", "2Y001"])
+        ws[f"O{row}"] = rnd.choice([100.5, 0, -20])
+        ws[f"U{row}"] = rnd.choice([None, "合神", "其他备注", "北神"])
+        ws[f"U{row}"].font = Font(bold=True)
+        ws[f"V{row}"] = rnd.choice(["正常销售", "退货"])
+        ws[f"W{row}"] = rnd.choice(["服务", "原厂下单", "备货"])
+    wb.save(path)
+
+
+# 原逐个单元格处理逻辑（initAnalyzeNoteText中通过Excel处理的部分）
+def legacyNoteText(path, orderSet=None):
+    wb = openpyxl.load_workbook(path)
+    ws = wb["账面毛利分析"]
+    for row in range(2, ws.max_row + 1):
+        orderNum, saleType, buyType = ws[f"H{row}"].value, ws[f"V{row}"].value, ws[f"W{row}"].value
+        noteText, amount = ws[f"U{row}"].value, ws[f"O{row}"].value
+        if orderNum is None or (orderSet is not None and orderNum not in orderSet):
+            continue
+        noteTextFlag = True if noteText in func.companySimpleDict.keys() else False
+        if amount > 0 and saleType == "正常销售" and orderNum.startswith("1Y") \
+                and buyType in ['服务', '原厂下单'] and not noteTextFlag:
+            ws[f"U{row}"].value = companyDict.get(orderNum, "") or None
+    return [[cell.value for cell in row] for row in ws.iter_rows()]
+
+
+@pytest.mark.parametrize("orderSet", [None, {"1Y002", "1Y009"}])
+@pytest.mark.parametrize("seed", range(5))
+def test_headlessNoteText(tmp_path, seed, orderSet):
+    analyzePath, resltPath = str(tmp_path / "毛利核算.xlsx"), str(tmp_path / "毛利核算_预处理备注.xlsx")
+    writeAnalyzeFile(analyzePath, seed)
+    func.initAnalyzeNoteTextHeadless(analyzePath, resltPath, orderSet)
+
+    wb = openpyxl.load_workbook(resltPath)
+    ws = wb["账面毛利分析"]
+    assert [[cell.value for cell in row] for row in ws.iter_rows()] == legacyNoteText(analyzePath, orderSet)
+    # 备注单元格保留原有格式，其他sheet不变
+    assert all(ws[f"U{row}"].font.b for row in range(2, ws.max_row + 1) if ws[f"H{row}"].value is not None)
+    assert wb["销售明细"]["A1"].value == "下单合同号"
+    pd.testing.assert_frame_equal(pd.read_excel(resltPath).drop(columns="列21"),
+                                  pd.read_excel(analyzePath).drop(columns="列21"))
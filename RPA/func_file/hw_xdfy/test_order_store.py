@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+本地订单表（mergeOrderTable）按订单号哈希检测变化、清理下载范围之前的订单，及变化订单的已处理数据重新匹配运输方式的测试：
+    python -m pytest RPA/func_file/hw_xdfy/test_order_store.py -q
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import func
+
+pytestmark = pytest.mark.filterwarnings("ignore::FutureWarning")
+
+orderCol = ["华为订单号", "运输方式", "订单日期"]
+thisYear = datetime.now().year
+
+
+@pytest.fixture
+def storeDir(tmp_path, monkeypatch):
+    monkeypatch.setattr(func, "orderStoreDir", str(tmp_path / "订单表"))
+    for name in ["lookupSourceDict", "lookupMapSource", "lookupStatDict"]:
+        monkeypatch.setattr(func, name, {})
+    return tmp_path
+
+
+def writeOrder(storeDir, name, rowList):
+    path = str(storeDir / f"u1_订单表_{name}.xlsx")
+    pd.DataFrame(rowList, columns=orderCol).to_excel(path, index=False)
+    return path
+
+
+def test_changedOrders(storeDir):
+    rowList = [["1Y001", "汽运", f"{thisYear}-01-05"], ["1Y002", "自提", f"{thisYear}-01-06"],
+               ["1Y002", "空运", f"{thisYear}-01-06"]]
+    assert sorted(func.mergeOrderTable("u1", [writeOrder(storeDir, "1", rowList)])) == ["1Y001", "1Y002"]
+    sinceTime = datetime.now() - timedelta(seconds=1)
+
+    # 同一订单号的行顺序不同不算变化；多个文件中的同一订单号以最后一个文件为准
+    oldFile = writeOrder(storeDir, "2", [["1Y001", "空运", f"{thisYear}-01-05"]])
+    assert func.mergeOrderTable("u1", [oldFile, writeOrder(storeDir, "3", rowList[::-1])]) == []
+
+    # 修改某行、增加行、新增订单号
+    changeList = [["1Y001", "空运", f"{thisYear}-01-05"], rowList[1], rowList[2], rowList[2],
+                  ["1Y003", "汽运", f"{thisYear}-02-01"]]
+    assert sorted(func.mergeOrderTable("u1", [writeOrder(storeDir, "4", changeList)])) == ["1Y001", "1Y002", "1Y003"]
+    assert func.getChangedOrders(sinceTime) == {"1Y001", "1Y002", "1Y003"}
+    assert func.getChangedOrders(datetime.now() + timedelta(seconds=1)) == set()
+
+    # 无新下载数据时不变化
+    assert func.mergeOrderTable("u1", []) == []
+    df_store = pd.read_pickle(func.getOrderStorePath("u1")[0])
+    assert sorted(df_store.drop(columns="变化时间").values.tolist()) == sorted(changeList)
+    assert func.readOrderStoreMeta("u1")["行数"] == 5
+
+
+# 订单日期（未配置时为变化时间）在下载范围之前的订单合并时清理
+@pytest.mark.parametrize("dateCol", ["订单日期", ""])
+def test_pruneOrders(storeDir, monkeypatch, dateCol):
+    monkeypatch.setattr(func, "orderDateCol", dateCol)
+    oldDate = f"{thisYear - 3}-12-31"
+    rowList = [["1Y001", "汽运", oldDate], ["1Y002", "汽运", f"{thisYear}-03-01"], ["1Y003", "空运", None]]
+    func.mergeOrderTable("u1", [writeOrder(storeDir, "1", rowList)])
+    storePath = func.getOrderStorePath("u1")[0]
+    if not dateCol:
+        df_store = pd.read_pickle(storePath)
+        df_store.loc[df_store["华为订单号"] == "1Y001", "变化时间"] = f"{oldDate} 10:00:00"
+        df_store.to_pickle(storePath)
+        assert func.mergeOrderTable("u1", []) == []
+    assert sorted(pd.read_pickle(storePath)["华为订单号"]) == ["1Y002", "1Y003"]
+    assert func.readOrderStoreMeta("u1")["同步记录"][-1]["清理订单数"] == 1
+
+
+# 订单表变化的合同号，已处理数据中运输方式变化的重新计算下单费用，其余数据不变
+def test_refreshOrderTransport(storeDir):
+    func.mergeOrderTable("u1", [writeOrder(storeDir, "1", [["1Y001", "空运", f"{thisYear}-01-05"],
+                                                          ["1Y002", "汽运", f"{thisYear}-01-05"]])])
+    rowList = [["1Y001", "原厂下单", "2024-03-01 00:00:00", "2024-01-01 00:00:00", "1130", "60", "自提"],
+               ["1Y001", "原厂下单", "2024-03-01 00:00:00", "未付款", None, None, None],
+               ["1Y002", "服务", "2024-03-01 00:00:00", "2024-01-01 00:00:00", "500", "60", "汽运"],
+               ["1Y009", "原厂下单", "2024-03-01 00:00:00", "2024-01-01 00:00:00", "800", "60", "自提"]]
+    df_base = pd.DataFrame(rowList, columns=["下单合同号", "采购类型", "开单日期", "付款日期", "付款金额", "付款天数差",
+                                             "运输方式"]).assign(事业部=func.costRuleDict["区域事业部"][0], 贷款利率="",
+                                                             下单费用="", 扣款时间="", 扣款月份="")
+    df_result = func.refreshOrderTransport(df_base.copy(), {"1Y001", "1Y002"}, func.getOrderStorePathList())
+
+    expect = func.applyCostRule(df_base.loc[[0]].assign(运输方式="空运", 付款金额=1130.0, 付款天数差=60), "华为原厂")
+    assert df_result.loc[0, ["运输方式", "贷款利率", "下单费用"]].tolist() == expect.loc[
+        0, ["运输方式", "贷款利率", "下单费用"]].tolist()
+    assert df_result.loc[0, "贷款利率"] == func.costRuleDict["超期利率"]
+    pd.testing.assert_frame_equal(df_result.loc[1:], df_base.loc[1:])
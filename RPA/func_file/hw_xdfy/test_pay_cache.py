@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+“里程碑付款&调整台帐表”解析缓存（readPayTable、trimPayCache）的失效与清理测试：
+    python -m pytest RPA/func_file/hw_xdfy/test_pay_cache.py -q
+"""
+import os
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+import func
+
+
+@pytest.fixture
+def cacheDir(tmp_path, monkeypatch):
+    monkeypatch.setattr(func, "payCacheDir", str(tmp_path / "缓存"))
+    parseList = []
+    readExcel = pd.read_excel
+
+    # 记录实际解析xlsx的次数
+    def countReadExcel(*args, **kwargs):
+        parseList.append(args[0])
+        return readExcel(*args, **kwargs)
+
+    monkeypatch.setattr(func.pd, "read_excel", countReadExcel)
+    return parseList
+
+
+# 生成付款表（第9行为表头）
+def writePayTable(path, amountList):
+    df_ = pd.DataFrame({"华为合同号": "1Y001", "处理日期": "2024-01-01", "收据调整金额": amountList, "对应收据": "R1",
+                        "其他": "x"})
+    with pd.ExcelWriter(path) as writer:
+        df_.to_excel(writer, index=False, startrow=8)
+    return str(path)
+
+
+def test_cacheInvalidate(tmp_path, cacheDir, monkeypatch):
+    payPath = writePayTable(tmp_path / "1Y001.xlsx", ["100", "200"])
+    df_first = func.readPayTable(payPath)
+    assert df_first.columns.tolist() == ["下单合同号", "付款日期", "付款金额", "收据编号"]
+    pd.testing.assert_frame_equal(func.readPayTable(payPath), df_first)
+    assert len(cacheDir) == 1
+
+    # 内容相同的文件（重新下载、修改时间变化）共用缓存，不重新解析
+    copyPath = str(tmp_path / "1Y001_重新下载.xlsx")
+    shutil.copyfile(payPath, copyPath)
+    os.utime(payPath, (time.time() + 10, time.time() + 10))
+    pd.testing.assert_frame_equal(func.readPayTable(copyPath), df_first)
+    pd.testing.assert_frame_equal(func.readPayTable(payPath), df_first)
+    assert len(cacheDir) == 1
+
+    # 内容变化（大小、修改时间变化）时重新解析
+    writePayTable(payPath, ["100", "200", "-50"])
+    assert func.readPayTable(payPath)["付款金额"].tolist() == ["100", "200", "-50"]
+    assert len(cacheDir) == 2
+
+    # 缓存文件损坏时重新解析
+    dataDir = os.path.join(func.getPayCacheDir(), "data")
+    for name in os.listdir(dataDir):
+        with open(os.path.join(dataDir, name), "wb") as f:
+            f.write(b"broken")
+    pd.testing.assert_frame_equal(func.readPayTable(copyPath), df_first)
+    assert len(cacheDir) == 3
+
+    # payTableRenameDict变化时使用新的缓存文件夹，并删除旧缓存
+    oldDir = func.getPayCacheDir()
+    monkeypatch.setattr(func, "payTableRenameDict", {"华为合同号": "下单合同号", "收据调整金额": "付款金额"})
+    assert func.readPayTable(copyPath).columns.tolist() == ["下单合同号", "付款金额"]
+    assert len(cacheDir) == 4
+    assert not os.path.exists(oldDir) and os.listdir(func.payCacheDir) == [os.path.basename(func.getPayCacheDir())]
+
+
+# 数据文件超出总大小上限时删除最久未使用的，指纹文件超出数量上限时删除最早的
+def test_trimPayCache(tmp_path, cacheDir, monkeypatch):
+    pathList = [writePayTable(tmp_path / f"{i}.xlsx", [str(i)] * (i + 1)) for i in range(4)]
+    for path in pathList:
+        func.readPayTable(path)
+    cacheRoot = func.getPayCacheDir()
+    dataDir, fpDir = os.path.join(cacheRoot, "data"), os.path.join(cacheRoot, "fp")
+    # 按读取顺序设置最近使用时间，第0个文件最近再次使用
+    nameList = sorted(os.listdir(dataDir), key=lambda name: os.path.getmtime(os.path.join(dataDir, name)))
+    for i, name in enumerate(nameList):
+        os.utime(os.path.join(dataDir, name), (1000 + i, 1000 + i))
+    for i, name in enumerate(sorted(os.listdir(fpDir))):
+        os.utime(os.path.join(fpDir, name), (1000 + i, 1000 + i))
+    func.readPayTable(pathList[0])
+    sizeDict = {name: os.path.getsize(os.path.join(dataDir, name)) for name in nameList}
+
+    monkeypatch.setattr(func, "payCacheMaxSize", sizeDict[nameList[0]] + sizeDict[nameList[3]])
+    monkeypatch.setattr(func, "payCacheMaxFp", 2)
+    func.trimPayCache()
+    assert sorted(os.listdir(dataDir)) == sorted([nameList[0], nameList[3]])
+    assert len(os.listdir(fpDir)) == 2
+
+    # 被删除的缓存重新读取时重新解析
+    parseNum = len(cacheDir)
+    func.readPayTable(pathList[0])
+    assert len(cacheDir) == parseNum
+    func.readPayTable(pathList[1])
+    assert len(cacheDir) == parseNum + 1
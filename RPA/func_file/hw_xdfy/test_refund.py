@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+退款核销（netRefundArrays、netRefundSegment）与原逐笔核销逻辑的结果对比：
+    python -m pytest RPA/func_file/hw_xdfy/test_refund.py -q
+"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import func
+from num_util import new_round
+
+pytestmark = pytest.mark.filterwarnings("ignore::FutureWarning")
+
+
+# 原逐笔核销逻辑（handlePayInfoYC、handlePayInfo_CJB_Credit向量化前的核销循环）
+def legacyNetRefund(posList, negList):
+    df_positive = pd.DataFrame({"付款金额": posList}, dtype=float)
+    payRecordList, finalList = [], []
+    for amount in negList:
+        amount_n = amount * -1
+        for j, series_p in df_positive.iterrows():
+            amount_p = series_p["付款金额"]
+            if amount_p == 0:
+                continue
+            if amount_p > amount_n:
+                df_positive.loc[j, "付款金额"] = new_round(amount_p - amount_n)
+                break
+            else:
+                amount_n = new_round(amount_n - amount_p)
+                df_positive.loc[j, "付款金额"] = 0
+                payRecordList.append(j)
+        else:
+            if amount_n > 0:
+                finalList.append(amount_n * -1)
+    finalList += df_positive.loc[df_positive["付款金额"] > 0, "付款金额"].tolist()
+    return payRecordList, finalList
+
+
+# 由核销内核结果得到与原逻辑相同形式的结果：被完全核销的付款位置、剩余退款 + 剩余付款
+def kernelNetRefund(posList, negList, posSeg=None, negSeg=None):
+    result = func.netRefundArrays(posList, negList, posSeg, negSeg)
+    payRecordList = np.flatnonzero(result["完全核销"]).tolist()
+    finalList = [amount for amount in result["退款余额"] if amount != 0]
+    finalList += [amount for amount in result["付款余额"] if amount > 0]
+    return payRecordList, finalList
+
+
+# 随机生成某合同号的正数付款、退款金额（金额重复、退款恰好核销完付款的情况较多）
+def getRandomAmounts(rnd, exactFlag=True):
+    baseList = [rnd.choice([100, 250.5, 1000, 33.33]) for _ in range(3)]
+    posList = [rnd.choice(baseList) if rnd.random() < 0.5 else round(rnd.uniform(1, 3000), 2)
+               for _ in range(rnd.randint(0, 8))]
+    negList = [-rnd.choice(baseList) if rnd.random() < 0.5 else -round(rnd.uniform(1, 3000), 2)
+               for _ in range(rnd.randint(1, 5))]
+    if posList and rnd.random() < 0.3:
+        negList.append(-sum(posList[:2]))
+    if not exactFlag:
+        posList.append(rnd.uniform(1, 500))
+    return posList, negList
+
+
+@pytest.mark.parametrize("exactFlag", [True, False])
+@pytest.mark.parametrize("seed", range(30))
+def test_randomRefund(seed, exactFlag):
+    posList, negList = getRandomAmounts(random.Random(seed), exactFlag)
+    assert kernelNetRefund(posList, negList) == legacyNetRefund(posList, negList)
+
+
+# 退款恰好核销完付款、同金额付款重复出现、非精确到分的金额逐笔处理
+@pytest.mark.parametrize("posList, negList", [
+    ([100.0, 100.0, 100.0], [-100.0, -100.0]),
+    ([100.0, 50.0], [-150.0, -20.0]),
+    ([100.1, 200.2], [-300.3]),
+    ([0.1 + 0.2, 1 / 3], [-0.3, -0.2]),
+    ([], [-100.0]),
+])
+def test_edgeRefund(posList, negList):
+    assert kernelNetRefund(posList, negList) == legacyNetRefund(posList, negList)
+    payRecordList, finalList = legacyNetRefund(posList, negList)
+    posLeft, posClear, negLeft = func.netRefundSegment(posList, negList)
+    assert np.flatnonzero(posClear).tolist() == payRecordList
+    assert [amount for amount in negLeft if amount != 0] + [amount for amount in posLeft if amount > 0] == finalList
+
+
+# 多段一次核销（含非精确到分的段）与各段分别按原逻辑核销的结果一致
+@pytest.mark.parametrize("seed", range(10))
+def test_segmentRefund(seed):
+    rnd = random.Random(seed)
+    posAll, negAll, posSeg, negSeg, expectList = [], [], [], [], []
+    for seg in range(6):
+        posList, negList = getRandomAmounts(rnd, rnd.random() < 0.7)
+        posAll += posList
+        negAll += negList
+        posSeg += [seg] * len(posList)
+        negSeg += [seg] * len(negList)
+        expectList.append(legacyNetRefund(posList, negList))
+    result = func.netRefundArrays(posAll, negAll, posSeg, negSeg)
+    posSeg, negSeg = np.array(posSeg), np.array(negSeg)
+    for seg, (payRecordList, finalList) in enumerate(expectList):
+        posClear = result["完全核销"][posSeg == seg]
+        negLeft, posLeft = result["退款余额"][negSeg == seg], result["付款余额"][posSeg == seg]
+        assert np.flatnonzero(posClear).tolist() == payRecordList
+        assert [amount for amount in negLeft if amount != 0] + [amount for amount in posLeft if amount > 0] == finalList
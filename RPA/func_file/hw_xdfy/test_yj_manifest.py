@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+业绩表清单（行指纹）的变化检测测试：
+    python -m pytest RPA/func_file/hw_xdfy/test_yj_manifest.py -q
+"""
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import func
+
+yjCol = ["合同号", "金额", "日期"]
+
+
+@pytest.fixture
+def yjDir(tmp_path, monkeypatch):
+    monkeypatch.setattr(func, "yjManifestDir", str(tmp_path / "清单"))
+    return tmp_path
+
+
+def writeYj(yjDir, rowList):
+    path = str(yjDir / f"u1_2024业绩表（{datetime.now().strftime('%Y%m%d')}）.xlsx")
+    pd.DataFrame(rowList, columns=yjCol).to_excel(path, index=False)
+    return path
+
+
+def test_checkYjDownload(yjDir):
+    rowList = [["A1", "100", "2024-01-01"], ["A2", "200", "2024-01-02"], ["A2", "200", "2024-01-02"]]
+    # 首次下载：处理整个文件
+    result = func.checkYjDownload("u1", "2024", writeYj(yjDir, rowList))
+    assert result["是否变化"] and result["处理路径"].endswith(".xlsx") and "变化行" not in result["处理路径"]
+
+    # 内容未变化（行顺序不同）：后续步骤无需处理
+    result = func.checkYjDownload("u1", "2024", writeYj(yjDir, rowList[::-1]))
+    assert not result["是否变化"] and result["处理路径"] == ""
+    assert func.readYjManifest("u1")["2024"]["连续未变化次数"] == 1
+
+    # 新增、修改的行（重复行多出现一次也算新增）：只处理变化的行
+    result = func.checkYjDownload("u1", "2024", writeYj(yjDir, rowList + [["A2", "200", "2024-01-02"],
+                                                                          ["A3", "300", "2024-01-03"]]))
+    assert result["是否变化"] and result["变化行数"] == 2 and result["删除行数"] == 0
+    df_change = pd.read_excel(result["处理路径"], dtype=str)
+    assert df_change["合同号"].tolist() == ["A2", "A3"]
+
+    # 有删除的行：处理整个文件
+    result = func.checkYjDownload("u1", "2024", writeYj(yjDir, rowList[:1]))
+    assert result["是否变化"] and result["删除行数"] == 4 and "变化行" not in result["处理路径"]
+
+
+def test_isYjYearCurrent(yjDir):
+    thisYear = str(datetime.now().year)
+    assert not func.isYjYearCurrent("u1", thisYear)
+    func.checkYjDownload("u1", thisYear, writeYj(yjDir, [["A1", "100", "2024-01-01"]]))
+    # 当年数据当天已校验为最新，非当天校验的需重新下载
+    assert func.isYjYearCurrent("u1", thisYear)
+    manifest = func.readYjManifest("u1")
+    manifest[thisYear]["校验日期"] = "20000101"
+    func.writeCacheFile(func.getYjManifestPath("u1")[0], pd.io.json.dumps(manifest))
+    assert not func.isYjYearCurrent("u1", thisYear)
+
+
+def test_noManifestDir(tmp_path, monkeypatch):
+    monkeypatch.setattr(func, "yjManifestDir", "")
+    path = str(tmp_path / "u1_2024业绩表（20240101）.xlsx")
+    pd.DataFrame([["A1", "1", "2024-01-01"]], columns=yjCol).to_excel(path, index=False)
+    assert func.checkYjDownload("u1", "2024", path)["处理路径"] == path
+    assert not os.path.exists(str(tmp_path / "清单"))
@@ -3,9 +3,11 @@
 
 
 import glob
+import json
 import logging.config
 import os
 import re
+import sys
 from datetime import datetime, timedelta
 from functools import wraps
 
@@ -15,6 +17,12 @@ import pandas as pd
 import xlwings as xw
 from openpyxl.utils import get_column_letter
 
+# 共用的数值处理方法（num_util）、阶段统计方法（stage_util），均在RPA/func_file目录下
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from num_util import new_round  # noqa: E402
+import stage_util  # noqa: E402
+from xlsx_util import appendSheetRows, getSheetNames  # noqa: E402
+
 
 # 初始化日志
 def initWriteLog(rootDir):
@@ -78,6 +86,21 @@ def logfun(func):
     return logfunStep
 
 
+# 开启各阶段耗时、内存、数据量统计（uibot中调用，开启后直接调用各阶段方法即可统计）
+def enableStageProfile(reportDir, profileStage=""):
+    """
+    :param reportDir: 统计结果保存目录
+    :param profileStage: 需要生成cProfile性能分析文件的阶段方法名，为空时不生成
+    :return:
+    """
+    stage_util.enableStageProfile(globals(), profileStageList, reportDir, profileStage)
+
+
+# 结束统计，返回统计结果json文件路径
+def finishStageProfile():
+    return stage_util.finishStageProfile(globals())
+
+
 # 将MHTML文件转为xlsx
 def changeMhtmlToXlsx(path):
     """
@@ -128,24 +151,6 @@ def getSaveDir(rootDir):
     return finialDir
 
 
-# 四舍五入
-def new_round(_float, _len=2):
-    """
-    :param _float: 需要四舍五入的数
-    :param _len: 保留小数点位数
-    :return: 四舍五入结果
-    """
-    if isinstance(_float, float):
-        if str(_float)[::-1].find('.') <= _len:
-            return _float
-        if str(_float)[-1] == '5':
-            return round(float(str(_float)[:-1] + '6'), _len)
-        else:
-            return round(_float, _len)
-    else:
-        return round(_float, _len)
-
-
 # 判断值是否在字符串、字典、列表中
 def jud_in(val, targetObj):
     return val in targetObj
@@ -390,187 +395,248 @@ def initDebtDf(filepath):
     return df_
 
 
-# 计算欠款明细表的账期费用
-def caldebtCost(series, stime, etime, indexDict):
+# 批量计算预收补费用sheet的预收利息（过帐日期早于上次统计时间的数据从上次统计时间开始计算）
+def calAdvanceCostArray(df, lastCalDate, indexDict):
     """
-    :param series: df的行数据
-    :param sTime: 用户输入的开始日期
-    :param eTime: 用户输入的结束日期
-    :param indexDict: 计算公式时需要的列所在列标识字典，如 {"欠款金额":"M","贷款利率"："K"}
-    :return: series[["账期财务费用", "超期财务费用", "备注"]]
+    :param df: 预收补费用df（需要"过帐日期"列）
+    :param lastCalDate: 上次统计时间（基础表中“统计时间”列最新的日期）
+    :param indexDict: 计算公式时需要的列所在列标识字典
+    :return: "预收利息"Series
     """
-    fmt = "%Y-%m-%d"
+    formulaArr = np.full(len(df), getCostFormula(("统计时间", "过帐日期", 0, "利率"), indexDict, "本币金额"), dtype=object)
+    if lastCalDate != "":
+        postDate = parseDateColumn(df["过帐日期"], np.ones(len(df), dtype=bool))
+        beforeMask = ((postDate - datetime.strptime(lastCalDate, "%Y-%m-%d")).dt.days < 0).to_numpy()
+        formulaArr[beforeMask] = getCostFormula(("统计时间", "上次统计时间", 0, "利率"), indexDict, "本币金额")
+    return pd.Series(formulaArr, index=df.index, dtype=object)
 
-    if pd.isna(series["实际回款日"]):  # 未回款
-        # 判断【收付基准日期】与欠款明细表开始日期的差值
-        jugtimeDiff1 = (datetime.strptime(series["收付基准日期"][:10], fmt) - datetime.strptime(stime, fmt)).days
-        if jugtimeDiff1 > 0:
-            # 判断【收付基准日期】与欠款明细表结束日期的差值
-            jugtimeDiff2 = (datetime.strptime(series["收付基准日期"][:10], fmt) - datetime.strptime(etime, fmt)).days
-            if jugtimeDiff2 <= 0:
-                if series["采购类型"] != "商业分销":
-                    series[
-                        "账期财务费用"] = '=(DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{收付基准日期}"&ROW())) - 30) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
-                else:
-                    series[
-                        "账期财务费用"] = '=(DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{收付基准日期}"&ROW())) - 60) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
-                # 判断【应还款日期】与【统计时间】差值（判断有无超期）
-                jugtimeDiff3 = (
-                        datetime.strptime(series["应还款日期"][:10], fmt) - datetime.strptime(series["统计时间"][:10],
-                                                                                         fmt)).days
-                if jugtimeDiff3 < 0:
-                    series[
-                        "超期财务费用"] = '=DAYS(INDIRECT("{统计时间}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
-            else:  # 【收付基准日期】> 欠款明细表结束日期
-                if series["采购类型"] != "商业分销":
-                    series[
-                        "账期财务费用"] = '=(DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{统计时间}"&ROW())) - 30) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
-                else:
-                    series[
-                        "账期财务费用"] = '=(DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{统计时间}"&ROW())) - 60) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
 
-        else:
-            if series["索引新增标识"] == "新增":
-                series[
-                    "账期财务费用"] = '=DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{凭证记帐日期}"&ROW())) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                    **indexDict)
-            else:  # 索引不是新增
-                # 判断第二张欠款明细表日期与【应还款日期】差值
-                jugtimeDiff3 = (datetime.strptime(etime, fmt) - datetime.strptime(series["应还款日期"][:10], fmt)).days
-                if jugtimeDiff3 <= 0:
-                    series["备注"] = "去除"
-                else:
-                    # 判断【应还款日期】与【上次统计时间】的差值
-                    jugtimeDiff4 = (
-                            datetime.strptime(series["应还款日期"][:10], fmt) - datetime.strptime(series["上次统计时间"][:10],
-                                                                                             fmt)).days
-                    if jugtimeDiff4 >= 0:
-                        series[
-                            "超期财务费用"] = '=DAYS(INDIRECT("{统计时间}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                            **indexDict)
-                    else:
-                        series[
-                            "超期财务费用"] = '=DAYS(INDIRECT("{统计时间}"&ROW()),INDIRECT("{上次统计时间}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                            **indexDict)
-    else:
-        # 已回款，判断【收付基准日期】与欠款明细表开始日期的差值
-        jugtimeDiff1 = (datetime.strptime(series["收付基准日期"][:10], fmt) - datetime.strptime(stime, fmt)).days
-        if jugtimeDiff1 > 0:
-            # 判断【收付基准日期】与欠款明细表结束日期的差值
-            jugtimeDiff2 = (datetime.strptime(series["收付基准日期"][:10], fmt) - datetime.strptime(etime, fmt)).days
-            if jugtimeDiff2 <= 0:
-                if series["采购类型"] != "商业分销":
-                    series[
-                        "账期财务费用"] = '=(DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{收付基准日期}"&ROW())) - 30) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
-                else:
-                    series[
-                        "账期财务费用"] = '=(DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{收付基准日期}"&ROW())) - 60) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
-            else:  # 【收付基准日期】> 欠款明细表结束日期
-                # 判断【应还款日期】与【统计时间】差值
-                jugtimeDiff3 = (
-                        datetime.strptime(series["应还款日期"][:10], fmt) - datetime.strptime(series["统计时间"][:10], fmt)).days
-                if jugtimeDiff3 >= 0:
-                    series[
-                        "账期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
-                else:
-                    series[
-                        "超期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{上次统计时间}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
+# 将日期字符串列（取前10位，%Y-%m-%d）解析为datetime64，需要参与判断的行不是有效日期时报错（同datetime.strptime）
+def parseDateColumn(se, needMask):
+    """
+    :param se: 日期字符串Series
+    :param needMask: 需要参与判断的行
+    :return: datetime64 Series，无效日期为NaT
+    """
+    # 日期的取值较少，只解析不重复的值
+    codes, uniques = pd.factorize(se)
+    uniqueDates = pd.to_datetime(pd.Series(uniques, dtype=object).astype(str).str[:10], format="%Y-%m-%d", errors="coerce")
+    # 空值的codes为-1，对应末尾的NaT
+    dateSe = pd.Series(np.append(uniqueDates.to_numpy(), np.datetime64("NaT", "ns"))[codes], index=se.index)
+    errorMask = needMask & dateSe.isna().to_numpy()
+    if errorMask.any():
+        raise ValueError(f"【{se.name}】不是有效的日期：{se[errorMask].iloc[0]}")
+    return dateSe
+
+
+# 生成财务费用公式
+def getCostFormula(formulaArgs, indexDict, amountCol="欠款金额"):
+    """
+    :param formulaArgs: (结束日期列, 开始日期列, 扣除天数, 费率列)，天数为DAYS(结束日期, 开始日期) - 扣除天数
+    :param indexDict: 计算公式时需要的列所在列标识字典
+    :param amountCol: 金额列
+    :return: 公式字符串
+    """
+    endCol, startCol, deductDays, rateCol = formulaArgs
+    days = f'DAYS(INDIRECT("{indexDict[endCol]}"&ROW()),INDIRECT("{indexDict[startCol]}"&ROW()))'
+    if deductDays:
+        days = f"({days} - {deductDays})"
+    return f'={days} * INDIRECT("{indexDict[rateCol]}"&ROW()) / 365 * INDIRECT("{indexDict[amountCol]}"&ROW())'
 
+
+# 批量计算欠款明细表的账期费用（按debtCostRuleList判断）
+def caldebtCostArray(df, stime, etime, indexDict):
+    """
+    :param df: 需要计算的欠款明细df
+    :param stime: 用户输入的开始日期
+    :param etime: 用户输入的结束日期
+    :param indexDict: 计算公式时需要的列所在列标识字典
+    :return: df[["账期财务费用", "超期财务费用", "备注"]]，不满足任何规则的数据保持原值
+    """
+    fmt = "%Y-%m-%d"
+    resultDf = df[["账期财务费用", "超期财务费用", "备注"]].copy()
+    if df.empty:
+        return resultDf
+    unpaid = df["实际回款日"].isna().to_numpy()
+    newIndex = (df["索引新增标识"] == "新增").to_numpy()
+    # 日期只解析一次，只有判断中用到该日期的行必须为有效日期
+    baseDate = parseDateColumn(df["收付基准日期"], np.ones(len(df), dtype=bool))
+    baseDiffS = (baseDate - datetime.strptime(stime, fmt)).dt.days.to_numpy()
+    baseDiffE = (baseDate - datetime.strptime(etime, fmt)).dt.days.to_numpy()
+    inRange, afterEnd, beforeStart = (baseDiffS > 0) & (baseDiffE <= 0), (baseDiffS > 0) & (baseDiffE > 0), baseDiffS <= 0
+    dueDate = parseDateColumn(df["应还款日期"], (unpaid & (inRange | (beforeStart & ~newIndex))) | (~unpaid & ~inRange))
+    calDate = parseDateColumn(df["统计时间"], (unpaid & inRange) | (~unpaid & afterEnd))
+    dueDiffE = (datetime.strptime(etime, fmt) - dueDate).dt.days.to_numpy()
+    lastCalDate = parseDateColumn(df["上次统计时间"], beforeStart & (dueDiffE > 0) & ~(unpaid & newIndex))
+
+    conditionDict = {"未回款": unpaid, "已回款": ~unpaid, "新增索引": newIndex,
+                     "基准日期在区间内": inRange, "基准日期晚于区间": afterEnd, "基准日期早于区间": beforeStart,
+                     "应还款日期早于统计时间": ((dueDate - calDate).dt.days < 0).to_numpy(),
+                     "未到应还款日期": dueDiffE <= 0,
+                     "应还款日期不早于上次统计时间": ((dueDate - lastCalDate).dt.days >= 0).to_numpy()}
+    # 账期天数：商业分销扣除60天，其余扣除30天
+    businessMask = (df["采购类型"] == "商业分销").to_numpy()
+    for conditionList, resultCol, result in debtCostRuleList:
+        mask = np.ones(len(df), dtype=bool)
+        for condition in conditionList:
+            mask &= ~conditionDict[condition[1:]] if condition.startswith("~") else conditionDict[condition]
+        if not mask.any():
+            continue
+        if not isinstance(result, tuple):
+            resultDf.loc[mask, resultCol] = result
+        elif result[2] != "账期天数":
+            resultDf.loc[mask, resultCol] = getCostFormula(result, indexDict)
         else:
+            formula30 = getCostFormula(result[:2] + (30,) + result[3:], indexDict)
+            formula60 = getCostFormula(result[:2] + (60,) + result[3:], indexDict)
+            resultDf.loc[mask, resultCol] = np.where(businessMask[mask], formula60, formula30)
+    return resultDf
 
-            # 再判断第二张欠款明细表日期与【应还款日期】差值
-            jugtimeDiff2 = (datetime.strptime(etime, fmt) - datetime.strptime(series["应还款日期"][:10], fmt)).days
-            if jugtimeDiff2 <= 0:
-                series[
-                    "账期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                    **indexDict)
 
-            else:
-                # 超期回款，判断【上次统计时间】与【应还款日期】的差值
-                jugtimeDiff3 = (datetime.strptime(series["上次统计时间"][:10], fmt) - datetime.strptime(series["应还款日期"][:10],
-                                                                                                  fmt)).days
-                if jugtimeDiff3 <= 0:
-                    series[
-                        "超期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
-                else:
-                    series[
-                        "超期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{上次统计时间}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
-                        **indexDict)
+# 读取账期费用基础表的全部sheet数据
+def readBaseSheetDfs(baseTablePath):
+    """
+    :param baseTablePath: 账期费用基础表路径
+    :return: {"欠款明细":欠款明细df, "银票":银票df, "预收补费用":预收补费用df}, {"欠款明细": sheet名称, ...}
+    """
+    # 获取需要的df字典
+    dfDict = pd.read_excel(baseTablePath, sheet_name=None, dtype=str)
+    baseDfDict, sheetNameDict = {}, {}
+    for sheetName, df in dfDict.items():
+        # df中列名可能前后有空格，进行删除
+        allCol = df.columns
+        allCol = [col.strip() for col in allCol]
+        df.columns = allCol
+        for nameKeyWord in ["欠款明细", "银票", "预收补费用"]:
+            if nameKeyWord in sheetName:
+                baseDfDict[nameKeyWord] = df
+                sheetNameDict[nameKeyWord] = sheetName
+                break
+    return baseDfDict, sheetNameDict
+
+
+# 获取基础表索引文件路径（与基础表在同一目录）
+def getBaseMetaPath(baseTablePath):
+    return os.path.splitext(baseTablePath)[0] + baseMetaSuffix
+
+
+# 生成基础表某个sheet的索引信息
+def buildSheetMeta(nameKeyWord, sheetName, df, lastMeta=None, valueFlag=None):
+    """
+    :param nameKeyWord: sheet关键词（欠款明细、银票、预收补费用）
+    :param sheetName: sheet名称
+    :param df: 该sheet的数据df（或本次新增的数据df）
+    :param lastMeta: 已有数据的索引信息，不为None时在其基础上追加df的数据
+    :param valueFlag: 写入后费用列是否全部为数值（数值模式写入），为None时沿用lastMeta（无数据时为True）
+    :return: {"名称": sheet名称, "行数": 行数, "统计时间": 最新的统计时间, "费用为数值": 是否, "票号": [每行的票号]（银票）}
+    """
+    lastMeta = lastMeta or {"行数": 0, "统计时间": "", "票号": []}
+    calTimeList = [str(i)[:10] for i in df["统计时间"].dropna() if str(i) != ""] if "统计时间" in df.columns else []
+    meta = {"名称": sheetName, "行数": lastMeta["行数"] + df.shape[0],
+            "统计时间": max([lastMeta["统计时间"]] + calTimeList)}
+    meta["费用为数值"] = bool(valueFlag) if valueFlag is not None else lastMeta.get("费用为数值", meta["行数"] == 0)
+    if nameKeyWord == "银票":
+        ticketList = df["票号"].tolist() if "票号" in df.columns else [None] * df.shape[0]
+        # 空票号统一为None（同写入后重新读取的结果）
+        meta["票号"] = lastMeta["票号"] + [None if pd.isna(i) or i == "" else i for i in ticketList]
+    return meta
+
 
-    return series[["账期财务费用", "超期财务费用", "备注"]]
+# 获取欠款明细df中的索引集合（不含空值）
+def getDebtIndexSet(df):
+    return set() if "索引" not in df.columns else {i for i in df["索引"].dropna() if i != ""}
 
 
-# 计算预收补费用sheet的预收利息
-def calAdvanceCost(series, lastCalDate, indexDict):
+# 写入基础表的索引文件（记录基础表的大小、修改时间，基础表变化后索引文件失效）
+def writeBaseTableMeta(baseTablePath, sheetMetaDict, indexSet):
     """
-    :param series: df的行数据
-    :param lastCalDate: 上次统计时间（基础表中“统计时间”列最新的日期）
-    :param indexDict: 计算公式时需要的列所在列标识字典，如 {"欠款金额":"M","贷款利率"："K"}
-    :return: "预收利息"
+    :param baseTablePath: 账期费用基础表路径
+    :param sheetMetaDict: {sheet关键词: buildSheetMeta的结果}
+    :param indexSet: 欠款明细的索引集合
+    :return: 索引信息字典
     """
-    fmt = "%Y-%m-%d"
-    # 如果是第一次统计，无上次统计时间
-    if lastCalDate == "":
-        jugtimeDiff = 1  # 任一大于0的数均可
-    else:
-        # 判断"过帐日期"和"上次统计时间"的日期差
-        jugtimeDiff = (datetime.strptime(series["过帐日期"][:10], fmt) - datetime.strptime(lastCalDate, fmt)).days
-    if jugtimeDiff >= 0:
-        resultCost = '=DAYS(INDIRECT("{统计时间}"&ROW()),INDIRECT("{过帐日期}"&ROW())) * INDIRECT("{利率}"&ROW()) / 365 * INDIRECT("{本币金额}"&ROW())'.format(
-            **indexDict)
-    else:
-        resultCost = '=DAYS(INDIRECT("{统计时间}"&ROW()),INDIRECT("{上次统计时间}"&ROW())) * INDIRECT("{利率}"&ROW()) / 365 * INDIRECT("{本币金额}"&ROW())'.format(
-            **indexDict)
-
-    return resultCost
+    stat = os.stat(baseTablePath)
+    meta = {"版本": baseMetaVersion, "大小": stat.st_size, "修改时间": stat.st_mtime_ns, "sheet": sheetMetaDict,
+            "索引": sorted(indexSet)}
+    metaPath = getBaseMetaPath(baseTablePath)
+    tempPath = f"{metaPath}.{os.getpid()}.tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tempPath, metaPath)
+    return meta
+
+
+# 基础表被excel重新保存（内容未变）后，更新索引文件中记录的大小、修改时间
+def refreshBaseTableMeta(baseTablePath):
+    meta = readBaseTableMeta(baseTablePath, checkStamp=False)
+    if meta is not None:
+        writeBaseTableMeta(baseTablePath, meta["sheet"], meta["索引"])
+
+
+# 读取基础表的索引文件，不存在、版本不同或基础表已变化时为None
+def readBaseTableMeta(baseTablePath, checkStamp=True):
+    metaPath = getBaseMetaPath(baseTablePath)
+    if not baseTablePath or not os.path.exists(metaPath) or not os.path.exists(baseTablePath):
+        return None
+    try:
+        with open(metaPath, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    stat = os.stat(baseTablePath)
+    if meta.get("版本") != baseMetaVersion or (checkStamp and (meta["大小"], meta["修改时间"]) != (stat.st_size, stat.st_mtime_ns)):
+        return None
+    return meta
+
+
+# 根据基础表重新生成索引文件（读取全部sheet数据）
+def rebuildBaseTableMeta(baseTablePath):
+    """
+    :param baseTablePath: 账期费用基础表路径
+    :return: 索引信息字典
+    """
+    baseDfDict, sheetNameDict = readBaseSheetDfs(baseTablePath)
+    sheetMetaDict = {key: buildSheetMeta(key, sheetNameDict[key], df) for key, df in baseDfDict.items()}
+    return writeBaseTableMeta(baseTablePath, sheetMetaDict, getDebtIndexSet(baseDfDict.get("欠款明细", pd.DataFrame())))
 
 
-# 获取账期费用基础表数据
+# 获取账期费用基础表数据（基础表的索引文件有效时只读取索引文件，不读取sheet数据）
 def getBaseTableData(baseTablePath):
     """
     :param baseTablePath: 账期费用基础表路径
     :return: [{"欠款明细":欠款明细df, "银票":银票df, "预收补费用":预收补费用df},
                 {"欠款明细": 最新的统计时间, "预收补费用":最新的统计时间}]
+             使用索引文件时各df只有行数（银票df只有“票号”列），sheet数据在saveDataToFile写入时从结果表中读取
     """
-    if baseTablePath != "":
-        # 获取需要的df字典
-        dfDict = pd.read_excel(baseTablePath, sheet_name=None, dtype=str)
+    global baseMetaDict
+    meta = readBaseTableMeta(baseTablePath)
+    if meta is not None:
         baseDfDict = {}
-        for sheetName, df in dfDict.items():
-            # df中列名可能前后有空格，进行删除
-            allCol = df.columns
-            allCol = [col.strip() for col in allCol]
-            df.columns = allCol
-            if "欠款明细" in sheetName:
-                baseDfDict["欠款明细"] = df
-            elif "银票" in sheetName:
-                baseDfDict["银票"] = df
-            elif "预收补费用" in sheetName:
-                baseDfDict["预收补费用"] = df
+        for nameKeyWord, sheetMeta in meta["sheet"].items():
+            if nameKeyWord == "银票":
+                # 空票号为nan（同read_excel读取的结果，isin匹配时nan与None不相等）
+                baseDfDict[nameKeyWord] = pd.DataFrame({"票号": [np.nan if i is None else i for i in sheetMeta["票号"]]},
+                                                       dtype=object)
             else:
-                continue
+                baseDfDict[nameKeyWord] = pd.DataFrame(index=range(sheetMeta["行数"]))
+    elif baseTablePath != "":
+        baseDfDict, sheetNameDict = readBaseSheetDfs(baseTablePath)
+        # 生成索引文件，下次运行时使用
+        sheetMetaDict = {key: buildSheetMeta(key, sheetNameDict[key], df) for key, df in baseDfDict.items()}
+        meta = writeBaseTableMeta(baseTablePath, sheetMetaDict, getDebtIndexSet(baseDfDict.get("欠款明细", pd.DataFrame())))
     else:
         # 没有基础表则默认基础表数据为空
         baseDfDict = {"欠款明细": pd.DataFrame(columns=debtResultCol),
                       "银票": pd.DataFrame(columns=bankNotesResultCol),
                       "预收补费用": pd.DataFrame(columns=advanceResultCol)}
+        meta = {"sheet": {key: buildSheetMeta(key, "", df) for key, df in baseDfDict.items()}, "索引": []}
+    baseMetaDict = meta
 
     # 获取"欠款明细"和"预收补费用"的最新统计时间
     lastCalTimeDict = {}
     for key in ["欠款明细", "预收补费用"]:
-        df_temp = baseDfDict[key].sort_values(by="统计时间", ascending=False)
-        if not df_temp.empty:
-            lastCalTimeDict[key] = df_temp.iloc[0]["统计时间"][:10]
+        if meta["sheet"][key]["统计时间"]:
+            lastCalTimeDict[key] = meta["sheet"][key]["统计时间"]
         else:
             # 如果为空表或者为第一次运行无基础数据的情况，默认“统计时间”=去年最后一天
             today = datetime.today()
@@ -580,6 +646,54 @@ def getBaseTableData(baseTablePath):
     return baseDfDict, lastCalTimeDict
 
 
+# 获取每个键码第一次出现的行位置（键码为pd.factorize的结果，-1为空值），不存在的键码为-1
+def getFirstPositions(codes, keyNum):
+    positions = np.full(keyNum, -1, dtype=np.int64)
+    validPos = np.flatnonzero(codes >= 0)
+    uniqueCodes, firstIdx = np.unique(codes[validPos], return_index=True)
+    positions[uniqueCodes] = validPos[firstIdx]
+    return positions
+
+
+# 对比上次和本次的欠款快照（按键汇总金额），获取已核销（键不在本次快照中）和部分核销（金额减少）的数据
+def diffSnapshot(df_last, df_now, lastKeys, nowKeys, amountCol="欠款金额"):
+    """
+    :param df_last: 上次的快照df
+    :param df_now: 本次的快照df
+    :param lastKeys: df_last每行的键（Series，空值不参与对比）
+    :param nowKeys: df_now每行的键（Series）
+    :param amountCol: 金额列名
+    :return: 回款数据df，按键在df_last中首次出现的顺序排列：
+             已核销的键为df_last中该键的全部行，“回款金额”为该行的金额；
+             部分核销的键为df_now中该键的第一行，“回款金额”为金额合计减少的数（保留2位小数）；
+             “上次行位置”为已核销行在df_last中的行位置、部分核销的键在df_last中第一行的行位置
+    """
+    lastCodes, uniques = pd.factorize(lastKeys)
+    keyNum = len(uniques)
+    nowCodes = pd.Index(uniques).get_indexer(nowKeys)
+    lastValid, nowValid = lastCodes >= 0, nowCodes >= 0
+    lastAmount = df_last[amountCol].to_numpy(dtype=float)
+    nowAmount = df_now[amountCol].to_numpy(dtype=float)
+    # 按键汇总金额（空值按0计算，同sum）
+    lastSum = np.bincount(lastCodes[lastValid], weights=np.nan_to_num(lastAmount[lastValid]), minlength=keyNum)
+    nowSum = np.bincount(nowCodes[nowValid], weights=np.nan_to_num(nowAmount[nowValid]), minlength=keyNum)
+    nowFirst = getFirstPositions(nowCodes, keyNum)
+
+    # 已核销：键不在本次快照中
+    clearedPos = np.flatnonzero(lastValid & (nowFirst[lastCodes] < 0))
+    df_cleared = df_last.iloc[clearedPos].assign(回款金额=lastAmount[clearedPos], 上次行位置=clearedPos,
+                                                 键顺序=lastCodes[clearedPos])
+    # 部分核销：金额合计减少
+    diffAmount = new_round(lastSum - nowSum)
+    partialCodes = np.flatnonzero((nowFirst >= 0) & (diffAmount > 0))
+    df_partial = df_now.iloc[nowFirst[partialCodes]].assign(
+        回款金额=diffAmount[partialCodes], 上次行位置=getFirstPositions(lastCodes, keyNum)[partialCodes],
+        键顺序=partialCodes)
+
+    df_diff = pd.concat([df_cleared, df_partial])
+    return df_diff.iloc[np.argsort(df_diff["键顺序"].to_numpy(), kind="stable")].drop(columns="键顺序")
+
+
 # 操作《欠款明细》sheet, 匹配实际回款日、实际回款金额、扣款时间、月份、统计时间、上次统计时间
 def debtSheetOperate(sTime, eTime, debtFileList, saleDetailPathList, lastCalTimeDict):
     """
@@ -595,31 +709,14 @@ def debtSheetOperate(sTime, eTime, debtFileList, saleDetailPathList, lastCalTime
     df_s = initDebtDf(debtFileList[0])
     df_e = initDebtDf(debtFileList[1])
 
-    addDebtDf = pd.DataFrame(columns=df_s.columns)
-    allIndexList = set(df_s["索引temp"].tolist())
-    for idx in allIndexList:
-        df_match_s = df_s.loc[df_s["索引temp"] == idx].copy()
-        df_match_e = df_e.loc[df_e["索引temp"] == idx]
-        if df_match_e.empty:
-            # 索引不在第二张欠款明细表中，说明已被核销
-            df_match_s["实际回款日"] = eTime
-            df_match_s["实际回款金额"] = df_match_s["欠款金额"]
-            addDebtDf = addDebtDf.append(df_match_s)
-        else:
-            # 索引在第二张欠款明细表中，比较欠款金额，判断是否为部分核销
-            diffAmount = new_round(df_match_s["欠款金额"].sum() - df_match_e["欠款金额"].sum())
-            series_e = df_match_e.iloc[0].copy()  # 数据以第二张欠款明细表匹配出的任意一条数据为准
-            if diffAmount > 0:
-                series_e["实际回款日"] = eTime
-                series_e["实际回款金额"] = diffAmount
-                series_e["欠款金额"] = diffAmount
-                addDebtDf = addDebtDf.append(series_e)
-            else:
-                # 无回款，不进行处理
-                continue
-    else:
-        addDebtDf["扣款时间"] = matchDeductTime(eTime)
-        addDebtDf["月份"] = f"{int(eTime[5:7])}月"
+    # 索引不在第二张欠款明细表中的数据已被核销；在第二张欠款明细表中且欠款金额减少的为部分核销，
+    # 数据以第二张欠款明细表匹配出的第一条数据为准，欠款金额、实际回款金额为减少的金额；无回款的不处理
+    addDebtDf = diffSnapshot(df_s, df_e, df_s["索引temp"], df_e["索引temp"])
+    addDebtDf["实际回款日"] = eTime
+    addDebtDf["实际回款金额"] = addDebtDf["欠款金额"] = addDebtDf.pop("回款金额")
+    addDebtDf = addDebtDf.drop(columns="上次行位置")
+    addDebtDf["扣款时间"] = matchDeductTime(eTime)
+    addDebtDf["月份"] = f"{int(eTime[5:7])}月"
 
     # Step: 销售明细表匹配
     # 读取销售明细表
@@ -642,35 +739,17 @@ def debtSheetOperate(sTime, eTime, debtFileList, saleDetailPathList, lastCalTime
     df_detail = df_detail.pivot_table(index=pivotIdxCol, values="欠款金额", aggfunc="sum")
     df_detail = df_detail.reset_index()
 
-    addSaleDetailDf = pd.DataFrame(columns=df_detail.columns)
     df_e = df_e.sort_values(by="应还款日期", ascending=True).reset_index(drop=True)
-    allOrderNum = set(df_detail["销售单代码"].tolist())
-    for num in allOrderNum:
-        df_match = df_e.loc[df_e["销售单代码"] == num.zfill(10)]
-        df_base = df_detail.loc[df_detail["销售单代码"] == num].copy()
-        if df_match.empty:
-            # 销售订单号（销售单代码）不在第二张欠款明细表中，说明已被核销
-            # 核销日期为出具发票日（凭证记帐日期）
-            df_base["实际回款日"] = df_base["凭证记帐日期"]
-            df_base["实际回款金额"] = df_base["欠款金额"]
-            addSaleDetailDf = addSaleDetailDf.append(df_base)
-        else:
-            # 销售订单号（销售单代码）在第二张欠款明细表中，比较欠款金额，判断是否为部分核销
-            diffAmount = new_round(df_base["欠款金额"].sum() - df_match["欠款金额"].sum())
-            series_e = df_match.iloc[0].copy()  # 数据以欠款明细表该销售订单号（销售单代码）应还款日期最早的为准
-            if diffAmount > 0:
-                # todo:销售明细表匹配为部分核销的取值情况
-                # series_e["索引"] = ""
-                series_e["实际回款日"] = df_base.iloc[0]["凭证记帐日期"]
-                series_e["实际回款金额"] = diffAmount
-                series_e["欠款金额"] = diffAmount
-                addSaleDetailDf = addSaleDetailDf.append(series_e)
-            else:
-                # 无回款，不进行处理
-                continue
-    else:
-        addSaleDetailDf["扣款时间"] = addSaleDetailDf["凭证记帐日期"].apply(matchDeductTime)
-        addSaleDetailDf["月份"] = addSaleDetailDf["凭证记帐日期"].apply(lambda x: f"{int(x[5:7])}月")
+    # 销售订单号（销售单代码，补齐10位后与欠款明细表匹配）不在第二张欠款明细表中的已被核销，核销日期为出具发票日（凭证记帐日期）；
+    # 在第二张欠款明细表中且金额减少的为部分核销，数据以欠款明细表该销售单代码应还款日期最早的为准，
+    # 核销日期为销售明细表该销售单代码第一条数据的出具发票日
+    # todo:销售明细表匹配为部分核销的取值情况
+    addSaleDetailDf = diffSnapshot(df_detail, df_e, df_detail["销售单代码"].str.zfill(10), df_e["销售单代码"])
+    addSaleDetailDf["实际回款日"] = df_detail["凭证记帐日期"].to_numpy()[addSaleDetailDf.pop("上次行位置").to_numpy()]
+    addSaleDetailDf["实际回款金额"] = addSaleDetailDf["欠款金额"] = addSaleDetailDf.pop("回款金额")
+    deductTimeDict = {date: matchDeductTime(date) for date in addSaleDetailDf["凭证记帐日期"].unique()}
+    addSaleDetailDf["扣款时间"] = addSaleDetailDf["凭证记帐日期"].map(deductTimeDict)
+    addSaleDetailDf["月份"] = addSaleDetailDf["凭证记帐日期"].str[5:7].map(lambda x: f"{int(x)}月")
 
     df_e["扣款时间"] = matchDeductTime(eTime)
     df_e["月份"] = f"{int(eTime[5:7])}月"
@@ -680,8 +759,8 @@ def debtSheetOperate(sTime, eTime, debtFileList, saleDetailPathList, lastCalTime
     df_debt["上次统计时间"] = lastCalTimeDict["欠款明细"]
 
     # 新增“索引新增标识”列，标记需要计算的欠款数据索引与上次欠款明细表相比是否为新增索引
-    lastIndexList = df_s.loc[df_s["索引"] != "", "索引"].tolist()
-    df_debt["索引新增标识"] = df_debt["索引"].apply(lambda x: "" if x in lastIndexList else "新增")
+    lastIndexSet = set(df_s.loc[df_s["索引"] != "", "索引"])
+    df_debt["索引新增标识"] = np.where(df_debt["索引"].isin(lastIndexSet), "", "新增")
     return df_debt
 
 
@@ -731,7 +810,7 @@ def debtSheetCal(stime, etime, df_debt, personConfigPath):
         colLetter = get_column_letter(debtResultCol.index(colName) + 1)
         indexDict[colName] = colLetter
     # 计算财务费用(包含已还款和未还款)
-    df_debt[["账期财务费用", "超期财务费用", "备注"]] = df_debt.apply(caldebtCost, args=(stime, etime, indexDict), axis=1)
+    df_debt[["账期财务费用", "超期财务费用", "备注"]] = caldebtCostArray(df_debt, stime, etime, indexDict)
     df_debt = df_debt.loc[df_debt["备注"] != "去除"]
     # 计算总财务费用
     df_debt["总财务费用"] = '=INDIRECT("{账期财务费用}"&ROW())+INDIRECT("{超期财务费用}"&ROW())+INDIRECT("{贴现利息}"&ROW())'.format(
@@ -829,7 +908,7 @@ def advanceOperateAndCal(sapFilePath, receivableFilePath, exportDate, lastCalTim
         for colName in ["统计时间", "上次统计时间", "过帐日期", "利率", "本币金额"]:
             colLetter = get_column_letter(advanceResultCol.index(colName) + 1)
             indexDict[colName] = colLetter
-        advanceDf["预收利息"] = advanceDf.apply(calAdvanceCost, args=(lastCalTimeDict["预收补费用"], indexDict), axis=1)
+        advanceDf["预收利息"] = calAdvanceCostArray(advanceDf, lastCalTimeDict["预收补费用"], indexDict)
 
         # 初始化没有的列，默认为空，结果表中的列可能比计算出的数据列多，这些列默认为空即可
         for col in advanceResultCol:
@@ -850,28 +929,128 @@ def advanceOperateAndCal(sapFilePath, receivableFilePath, exportDate, lastCalTim
     return advanceDf, receivableTotalDf
 
 
-# 将各sheet的df合并，保存到结果表中
-def saveDataToFile(baseDfDict, df_debt, bankNotesDf, advanceDf, resultPath, eTime, bankNotesCalYear, receivableTotalDf,
-                   baseTablePath):
+# 读取openpyxl sheet的数据（第1行为表头，读取公式而非缓存值）
+def readSheetDf(ws, rowNum):
+    """
+    :param ws: openpyxl的sheet
+    :param rowNum: 读取的数据行数（不含表头）
+    :return: 数据df（列名去除前后空格，值为原始类型）
+    """
+    rows = ws.iter_rows(min_row=1, max_row=rowNum + 1, values_only=True)
+    header = [str(i).strip() if i is not None else "" for i in next(rows, ())]
+    return pd.DataFrame([list(row) for row in rows], columns=header, dtype=object)
+
+
+# 设置费用列的输出方式（uibot中调用）
+def setCostValueMode(valueFlag, auditFlag=False):
+    """
+    :param valueFlag: 是否将费用列的INDIRECT公式计算为数值写入（包括基础表中已有的公式），否则写入公式
+    :param auditFlag: 数值模式下是否添加计算明细sheet，记录每个数值的计算方式和参与计算的值
+    :return:
+    """
+    global costValueFlag, costAuditFlag
+    costValueFlag = bool(valueFlag)
+    costAuditFlag = bool(auditFlag)
+
+
+# 解析费用公式（兼容excel保存后去除空格、DAYS前加_xlfn.的公式），无法识别时为None
+def parseCostFormula(formula):
+    """
+    :param formula: 公式字符串
+    :return: ("天数", 结束日期列标识, 开始日期列标识, 扣除天数, 费率列标识, 金额列标识) 或 ("求和", [列标识])
+    """
+    formula = re.sub(r"\s", "", formula)
+    matchObj = costFormulaPattern.match(formula)
+    if matchObj:
+        endLetter, startLetter, deductDays, rateLetter, amountLetter = matchObj.groups()
+        return "天数", endLetter, startLetter, int(deductDays or 0), rateLetter, amountLetter
+    if sumFormulaPattern.match(formula):
+        return "求和", re.findall(r'INDIRECT\("([A-Z]+)"&ROW\(\)\)', formula)
+    return None
+
+
+# 将列转换为数值，同时返回非空但无法转换的行（如无法计算的公式）
+def toNumberColumn(se):
+    numSe = pd.to_numeric(se, errors="coerce")
+    return numSe, (se.notna() & (se != "") & numSe.isna()).to_numpy()
+
+
+# 将费用列中的公式计算为数值（同一公式的行一起计算），无法识别或无法计算的公式保持原样
+def calFormulaValue(df, costCol, sheetName="", startRow=2, auditList=None):
+    """
+    :param df: sheet数据df（列顺序与sheet一致，公式中的列标识按列位置对应df的列）
+    :param costCol: 费用列名
+    :param sheetName: sheet名称（计算明细使用）
+    :param startRow: df第一行在sheet中的行号（计算明细使用）
+    :param auditList: 计算明细df列表，不为None时添加本列的计算明细
+    :return: 计算后的费用Series，被计算为数值的行位置数组
+    """
+    letterDict = {get_column_letter(i + 1): col for i, col in enumerate(df.columns)}
+    values = df[costCol].to_numpy(dtype=object).copy()
+    formulaSe = df[costCol].where(df[costCol].map(lambda x: isinstance(x, str) and x.startswith("=")))
+    calPosList = []
+    for formula, posArr in formulaSe.groupby(formulaSe, sort=False).indices.items():
+        parsed = parseCostFormula(formula)
+        if parsed is None or not all(i in letterDict for i in (parsed[1] if parsed[0] == "求和" else parsed[1:3] + parsed[4:])):
+            continue
+        rows = df.iloc[posArr]
+        audit = {"sheet": sheetName, "行号": startRow + posArr, "列": costCol}
+        if parsed[0] == "求和":
+            colList = [letterDict[i] for i in parsed[1]]
+            numList = [toNumberColumn(rows[col]) for col in colList]
+            result = sum(num.fillna(0).to_numpy() for num, _ in numList)
+            validMask = ~np.logical_or.reduce([badMask for _, badMask in numList])
+            audit["计算方式"] = " + ".join(colList)
+        else:
+            _, endLetter, startLetter, deductDays, rateLetter, amountLetter = parsed
+            endCol, startCol, rateCol, amountCol = (letterDict[i] for i in (endLetter, startLetter, rateLetter, amountLetter))
+            noCheck = np.zeros(len(rows), dtype=bool)
+            days = (parseDateColumn(rows[endCol], noCheck) - parseDateColumn(rows[startCol], noCheck)).dt.days.to_numpy()
+            rate, amount = (toNumberColumn(rows[col])[0].to_numpy() for col in (rateCol, amountCol))
+            result = (days - deductDays) * rate / 365 * amount
+            validMask = np.isfinite(result)
+            daysText = f"(DAYS({endCol}, {startCol}) - {deductDays})" if deductDays else f"DAYS({endCol}, {startCol})"
+            audit.update({"计算方式": f"{daysText} * {rateCol} / 365 * {amountCol}", "天数": days, "费率": rate,
+                          "金额": amount})
+        values[posArr[validMask]] = result[validMask]
+        calPosList.append(posArr[validMask])
+        if auditList is not None:
+            audit["结果"] = result
+            auditList.append(pd.DataFrame(audit).iloc[np.flatnonzero(validMask)])
+    calPos = np.sort(np.concatenate(calPosList)) if calPosList else np.array([], dtype=int)
+    return pd.Series(values, index=df.index, name=costCol), calPos
+
+
+# 计算sheet中各费用列的数值（按costValueColDict的顺序，总财务费用使用已计算的账期、超期财务费用）
+def calCostValues(df, nameKeyWord, sheetName, startRow, auditList=None):
+    """
+    :param df: sheet数据df
+    :param nameKeyWord: sheet关键词（欠款明细、银票、预收补费用）
+    :param sheetName: sheet名称
+    :param startRow: df第一行在sheet中的行号
+    :param auditList: 计算明细df列表
+    :return: 计算后的df，{费用列名: 被计算为数值的行位置数组}
+    """
+    df = df.copy()
+    calPosDict = {}
+    for costCol in costValueColDict[nameKeyWord]:
+        if costCol in df.columns and not df.empty:
+            df[costCol], calPosDict[costCol] = calFormulaValue(df, costCol, sheetName, startRow, auditList)
+    return df, calPosDict
+
+
+# 加载基础表，将新增的数据写入各sheet后保存为结果表（openpyxl，数值模式下可替换基础表中的费用公式并生成计算明细）
+def writeDataToBook(baseDfDict, addDataDict, newSheetNameDict, resultPath, baseTablePath, auditList):
     """
     :param baseDfDict: 基础数据df字典{"欠款明细":欠款明细df, "银票":银票df, "预收补费用":预收补费用df}
-    :param df_debt: 银票计算结果df
-    :param bankNotesDf: 银票计算结果df
-    :param advanceDf: 预收补费用计算结果df
+    :param addDataDict: 新增数据df字典（数值模式下替换为费用列计算后的df）
+    :param newSheetNameDict: 各sheet写入后的名称字典
     :param resultPath: 结果表路径
-    :param eTime: 用户输入的情况明细结束日期
-    :param bankNotesCalYear: 本次处理的银票年份
-    :param receivableTotalDf: 回款汇总表df（用于匹配之前预收数据的"销售员", "销售员代码"）
     :param baseTablePath: 账期费用基础表路径
+    :param auditList: 计算明细df列表，为None时不生成计算明细sheet
     :return:
     """
     global recordDict
-    debtSheetName = f"FY{eTime[2:4]}账期明细-欠款明细"
-    bankNotesSheetName = f"FY{bankNotesCalYear[2:4]}账期费用-银票"
-    advanceSheetName = "预收补费用"
-
-    addDataDict = {"欠款明细": df_debt, "银票": bankNotesDf, "预收补费用": advanceDf}
-    newSheetNameDict = {"欠款明细": debtSheetName, "银票": bankNotesSheetName, "预收补费用": advanceSheetName}
     with pd.ExcelWriter(resultPath) as writer:
         book = openpyxl.load_workbook(baseTablePath)
         writer.book = book
@@ -883,6 +1062,18 @@ def saveDataToFile(baseDfDict, df_debt, bankNotesDf, advanceDf, resultPath, eTim
                 if nameKeyWord in sheetName:
                     targetSheetName = sheetName
                     break
+            # 数值模式：新增数据的费用列计算为数值写入，基础表中已有的费用公式也替换为数值
+            if costValueFlag:
+                addDataDict[nameKeyWord] = calCostValues(addDataDict[nameKeyWord], nameKeyWord,
+                                                         newSheetNameDict[nameKeyWord], df_cal.shape[0] + 2, auditList)[0]
+                # 基础表数据从sheet中读取（费用列为公式，df_cal可能只有行数）
+                ws = writer.sheets[targetSheetName]
+                df_base = readSheetDf(ws, df_cal.shape[0])
+                df_value, calPosDict = calCostValues(df_base, nameKeyWord, newSheetNameDict[nameKeyWord], 2, auditList)
+                for costCol, calPos in calPosDict.items():
+                    colNum = df_base.columns.get_loc(costCol) + 1
+                    for pos, value in zip(calPos, df_value[costCol].to_numpy()[calPos]):
+                        ws.cell(row=pos + 2, column=colNum).value = float(value)
             # 写入数据
             startRow = df_cal.shape[0] + 1
             addDataDict[nameKeyWord].to_excel(excel_writer=writer, sheet_name=targetSheetName, index=False,
@@ -921,11 +1112,94 @@ def saveDataToFile(baseDfDict, df_debt, bankNotesDf, advanceDf, resultPath, eTim
             # 可能存在跨年的情况，需要修改sheet名称
             writer.sheets[targetSheetName].title = newSheetNameDict[nameKeyWord]
 
+        # 计算明细sheet（基础表中已有的计算明细替换为本次的）
+        if auditList is not None:
+            if costAuditSheetName in book.sheetnames:
+                del book[costAuditSheetName]
+                writer.sheets.pop(costAuditSheetName, None)
+            auditDf = pd.concat(auditList, ignore_index=True).sort_values(["sheet", "行号"], kind="stable") if auditList \
+                else pd.DataFrame()
+            auditDf.reindex(columns=costAuditCol).to_excel(excel_writer=writer, sheet_name=costAuditSheetName, index=False)
+
         book.close()
         # writer.save()
         # writer.close()
 
 
+# 将新增的数据追加写入基础表各sheet的末尾后保存为结果表（只改写目标sheet的xml，不加载基础表）
+def appendDataToFile(baseDfDict, addDataDict, newSheetNameDict, resultPath, baseTablePath):
+    """
+    :param baseDfDict: 基础数据df字典（只使用行数）
+    :param addDataDict: 新增数据df字典（数值模式下替换为费用列计算后的df）
+    :param newSheetNameDict: 各sheet写入后的名称字典
+    :param resultPath: 结果表路径
+    :param baseTablePath: 账期费用基础表路径
+    :return:
+    """
+    global recordDict
+    sheetNameList = getSheetNames(baseTablePath)
+    appendDict, renameDict = {}, {}
+    for nameKeyWord, df_cal in baseDfDict.items():
+        # 获取处理的数据需要写入的sheet的名称
+        targetSheetName = next((sheetName for sheetName in sheetNameList if nameKeyWord in sheetName), "")
+        if costValueFlag:
+            addDataDict[nameKeyWord] = calCostValues(addDataDict[nameKeyWord], nameKeyWord, newSheetNameDict[nameKeyWord],
+                                                     df_cal.shape[0] + 2, None)[0]
+        appendDict[targetSheetName] = (df_cal.shape[0] + 2, addDataDict[nameKeyWord])
+        # 记录数据写入的起始行和结束行
+        recordDict[targetSheetName] = [df_cal.shape[0] + 2, df_cal.shape[0] + addDataDict[nameKeyWord].shape[0] + 1]
+        # 可能存在跨年的情况，需要修改sheet名称
+        if targetSheetName != newSheetNameDict[nameKeyWord]:
+            renameDict[targetSheetName] = newSheetNameDict[nameKeyWord]
+
+    tempPath = f"{resultPath}.{os.getpid()}.tmp.xlsx"
+    appendSheetRows(baseTablePath, tempPath, appendDict, renameDict)
+    os.replace(tempPath, resultPath)
+
+
+# 将各sheet的df合并，保存到结果表中
+def saveDataToFile(baseDfDict, df_debt, bankNotesDf, advanceDf, resultPath, eTime, bankNotesCalYear, receivableTotalDf,
+                   baseTablePath):
+    """
+    :param baseDfDict: 基础数据df字典{"欠款明细":欠款明细df, "银票":银票df, "预收补费用":预收补费用df}
+    :param df_debt: 银票计算结果df
+    :param bankNotesDf: 银票计算结果df
+    :param advanceDf: 预收补费用计算结果df
+    :param resultPath: 结果表路径
+    :param eTime: 用户输入的情况明细结束日期
+    :param bankNotesCalYear: 本次处理的银票年份
+    :param receivableTotalDf: 回款汇总表df（用于匹配之前预收数据的"销售员", "销售员代码"）
+    :param baseTablePath: 账期费用基础表路径
+    :return:
+    """
+    debtSheetName = f"FY{eTime[2:4]}账期明细-欠款明细"
+    bankNotesSheetName = f"FY{bankNotesCalYear[2:4]}账期费用-银票"
+    advanceSheetName = "预收补费用"
+
+    addDataDict = {"欠款明细": df_debt, "银票": bankNotesDf, "预收补费用": advanceDf}
+    newSheetNameDict = {"欠款明细": debtSheetName, "银票": bankNotesSheetName, "预收补费用": advanceSheetName}
+    auditList = [] if costValueFlag and costAuditFlag else None
+    # 追加写入：只在各sheet的xml末尾追加新增的行，不加载基础表；
+    # 数值模式下基础表中的费用列已全部为数值（由索引文件记录）且不需要计算明细时才可追加写入，否则需要替换基础表中的公式
+    baseSheetMetaDict = (baseMetaDict or {}).get("sheet", {})
+    baseValueFlag = bool(baseSheetMetaDict) and all(sheetMeta.get("费用为数值", False) for sheetMeta in baseSheetMetaDict.values())
+    if appendWriteFlag and (not costValueFlag or (baseValueFlag and auditList is None)):
+        appendDataToFile(baseDfDict, addDataDict, newSheetNameDict, resultPath, baseTablePath)
+    else:
+        writeDataToBook(baseDfDict, addDataDict, newSheetNameDict, resultPath, baseTablePath, auditList)
+
+    # 生成结果表的索引文件（基础表索引信息 + 本次新增的数据），结果表作为下次的基础表时不需要读取sheet数据
+    sheetMetaDict = {}
+    for nameKeyWord, df_cal in baseDfDict.items():
+        lastMeta = (baseMetaDict or {}).get("sheet", {}).get(nameKeyWord)
+        if lastMeta is None or lastMeta["行数"] != df_cal.shape[0]:
+            lastMeta = buildSheetMeta(nameKeyWord, "", df_cal)
+        sheetMetaDict[nameKeyWord] = buildSheetMeta(nameKeyWord, newSheetNameDict[nameKeyWord], addDataDict[nameKeyWord],
+                                                    lastMeta, costValueFlag)
+    lastIndexSet = set(baseMetaDict["索引"]) if baseMetaDict else getDebtIndexSet(baseDfDict["欠款明细"])
+    writeBaseTableMeta(resultPath, sheetMetaDict, lastIndexSet | getDebtIndexSet(df_debt))
+
+
 # 设置结果表各sheet样式
 def setStyle(resultPath):
     global recordDict
@@ -937,6 +1211,8 @@ def setStyle(resultPath):
 
     sheetNames = [sheet.name for sheet in wb.sheets]
     for sheetName in sheetNames:
+        if sheetName == costAuditSheetName:
+            continue
         ws = wb.sheets[sheetName]
         s_row, e_row = recordDict[sheetName]
         if "欠款明细" in sheetName:
@@ -1123,6 +1399,8 @@ def setStyle(resultPath):
     wb.save(resultPath)
     wb.close()
     app.quit()
+    # excel保存后结果表的修改时间变化，更新索引文件
+    refreshBaseTableMeta(resultPath)
 
 
 """
@@ -1143,8 +1421,22 @@ advanceResultCol：《预收补费用》sheet的结果列名列表
 advanceDelTextList：《未清项目明细表》数据需要删除的关键词列表
 advanceDelStr：《未清项目明细表》数据需要删除的关键词列表的pandas解析字符串
 receivableTableCol:下载的回款明细表需要筛选的列（即回款明细汇总表中的列）
+debtCostRuleList：《欠款明细》财务费用的判断规则，[(条件列表（同时满足，~为不满足）, 结果列, 公式参数或值)]，
+    公式参数为(结束日期列, 开始日期列, 扣除天数, 费率列)，扣除天数为"账期天数"时商业分销为60天、其余为30天
+baseMetaSuffix：基础表索引文件的后缀（基础表同名），记录各sheet行数、最新统计时间、银票票号、欠款明细索引
+baseMetaVersion：基础表索引文件的版本，格式变化时递增，旧版本的索引文件失效
+baseMetaDict：getBaseTableData读取的基础表索引信息，saveDataToFile在其基础上生成结果表的索引文件
+costValueFlag：是否将费用列的公式计算为数值写入结果表（setCostValueMode设置）
+costAuditFlag：数值模式下是否添加计算明细sheet（setCostValueMode设置）
+appendWriteFlag：saveDataToFile是否追加写入（只改写目标sheet的xml，不加载基础表），数值模式下基础表中仍有费用公式或需要计算明细时按原方式写入
+costValueColDict：数值模式下各sheet需要计算的费用列（按顺序计算，总财务费用在最后）
+costAuditSheetName：计算明细sheet名称
+costAuditCol：计算明细sheet的列
+costFormulaPattern：费用公式（DAYS(结束日期, 开始日期) - 扣除天数) * 费率 / 365 * 金额）的正则（去除空格后匹配）
+sumFormulaPattern：总财务费用公式（多列相加）的正则（去除空格后匹配）
 matchFlag：用于防止df.apply对第一条数据重复操作
 logger：用于打印日志
+profileStageList：enableStageProfile统计的阶段方法名列表
 recordDict: 记录各sheet页写入数据的起始行和结束行，例如：{"sheet1":[18,20], {"sheet2":[100,208]}
 """
 delCompanyName = ["华为技术服务有限公司", "华为技术有限公司", "华为软件技术有限公司", "华为数字技术（成都）有限公司的数据"]
@@ -1173,11 +1465,51 @@ advanceResultCol = ["公司代码", "用户名称", "科目", "客户代码", "
 advanceDelTextList = ["样机资产转售到款", "暂挂不核", "负销售"]
 advanceDelStr = "|".join(advanceDelTextList)
 receivableTableCol = ["业务范围代码", "公司代码", "财务凭证号FI", "说明文本", "记帐日期", "输入日期", "客户代码", "客户名称", "利润中心本位币金额", "销售员", "销售员代码"]
+debtCostRuleList = [
+    (["未回款", "基准日期在区间内"], "账期财务费用", ("应还款日期", "收付基准日期", "账期天数", "正常贷款费率")),
+    (["未回款", "基准日期在区间内", "应还款日期早于统计时间"], "超期财务费用", ("统计时间", "应还款日期", 0, "超额贷款费率")),
+    (["未回款", "基准日期晚于区间"], "账期财务费用", ("应还款日期", "统计时间", "账期天数", "正常贷款费率")),
+    (["未回款", "基准日期早于区间", "新增索引"], "账期财务费用", ("应还款日期", "凭证记帐日期", 0, "正常贷款费率")),
+    (["未回款", "基准日期早于区间", "~新增索引", "未到应还款日期"], "备注", "去除"),
+    (["未回款", "基准日期早于区间", "~新增索引", "~未到应还款日期", "应还款日期不早于上次统计时间"], "超期财务费用",
+     ("统计时间", "应还款日期", 0, "超额贷款费率")),
+    (["未回款", "基准日期早于区间", "~新增索引", "~未到应还款日期", "~应还款日期不早于上次统计时间"], "超期财务费用",
+     ("统计时间", "上次统计时间", 0, "超额贷款费率")),
+    (["已回款", "基准日期在区间内"], "账期财务费用", ("实际回款日", "收付基准日期", "账期天数", "正常贷款费率")),
+    (["已回款", "基准日期晚于区间", "~应还款日期早于统计时间"], "账期财务费用", ("实际回款日", "应还款日期", 0, "正常贷款费率")),
+    (["已回款", "基准日期晚于区间", "应还款日期早于统计时间"], "超期财务费用", ("实际回款日", "上次统计时间", 0, "超额贷款费率")),
+    (["已回款", "基准日期早于区间", "未到应还款日期"], "账期财务费用", ("实际回款日", "应还款日期", 0, "正常贷款费率")),
+    (["已回款", "基准日期早于区间", "~未到应还款日期", "应还款日期不早于上次统计时间"], "超期财务费用",
+     ("实际回款日", "应还款日期", 0, "超额贷款费率")),
+    (["已回款", "基准日期早于区间", "~未到应还款日期", "~应还款日期不早于上次统计时间"], "超期财务费用",
+     ("实际回款日", "上次统计时间", 0, "超额贷款费率")),
+]
+baseMetaSuffix = ".索引.json"
+baseMetaVersion = 1
+baseMetaDict = None
+costValueFlag = False
+costAuditFlag = False
+appendWriteFlag = True
+costValueColDict = {"欠款明细": ["账期财务费用", "超期财务费用", "贴现利息", "总财务费用"], "银票": ["贴现利息"], "预收补费用": ["预收利息"]}
+costAuditSheetName = "计算明细"
+costAuditCol = ["sheet", "行号", "列", "计算方式", "天数", "费率", "金额", "结果"]
+costFormulaPattern = re.compile(r'^=\(?(?:_xlfn\.)?DAYS\(INDIRECT\("([A-Z]+)"&ROW\(\)\),INDIRECT\("([A-Z]+)"&ROW\(\)\)\)'
+                                r'(?:-(\d+)\))?\*INDIRECT\("([A-Z]+)"&ROW\(\)\)/365\*INDIRECT\("([A-Z]+)"&ROW\(\)\)$')
+sumFormulaPattern = re.compile(r'^=INDIRECT\("[A-Z]+"&ROW\(\)\)(?:\+INDIRECT\("[A-Z]+"&ROW\(\)\))*$')
 matchFlag = False
 logger = None
+profileStageList = ["updateHKMXFile", "getBaseTableData", "debtSheetOperate", "debtSheetCal", "bankNotesOperateAndCal",
+                    "advanceOperateAndCal", "saveDataToFile", "setStyle"]
 recordDict = {}
 
 if __name__ == "__main__":
+    # 根据基础表重新生成索引文件：python func.py rebuildMeta 基础表路径
+    if len(sys.argv) == 3 and sys.argv[1] == "rebuildMeta":
+        rebuildMeta = rebuildBaseTableMeta(sys.argv[2])
+        for key, sheetMeta in rebuildMeta["sheet"].items():
+            print(key, sheetMeta["名称"], sheetMeta["行数"], sheetMeta["统计时间"])
+        print("索引", len(rebuildMeta["索引"]))
+        sys.exit()
     g_dictGlobal = {"文件保存路径": r"D:\xc_files\账期费用",
                     "销售员大区对应表路径": r"D:\xc_files\账期费用\外挂-华为SBU销售员大区对应表-21.xlsx",
                     "银票记录表": r"D:\xc_files\账期费用\账期费用RPA模板-银票-23.xlsx",
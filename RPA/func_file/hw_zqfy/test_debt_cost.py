@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+欠款明细财务费用（caldebtCostArray、debtCostRuleList）与原逐行判断逻辑caldebtCost的结果对比：
+    python -m pytest RPA/func_file/hw_zqfy/test_debt_cost.py -q
+"""
+import importlib.util
+import os
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# hw_xdfy的测试同样导入func，按路径加载本目录的func
+spec = importlib.util.spec_from_file_location("zqfy_func", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                        "func.py"))
+func = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func)
+
+stime, etime = "2024-01-01", "2024-03-31"
+indexDict = {"凭证记帐日期": "J", "应还款日期": "K", "收付基准日期": "L", "欠款金额": "M", "实际回款日": "N", "统计时间": "S",
+             "上次统计时间": "T", "正常贷款费率": "U", "超额贷款费率": "W"}
+resultCols = ["账期财务费用", "超期财务费用", "备注"]
+
+
+# 原逐行判断逻辑（caldebtCostArray向量化前的caldebtCost）
+def legacyDebtCost(series, stime, etime, indexDict):
+    fmt = "%Y-%m-%d"
+
+    if pd.isna(series["实际回款日"]):  # 未回款
+        jugtimeDiff1 = (datetime.strptime(series["收付基准日期"][:10], fmt) - datetime.strptime(stime, fmt)).days
+        if jugtimeDiff1 > 0:
+            jugtimeDiff2 = (datetime.strptime(series["收付基准日期"][:10], fmt) - datetime.strptime(etime, fmt)).days
+            if jugtimeDiff2 <= 0:
+                if series["采购类型"] != "商业分销":
+                    series[
+                        "账期财务费用"] = '=(DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{收付基准日期}"&ROW())) - 30) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+                else:
+                    series[
+                        "账期财务费用"] = '=(DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{收付基准日期}"&ROW())) - 60) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+                jugtimeDiff3 = (
+                        datetime.strptime(series["应还款日期"][:10], fmt) - datetime.strptime(series["统计时间"][:10],
+                                                                                         fmt)).days
+                if jugtimeDiff3 < 0:
+                    series[
+                        "超期财务费用"] = '=DAYS(INDIRECT("{统计时间}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+            else:
+                if series["采购类型"] != "商业分销":
+                    series[
+                        "账期财务费用"] = '=(DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{统计时间}"&ROW())) - 30) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+                else:
+                    series[
+                        "账期财务费用"] = '=(DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{统计时间}"&ROW())) - 60) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+        else:
+            if series["索引新增标识"] == "新增":
+                series[
+                    "账期财务费用"] = '=DAYS(INDIRECT("{应还款日期}"&ROW()),INDIRECT("{凭证记帐日期}"&ROW())) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                    **indexDict)
+            else:
+                jugtimeDiff3 = (datetime.strptime(etime, fmt) - datetime.strptime(series["应还款日期"][:10], fmt)).days
+                if jugtimeDiff3 <= 0:
+                    series["备注"] = "去除"
+                else:
+                    jugtimeDiff4 = (
+                            datetime.strptime(series["应还款日期"][:10], fmt) - datetime.strptime(series["上次统计时间"][:10],
+                                                                                             fmt)).days
+                    if jugtimeDiff4 >= 0:
+                        series[
+                            "超期财务费用"] = '=DAYS(INDIRECT("{统计时间}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                            **indexDict)
+                    else:
+                        series[
+                            "超期财务费用"] = '=DAYS(INDIRECT("{统计时间}"&ROW()),INDIRECT("{上次统计时间}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                            **indexDict)
+    else:
+        jugtimeDiff1 = (datetime.strptime(series["收付基准日期"][:10], fmt) - datetime.strptime(stime, fmt)).days
+        if jugtimeDiff1 > 0:
+            jugtimeDiff2 = (datetime.strptime(series["收付基准日期"][:10], fmt) - datetime.strptime(etime, fmt)).days
+            if jugtimeDiff2 <= 0:
+                if series["采购类型"] != "商业分销":
+                    series[
+                        "账期财务费用"] = '=(DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{收付基准日期}"&ROW())) - 30) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+                else:
+                    series[
+                        "账期财务费用"] = '=(DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{收付基准日期}"&ROW())) - 60) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+            else:
+                jugtimeDiff3 = (
+                        datetime.strptime(series["应还款日期"][:10], fmt) - datetime.strptime(series["统计时间"][:10], fmt)).days
+                if jugtimeDiff3 >= 0:
+                    series[
+                        "账期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+                else:
+                    series[
+                        "超期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{上次统计时间}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+        else:
+            jugtimeDiff2 = (datetime.strptime(etime, fmt) - datetime.strptime(series["应还款日期"][:10], fmt)).days
+            if jugtimeDiff2 <= 0:
+                series[
+                    "账期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{正常贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                    **indexDict)
+            else:
+                jugtimeDiff3 = (datetime.strptime(series["上次统计时间"][:10], fmt) - datetime.strptime(series["应还款日期"][:10],
+                                                                                                  fmt)).days
+                if jugtimeDiff3 <= 0:
+                    series[
+                        "超期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{应还款日期}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+                else:
+                    series[
+                        "超期财务费用"] = '=DAYS(INDIRECT("{实际回款日}"&ROW()),INDIRECT("{上次统计时间}"&ROW())) * INDIRECT("{超额贷款费率}"&ROW()) / 365 * INDIRECT("{欠款金额}"&ROW())'.format(
+                        **indexDict)
+
+    return series[["账期财务费用", "超期财务费用", "备注"]]
+
+
+def getDebtDf(rowList):
+    cols = ["实际回款日", "收付基准日期", "应还款日期", "统计时间", "上次统计时间", "凭证记帐日期", "索引新增标识", "采购类型"]
+    df_ = pd.DataFrame(rowList, columns=cols)
+    df_[resultCols] = np.nan
+    return df_
+
+
+def assertSameCost(df_):
+    expectDf = pd.DataFrame([legacyDebtCost(row.copy(), stime, etime, indexDict) for _, row in df_.iterrows()],
+                            index=df_.index)
+    resultDf = func.caldebtCostArray(df_, stime, etime, indexDict)
+    pd.testing.assert_frame_equal(resultDf.astype(object), expectDf[resultCols].astype(object))
+    return resultDf
+
+
+# 每条规则（原逻辑的13个分支）一行数据：(规则序号, [实际回款日, 收付基准日期, 应还款日期, 统计时间, 上次统计时间, 凭证记帐日期, 索引新增标识])
+ruleCaseList = [
+    ([0], [None, "2024-02-01", "2024-05-01", "2024-03-31", "", "", ""]),
+    ([0, 1], [None, "2024-02-01 00:00:00", "2024-03-01", "2024-03-31", "", "", ""]),
+    ([2], [None, "2024-04-10", "2024-06-01", "2024-03-31", "", "", "新增"]),
+    ([3], [None, "2023-12-01", "2024-02-01", "", "", "2023-11-20", "新增"]),
+    ([4], [None, "2023-12-01", "2024-04-30", "", "", "", ""]),
+    ([5], [None, "2023-12-01", "2024-03-01", "2024-03-31", "2024-02-01", "", ""]),
+    ([6], [None, "2023-12-01", "2024-01-15", "2024-03-31", "2024-02-01", "", ""]),
+    ([7], ["2024-03-15", "2024-02-01", "2024-05-01", "", "", "", ""]),
+    ([8], ["2024-04-15", "2024-04-10", "2024-05-01", "2024-03-31", "", "", ""]),
+    ([9], ["2024-04-15", "2024-04-10", "2024-03-01", "2024-03-31", "2024-02-01", "", ""]),
+    ([10], ["2024-03-15", "2023-12-01", "2024-04-30", "", "", "", ""]),
+    ([11], ["2024-03-15", "2023-12-01", "2024-03-01", "", "2024-02-01", "", ""]),
+    ([12], ["2024-03-15", "2023-12-01", "2024-01-15", "", "2024-02-01", "", ""]),
+    # 边界：基准日期等于开始日期（早于区间）、等于结束日期（在区间内），应还款日期等于结束日期（未到应还款日期）、等于上次统计时间
+    ([4], [None, "2024-01-01", "2024-03-31", "", "", "", ""]),
+    ([0], [None, "2024-03-31", "2024-05-01", "2024-03-31", "", "", ""]),
+    ([11], ["2024-03-15", "2023-12-01", "2024-02-01", "", "2024-02-01", "", ""]),
+    ([5], [None, "2023-12-01", "2024-02-01", "2024-03-31", "2024-02-01", "", ""]),
+]
+
+
+@pytest.mark.parametrize("buyType", ["服务", "商业分销"])
+@pytest.mark.parametrize("ruleIdx, row", ruleCaseList)
+def test_ruleCase(ruleIdx, row, buyType):
+    df_ = getDebtDf([row + [buyType]])
+    resultDf = assertSameCost(df_)
+    # 该行只命中预期的规则
+    expectCols = {func.debtCostRuleList[i][1] for i in ruleIdx}
+    assert {col for col in resultCols if not pd.isna(resultDf.iloc[0][col])} == expectCols
+
+
+def test_allRulesCovered():
+    assert len(func.debtCostRuleList) == 13
+    assert {i for ruleIdx, _ in ruleCaseList for i in ruleIdx} == set(range(13))
+
+
+# 随机日期组合（多行一次计算），原结果列有值时保持原值
+@pytest.mark.parametrize("seed", range(10))
+def test_randomRows(seed):
+    rnd = random.Random(seed)
+    baseDay = datetime(2023, 11, 1)
+
+    def randomDate():
+        return (baseDay + timedelta(days=rnd.randint(0, 200))).strftime("%Y-%m-%d")
+
+    rowList = [[rnd.choice([None, randomDate()]), randomDate(), randomDate(), randomDate(), randomDate(), randomDate(),
+                rnd.choice(["新增", ""]), rnd.choice(["服务", "商业分销", "原厂下单"])] for _ in range(200)]
+    df_ = getDebtDf(rowList)
+    df_.loc[df_.index[::7], "备注"] = "原备注"
+    assertSameCost(df_)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+费用公式计算为数值（parseCostFormula、calFormulaValue、calCostValues）与公式含义的结果对比：
+    python -m pytest RPA/func_file/hw_zqfy/test_formula_value.py -q
+"""
+import importlib.util
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl.utils import get_column_letter
+
+# hw_xdfy的测试同样导入func，按路径加载本目录的func
+spec = importlib.util.spec_from_file_location("zqfy_func", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                        "func.py"))
+func = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(func)
+
+indexDict = {col: get_column_letter(i + 1) for i, col in enumerate(func.debtResultCol)}
+totalFormula = '=INDIRECT("{账期财务费用}"&ROW())+INDIRECT("{超期财务费用}"&ROW())+INDIRECT("{贴现利息}"&ROW())'.format(
+    **indexDict)
+
+
+def getFormula(formulaArgs, variant=""):
+    formula = func.getCostFormula(formulaArgs, indexDict)
+    if variant == "excel":
+        # excel保存后去除空格、DAYS前加_xlfn.
+        formula = formula.replace(" ", "").replace("DAYS(", "_xlfn.DAYS(")
+    elif variant == "space":
+        formula = formula.replace(" * ", "\n*\t").replace("),", "), ")
+    return formula
+
+
+def getDays(endDate, startDate):
+    return (datetime.strptime(endDate[:10], "%Y-%m-%d") - datetime.strptime(startDate[:10], "%Y-%m-%d")).days
+
+
+@pytest.mark.parametrize("variant", ["", "excel", "space"])
+@pytest.mark.parametrize("deductDays", [0, 30, 60])
+def test_parseCostFormula(variant, deductDays):
+    formula = getFormula(("应还款日期", "收付基准日期", deductDays, "正常贷款费率"), variant)
+    assert func.parseCostFormula(formula) == ("天数", indexDict["应还款日期"], indexDict["收付基准日期"], deductDays,
+                                              indexDict["正常贷款费率"], indexDict["欠款金额"])
+    assert func.parseCostFormula(totalFormula.replace("+", " + ")) == (
+        "求和", [indexDict["账期财务费用"], indexDict["超期财务费用"], indexDict["贴现利息"]])
+    assert func.parseCostFormula("=SUM(A1:A3)") is None
+
+
+def test_calCostValues():
+    rowList = [
+        # (应还款日期, 收付基准日期, 统计时间, 欠款金额, 账期财务费用, 超期财务费用, 贴现利息)
+        ("2024-05-01", "2024-02-01", "2024-03-31", "1000", getFormula(("应还款日期", "收付基准日期", 30, "正常贷款费率")),
+         None, None),
+        ("2024-05-01 00:00:00", "2024-02-01", "2024-03-31", 2000.5,
+         getFormula(("应还款日期", "收付基准日期", 60, "正常贷款费率"), "excel"), "", "1.5"),
+        ("2024-03-01", "2024-02-01", "2024-03-31", "300", getFormula(("应还款日期", "收付基准日期", 30, "正常贷款费率"), "space"),
+         getFormula(("统计时间", "应还款日期", 0, "超额贷款费率"), "excel"), None),
+        # 日期无效、公式无法识别时保持原样，总财务费用中有未计算的公式时也保持原样
+        ("", "2024-02-01", "2024-03-31", "100", getFormula(("应还款日期", "收付基准日期", 30, "正常贷款费率")), None, None),
+        ("2024-05-01", "2024-02-01", "2024-03-31", "100", "=SUM(A1:A3)", 12.5, None),
+    ]
+    df_ = pd.DataFrame(columns=func.debtResultCol, dtype=object)
+    for i, (dueDate, baseDate, calDate, amount, accountCost, overCost, discount) in enumerate(rowList):
+        df_.loc[i] = None
+        df_.loc[i, ["应还款日期", "收付基准日期", "统计时间", "欠款金额", "账期财务费用", "超期财务费用", "贴现利息"]] = [
+            dueDate, baseDate, calDate, amount, accountCost, overCost, discount]
+    df_["正常贷款费率"], df_["超额贷款费率"] = 0.055, "0.09"
+    df_["总财务费用"] = totalFormula
+
+    auditList = []
+    df_result, calPosDict = func.calCostValues(df_, "欠款明细", "欠款明细", 10, auditList)
+
+    account0 = (getDays("2024-05-01", "2024-02-01") - 30) * 0.055 / 365 * 1000
+    account1 = (getDays("2024-05-01", "2024-02-01") - 60) * 0.055 / 365 * 2000.5
+    account2 = (getDays("2024-03-01", "2024-02-01") - 30) * 0.055 / 365 * 300
+    over2 = getDays("2024-03-31", "2024-03-01") * 0.09 / 365 * 300
+    assert df_result["账期财务费用"].tolist()[:3] == pytest.approx([account0, account1, account2])
+    assert df_result["账期财务费用"].tolist()[3:] == df_["账期财务费用"].tolist()[3:]
+    assert df_result.loc[2, "超期财务费用"] == pytest.approx(over2)
+    assert df_result["总财务费用"].tolist()[:3] == pytest.approx([account0, account1 + 1.5, account2 + over2])
+    assert df_result["总财务费用"].tolist()[3:] == [totalFormula, totalFormula]
+    assert calPosDict["账期财务费用"].tolist() == [0, 1, 2] and calPosDict["总财务费用"].tolist() == [0, 1, 2]
+    assert calPosDict["贴现利息"].tolist() == []
+
+    # 计算明细：每个计算为数值的单元格一行，行号为sheet中的行号
+    df_audit = pd.concat(auditList, ignore_index=True)
+    assert len(df_audit) == 7
+    df_account = df_audit.loc[df_audit["列"] == "账期财务费用"].sort_values("行号")
+    assert df_account["行号"].tolist() == [10, 11, 12]
+    assert df_account["天数"].tolist() == [90, 90, 29]
+    assert df_account["结果"].tolist() == pytest.approx([account0, account1, account2])
+    assert set(df_account["计算方式"]) == {"(DAYS(应还款日期, 收付基准日期) - 30) * 正常贷款费率 / 365 * 欠款金额",
+                                       "(DAYS(应还款日期, 收付基准日期) - 60) * 正常贷款费率 / 365 * 欠款金额"}
+    df_total = df_audit.loc[df_audit["列"] == "总财务费用"].sort_values("行号")
+    assert df_total["计算方式"].unique().tolist() == ["账期财务费用 + 超期财务费用 + 贴现利息"]
+    assert np.allclose(df_total["结果"].astype(float), [account0, account1 + 1.5, account2 + over2])
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+各流程共用的数值处理方法：
+    new_round：四舍五入（按数值的十进制表示进位，0.5远离0进位），支持单个数值、numpy数组、pandas Series
+    calTrunc：模拟excel的TRUNC函数（按数值的十进制表示直接截取），支持单个数值、numpy数组、pandas Series
+
+命令行用法（对比逐个数值处理与数组处理的耗时）：
+    python num_util.py 100000 1000000
+"""
+import sys
+import time
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP, InvalidOperation
+
+import numpy as np
+import pandas as pd
+
+
+# 单个数值按十进制表示取整
+def decimalQuantize(_float, _len, rounding):
+    """
+    :param _float: 需要处理的数（float）
+    :param _len: 保留小数点位数
+    :param rounding: 取整方式（ROUND_HALF_UP、ROUND_DOWN）
+    :return: 处理结果
+    """
+    value = repr(_float)
+    # 小数位数不超过_len时无需处理（与原方法一致：科学计数法表示且无小数点的数，如1e-05，也保持不变）
+    if value[::-1].find('.') <= _len:
+        return _float
+    try:
+        return float(Decimal(value).quantize(Decimal(1).scaleb(-_len), rounding=rounding))
+    except InvalidOperation:
+        # nan、inf等
+        return _float
+
+
+# 数组按十进制表示取整（仅处于进位/截取边界附近的数逐个按十进制处理）
+def quantizeArray(values, _len, rounding):
+    """
+    :param values: numpy数组
+    :param _len: 保留小数点位数
+    :param rounding: 取整方式（ROUND_HALF_UP、ROUND_DOWN）
+    :return: 处理结果数组
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iub":
+        # 整数无需处理
+        return values.copy()
+    values = values.astype(float)
+    scale = 10.0 ** _len
+    scaled = values * scale
+    absValue = np.abs(values)
+    with np.errstate(invalid="ignore"):
+        if rounding == ROUND_HALF_UP:
+            result = np.rint(scaled) / scale
+            # 恰好为进位边界的数（如2.675），远离0进位
+            tieScale = scale * 10
+            tieNum = np.rint(absValue * tieScale)
+            tieMask = (tieNum / tieScale == absValue) & (tieNum % 10 == 5)
+            result[tieMask] = np.sign(values[tieMask]) * ((tieNum[tieMask] // 10) + 1) / scale
+            # 接近进位边界的数
+            edgeMask = (np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) <= 8 * np.spacing(np.abs(scaled)) + 1e-9) & ~tieMask
+        else:
+            # 本身不超过_len位小数的数保持不变，其余直接截取
+            roundNum = np.rint(scaled)
+            exactMask = roundNum / scale == values
+            result = np.where(exactMask, values, np.trunc(scaled) / scale)
+            # 接近截取边界的数
+            edgeMask = (np.abs(scaled - roundNum) <= 8 * np.spacing(np.abs(scaled)) + 1e-9) & ~exactMask
+    # 边界附近、非有限值、科学计数法表示的数逐个按十进制处理
+    slowMask = ~np.isfinite(values) | edgeMask | ((absValue < 1e-4) & (absValue != 0)) | (absValue >= 1e15)
+    if slowMask.any():
+        result[slowMask] = [decimalQuantize(float(i), _len, rounding) for i in values[slowMask]]
+    return result
+
+
+# 按数据类型分别处理单个数值、numpy数组、pandas Series
+def quantize(value, _len, rounding):
+    if isinstance(value, pd.Series):
+        return pd.Series(quantizeArray(value.values, _len, rounding), index=value.index, name=value.name)
+    if isinstance(value, np.ndarray):
+        return quantizeArray(value, _len, rounding)
+    if isinstance(value, float):
+        return decimalQuantize(value, _len, rounding)
+    if rounding == ROUND_HALF_UP:
+        return round(value, _len)
+    return value
+
+
+# 四舍五入
+def new_round(_float, _len=2):
+    """
+    :param _float: 需要四舍五入的数（数值、numpy数组或pandas Series）
+    :param _len: 保留小数点位数
+    :return: 四舍五入结果
+    """
+    return quantize(_float, _len, ROUND_HALF_UP)
+
+
+# 对数值类型的数据模拟计算excel的trunc函数，保留两位小数（trunc：直接截取，不进行四舍五入）
+def calTrunc(x, len_=2):
+    """
+    :param x: 传入的金额（数值、numpy数组或pandas Series）
+    :param len_: 需要保留的小数点位数
+    :return:
+    """
+    return quantize(x, len_, ROUND_DOWN)
+
+
+
+# 对比逐个数值处理与数组处理的耗时（数据为含税金额、3位小数等，包括进位边界附近的数）
+def benchQuantize(num, sampleNum=100000, seed=0):
+    """
+    :param num: 数值的数量
+    :param sampleNum: 逐个处理时实际执行的数量（耗时按数量折算，避免数量较多时运行过久）
+    :param seed: 随机种子
+    :return: 耗时列表[{"方法", "数量", "逐个处理(秒)", "数组处理(秒)", "倍数"}]
+    """
+    rnd = np.random.default_rng(seed)
+    values = np.concatenate([np.round(rnd.uniform(-1e4, 1e4, num // 2), 3),
+                             np.round(rnd.uniform(-1e4, 1e4, num - num // 2), 2) * 1.13])
+    sampleValues = values[rnd.permutation(num)[:min(sampleNum, num)]]
+    resultList = []
+    for func in [new_round, calTrunc]:
+        startTime = time.perf_counter()
+        scalarList = [func(float(i)) for i in sampleValues]
+        scalarSeconds = (time.perf_counter() - startTime) * num / len(sampleValues)
+
+        startTime = time.perf_counter()
+        func(values)
+        arraySeconds = time.perf_counter() - startTime
+
+        # 结果校验
+        assert (func(sampleValues) == np.array(scalarList)).all()
+        resultList.append({"方法": func.__name__, "数量": num, "逐个处理(秒)": round(scalarSeconds, 3),
+                           "数组处理(秒)": round(arraySeconds, 3), "倍数": round(scalarSeconds / arraySeconds, 1)})
+    return resultList
+
+
+if __name__ == "__main__":
+    for num in sys.argv[1:] or [100000, 1000000]:
+        for result in benchQuantize(int(num)):
+            print(result)
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+按键列分区的索引（建立时按键稳定排序一次，之后每个键的数据为连续的行区间，取数据为切片，不需要每次筛选整个df）：
+    buildPartIndex：按键列建立分区索引
+    getPart：获取某个键的子df（与df.loc[df[键列] == 键]的结果相同，包括行顺序和索引）
+    getPartPositions：获取某个键在原df中的行位置
+    getPartKeys：获取所有键（按在原df中首次出现的顺序）
+
+命令行用法（对比逐个键筛选与分区索引的耗时）：
+    python partition_util.py 10000 100000
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# 按键列建立分区索引
+def buildPartIndex(df, keyCol):
+    """
+    :param df: 需要分区的df
+    :param keyCol: 键列名（空值不参与分区，同==筛选）
+    :return: 分区索引字典{"df": 按键排序后的df, "区间": {键: (开始行, 结束行)}, "位置": 排序后每行在原df中的行位置, "原df": df}
+    """
+    codes, uniques = pd.factorize(df[keyCol])
+    # 稳定排序：同一个键的行保持原顺序
+    order = np.argsort(codes, kind="stable")
+    sortedCodes = codes[order]
+    startList = np.flatnonzero(np.r_[True, sortedCodes[1:] != sortedCodes[:-1]]) if len(codes) else np.array([], int)
+    endList = np.r_[startList[1:], len(codes)].astype(int)
+    rangeDict = {uniques[code]: (start, end) for code, start, end in zip(sortedCodes[startList], startList, endList)
+                 if code != -1}
+    return {"df": df.iloc[order], "区间": rangeDict, "位置": order, "原df": df}
+
+
+# 获取某个键的子df（切片，需要修改时先copy），键不存在时为空df
+def getPart(partIndex, key):
+    start, end = partIndex["区间"].get(key, (0, 0))
+    return partIndex["df"].iloc[start:end]
+
+
+# 获取某个键在原df中的行位置数组，键不存在时为空数组
+def getPartPositions(partIndex, key):
+    start, end = partIndex["区间"].get(key, (0, 0))
+    return partIndex["位置"][start:end]
+
+
+# 获取所有键（按在原df中首次出现的顺序）
+def getPartKeys(partIndex):
+    return list(partIndex["区间"].keys())
+
+
+# 对比逐个键筛选（df.loc[df[键列] == 键]）与分区索引获取全部键的数据的耗时
+def benchPartIndex(keyNum, rowsPerKey=3, sampleNum=1000, seed=0):
+    """
+    :param keyNum: 键的数量
+    :param rowsPerKey: 每个键的平均行数
+    :param sampleNum: 逐个键筛选时实际执行的键数量（耗时按键数量折算，避免键较多时运行过久）
+    :param seed: 随机种子
+    :return: 耗时字典{"键数量", "行数", "逐个筛选(秒)", "分区索引(秒)", "倍数"}
+    """
+    rnd = np.random.default_rng(seed)
+    keyList = np.array([f"1Y{i:012d}F" for i in range(keyNum)], dtype=object)
+    df = pd.DataFrame({"下单合同号": keyList[rnd.integers(0, keyNum, keyNum * rowsPerKey)],
+                       "付款金额": rnd.random(keyNum * rowsPerKey), "付款日期": "2024-01-01 00:00:00"})
+    sampleKeys = keyList[:min(sampleNum, keyNum)]
+
+    startTime = time.perf_counter()
+    for key in sampleKeys:
+        df.loc[df["下单合同号"] == key]
+    maskSeconds = (time.perf_counter() - startTime) * keyNum / len(sampleKeys)
+
+    startTime = time.perf_counter()
+    partIndex = buildPartIndex(df, "下单合同号")
+    for key in keyList:
+        getPart(partIndex, key)
+    partSeconds = time.perf_counter() - startTime
+
+    # 结果校验
+    for key in sampleKeys[:50]:
+        assert getPart(partIndex, key).equals(df.loc[df["下单合同号"] == key])
+    return {"键数量": keyNum, "行数": len(df), "逐个筛选(秒)": round(maskSeconds, 2), "分区索引(秒)": round(partSeconds, 2),
+            "倍数": round(maskSeconds / partSeconds, 1)}
+
+
+if __name__ == "__main__":
+    for num in sys.argv[1:] or [10000, 100000]:
+        print(benchPartIndex(int(num)))
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+按报表类型、账号、下载日期分区的本地报表库（列式存储，每个分区的每一列单独保存，查询时只读取需要的列）：
+    appendReport：写入一次下载的报表数据（一个分区），可替换覆盖范围内的原有分区
+    getLastCoverDate：获取某报表类型、账号已覆盖的最新日期
+    queryReport：按账号、日期范围、列值筛选，只读取指定的列
+    exportReport：导出为xlsx（兼容原汇总表的使用方式）
+
+目录结构：
+    库目录/报表类型/清单.json：分区列表[{"账号", "下载日期", "起始日期", "截止日期", "目录", "行数", "列"}]
+    库目录/报表类型/账号/下载日期_序号/列序号.pkl：该分区某一列的数据（Series）
+"""
+import json
+import os
+import shutil
+from datetime import datetime
+
+import pandas as pd
+
+
+# 获取某报表类型的清单路径
+def getManifestPath(storeDir, reportType):
+    return os.path.join(storeDir, reportType, "清单.json")
+
+
+# 读取某报表类型的分区列表
+def readManifest(storeDir, reportType):
+    """
+    :param storeDir: 库目录
+    :param reportType: 报表类型，如订单全字段报表
+    :return: 分区列表[{"账号", "下载日期", "起始日期", "截止日期", "目录", "行数", "列"}]
+    """
+    manifestPath = getManifestPath(storeDir, reportType)
+    if not os.path.exists(manifestPath):
+        return []
+    with open(manifestPath, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# 写入某报表类型的分区列表（先写临时文件再替换）
+def writeManifest(storeDir, reportType, partList):
+    manifestPath = getManifestPath(storeDir, reportType)
+    tempPath = f"{manifestPath}.{os.getpid()}.tmp"
+    with open(tempPath, "w", encoding="utf-8") as f:
+        json.dump(partList, f, ensure_ascii=False, indent=2)
+    os.replace(tempPath, manifestPath)
+
+
+# 判断分区的覆盖范围是否与[startDate, endDate]重叠（覆盖范围相同的空范围也视为重叠）
+def isCoverOverlap(part, startDate, endDate):
+    if (part["起始日期"], part["截止日期"]) == (startDate, endDate):
+        return True
+    return part["起始日期"] < endDate and startDate < part["截止日期"]
+
+
+# 写入一次下载的报表数据
+def appendReport(storeDir, reportType, account, downloadDate, df, startDate="", endDate="", replaceCover=False):
+    """
+    :param storeDir: 库目录
+    :param reportType: 报表类型，如订单全字段报表、物料移动明细汇总、预提表
+    :param account: 账号（不区分账号的报表传""）
+    :param downloadDate: 下载日期，%Y%m%d
+    :param df: 下载的报表数据
+    :param startDate: 数据覆盖的起始日期（%Y%m%d），为空时同下载日期
+    :param endDate: 数据覆盖的截止日期（%Y%m%d），为空时同下载日期
+    :param replaceCover: 是否删除该账号覆盖范围与[startDate, endDate]重叠的原有分区（如预提表重新下载当年数据、同一天重复写入）；
+                         报表按截止日期当天01:00截止，相邻分区共用边界日期不算重叠
+    :return: 分区信息字典
+    """
+    startDate, endDate = startDate or downloadDate, endDate or downloadDate
+    partList = readManifest(storeDir, reportType)
+    dropList = [p for p in partList if replaceCover and p["账号"] == account and isCoverOverlap(p, startDate, endDate)]
+
+    # 分区目录：账号/下载日期_序号（同一下载日期可写入多次）
+    accountDir = os.path.join(storeDir, reportType, account or "全部")
+    seq = len([p for p in partList if p["账号"] == account and p["下载日期"] == downloadDate])
+    partDir = os.path.join(accountDir, f"{downloadDate}_{seq}")
+    while os.path.exists(partDir):
+        seq += 1
+        partDir = os.path.join(accountDir, f"{downloadDate}_{seq}")
+    # 先写入临时目录再重命名，避免中断时留下不完整的分区
+    tempDir = f"{partDir}.{os.getpid()}.tmp"
+    os.makedirs(tempDir)
+    df = df.reset_index(drop=True)
+    for i, col in enumerate(df.columns):
+        df[col].to_pickle(os.path.join(tempDir, f"{i}.pkl"))
+    os.replace(tempDir, partDir)
+
+    part = {"账号": account, "下载日期": downloadDate, "起始日期": startDate, "截止日期": endDate,
+            "目录": os.path.relpath(partDir, os.path.join(storeDir, reportType)), "行数": len(df),
+            "列": [str(i) for i in df.columns], "写入时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    writeManifest(storeDir, reportType, [p for p in partList if p not in dropList] + [part])
+    for p in dropList:
+        shutil.rmtree(os.path.join(storeDir, reportType, p["目录"]), ignore_errors=True)
+    return part
+
+
+# 获取某报表类型、账号已覆盖的最新日期（%Y%m%d），无数据时为""；beforeDate不为空时只统计截止日期早于beforeDate的分区
+def getLastCoverDate(storeDir, reportType, account="", beforeDate=""):
+    dateList = [p["截止日期"] for p in readManifest(storeDir, reportType)
+                if p["账号"] == account and (not beforeDate or p["截止日期"] < beforeDate)]
+    return max(dateList) if dateList else ""
+
+
+# 读取单个分区的指定列
+def readPartition(storeDir, reportType, part, columns=None):
+    """
+    :param storeDir: 库目录
+    :param reportType: 报表类型
+    :param part: 分区信息字典
+    :param columns: 需要读取的列名列表，为None时读取全部列（分区中不存在的列为空值）
+    :return: 分区数据df
+    """
+    partDir = os.path.join(storeDir, reportType, part["目录"])
+    columns = part["列"] if columns is None else columns
+    dataDict = {}
+    for col in columns:
+        if col in part["列"]:
+            dataDict[col] = pd.read_pickle(os.path.join(partDir, f"{part['列'].index(col)}.pkl"))
+        else:
+            dataDict[col] = pd.Series([None] * part["行数"], dtype=object)
+    return pd.DataFrame(dataDict, columns=columns)
+
+
+# 查询报表数据
+def queryReport(storeDir, reportType, account=None, columns=None, startDate="", endDate="", where=None):
+    """
+    :param storeDir: 库目录
+    :param reportType: 报表类型
+    :param account: 账号，为None时查询全部账号
+    :param columns: 返回的列名列表，为None时返回全部列
+    :param startDate: 只查询覆盖截止日期>=该日期的分区（%Y%m%d），为空时不限制
+    :param endDate: 只查询覆盖起始日期<=该日期的分区（%Y%m%d），为空时不限制
+    :param where: 列值筛选{列名: 值或值列表}
+    :return: 查询结果df（按分区写入顺序）
+    """
+    where = where or {}
+    partList = [p for p in readManifest(storeDir, reportType) if (account is None or p["账号"] == account) and (
+            not startDate or p["截止日期"] >= startDate) and (not endDate or p["起始日期"] <= endDate)]
+    dfList = []
+    for part in partList:
+        if columns is None:
+            readCols = part["列"]
+        else:
+            readCols = list(columns) + [col for col in where if col not in columns]
+        df_ = readPartition(storeDir, reportType, part, readCols)
+        for col, value in where.items():
+            df_ = df_.loc[df_[col].isin(value if isinstance(value, (list, set, tuple)) else [value])]
+        dfList.append(df_ if columns is None else df_[list(columns)])
+    if not dfList:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(dfList, ignore_index=True)
+
+
+# 导出报表数据为xlsx
+def exportReport(storeDir, reportType, xlsxPath, account=None, columns=None, startDate="", endDate="", where=None):
+    """
+    :param storeDir: 库目录
+    :param reportType: 报表类型
+    :param xlsxPath: 导出的xlsx路径
+    :return: 导出的xlsx路径（其余参数同queryReport）
+    """
+    df_ = queryReport(storeDir, reportType, account, columns, startDate, endDate, where)
+    tempPath = xlsxPath.replace(".xlsx", f".{os.getpid()}.tmp.xlsx")
+    df_.to_excel(tempPath, index=False)
+    os.replace(tempPath, xlsxPath)
+    return xlsxPath
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+流程各阶段（方法）的耗时、内存、数据量统计（uibot中直接调用方法时同样生效）：
+    enableStageProfile：将流程模块中的阶段方法替换为统计方法，未开启时不做任何处理（无额外开销）
+    finishStageProfile：恢复原方法，并将本次运行的统计结果写入json文件
+"""
+import cProfile
+import json
+import os
+import time
+from datetime import datetime
+from functools import wraps
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 已开启统计的模块{id(模块globals): {"原方法": {方法名: 方法}, "记录": [], "统计目录": 路径, "性能分析阶段": 方法名, "开始时间": 时间}}
+profileStateDict = {}
+
+
+# 获取进程的内存峰值（MB），无法获取时为None
+def getPeakRss():
+    memInfo = psutil.Process().memory_info() if psutil is not None else None
+    # windows下为peak_wset
+    if memInfo is not None and hasattr(memInfo, "peak_wset"):
+        return memInfo.peak_wset / 1024 / 1024
+    # linux下ru_maxrss单位为KB
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    # 无法获取峰值时取当前值
+    return memInfo.rss / 1024 / 1024 if memInfo is not None else None
+
+
+# 统计参数或返回值中的数据量（df的行数，列表、字典、元组中的df逐个统计）
+def countRows(value, depth=0):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    if depth > 0:
+        return 0
+    if isinstance(value, dict):
+        value = value.values()
+    if isinstance(value, (list, tuple)) or type(value).__name__ == "dict_values":
+        return sum([countRows(i, depth + 1) for i in value])
+    return 0
+
+
+# 生成阶段方法的统计方法
+def wrapStage(state, stageName, func):
+    @wraps(func)
+    def stageFunc(*args, **kwargs):
+        record = {"阶段": stageName, "开始时间": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                  "输入行数": countRows(list(args) + list(kwargs.values()))}
+        peakStart = getPeakRss()
+        wallStart, cpuStart = time.perf_counter(), time.process_time()
+        profiler = cProfile.Profile() if stageName == state["性能分析阶段"] else None
+        try:
+            if profiler:
+                result = profiler.runcall(func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+            record["输出行数"] = countRows(result)
+            record["状态"] = "成功"
+            return result
+        except Exception as e:
+            record["状态"] = f"失败：{e}"
+            raise
+        finally:
+            record["耗时(秒)"] = round(time.perf_counter() - wallStart, 3)
+            record["CPU时间(秒)"] = round(time.process_time() - cpuStart, 3)
+            peakEnd = getPeakRss()
+            record["内存峰值增量(MB)"] = round(peakEnd - peakStart, 1) if peakStart is not None else None
+            if profiler:
+                profilePath = os.path.join(state["统计目录"], f"{stageName}_{state['开始时间']}.prof")
+                profiler.dump_stats(profilePath)
+                record["性能分析文件"] = profilePath
+            state["记录"].append(record)
+
+    stageFunc.originFunc = func
+    return stageFunc
+
+
+# 开启统计：将模块中的阶段方法替换为统计方法
+def enableStageProfile(moduleGlobals, stageList, reportDir, profileStage=""):
+    """
+    :param moduleGlobals: 流程模块的globals()
+    :param stageList: 需要统计的方法名列表
+    :param reportDir: 统计结果保存目录
+    :param profileStage: 需要生成cProfile性能分析文件的方法名，为空时不生成
+    :return:
+    """
+    if id(moduleGlobals) in profileStateDict:
+        finishStageProfile(moduleGlobals)
+    if not os.path.exists(reportDir):
+        os.makedirs(reportDir)
+    state = {"原方法": {}, "记录": [], "统计目录": reportDir, "性能分析阶段": profileStage,
+             "开始时间": datetime.now().strftime("%Y%m%d%H%M%S")}
+    for stageName in stageList:
+        state["原方法"][stageName] = moduleGlobals[stageName]
+        moduleGlobals[stageName] = wrapStage(state, stageName, moduleGlobals[stageName])
+    profileStateDict[id(moduleGlobals)] = state
+
+
+# 结束统计：恢复原方法，将统计结果写入json文件
+def finishStageProfile(moduleGlobals):
+    """
+    :param moduleGlobals: 流程模块的globals()
+    :return: 统计结果json文件路径，未开启统计时为""
+    """
+    state = profileStateDict.pop(id(moduleGlobals), None)
+    if state is None:
+        return ""
+    moduleGlobals.update(state["原方法"])
+    reportPath = os.path.join(state["统计目录"], f"阶段统计_{state['开始时间']}.json")
+    with open(reportPath, "w", encoding="utf-8") as f:
+        json.dump({"开始时间": state["开始时间"], "阶段": state["记录"]}, f, ensure_ascii=False, indent=2)
+    return reportPath
@@ -5,12 +5,17 @@
 import os
 import re
 import shutil
+import sys
 from datetime import datetime, timedelta
 
 import pandas as pd
 import xlwings as xw
 from openpyxl.utils import get_column_letter
 
+# 共用的数值处理方法（RPA/func_file/num_util.py）
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from num_util import new_round  # noqa: E402
+
 
 # 根据输入的文件根目录返回当日文件保存目录
 def getSaveDir(rootDir):
@@ -131,7 +136,7 @@ def getNoticeFileContent(noticeFile, templatePath, saveDir, relationPath):
     else:
         rate = rateDf.iloc[0]["税率"]
     df_relation = pd.read_excel(relationPath, dtype=str, header=1)
-    df_relation["税率"] = pd.to_numeric(df_relation["税率"]).apply(lambda x: str(int(new_round(x) * 100)) + "%")
+    df_relation["税率"] = (new_round(pd.to_numeric(df_relation["税率"])) * 100).astype(int).astype(str) + "%"
     df_relation["服务名称"] = df_relation["服务名称"].apply(lambda x: x.strip())
     # print(rate)
 
@@ -299,41 +304,6 @@ def getNoticeFileContent(noticeFile, templatePath, saveDir, relationPath):
     return finalPath
 
 
-# 四舍五入
-def new_round(_float, _len=2):
-    """
-    :param _float: 需要四舍五入的数
-    :param _len: 保留小数点位数
-    :return: 四舍五入结果
-    """
-    if isinstance(_float, float):
-        if str(_float)[::-1].find('.') <= _len:
-            return _float
-        if str(_float)[-1] == '5':
-            return round(float(str(_float)[:-1] + '6'), _len)
-        else:
-            return round(_float, _len)
-    else:
-        return round(_float, _len)
-
-
-# 对数值类型的数据模拟计算excel的trunc函数，保留两位小数（trunc：直接截取，不进行四舍五入）
-def calTrunc(x, len_=2):
-    """
-    :param x: 传入的金额
-    :param len_: 需要保留的小数点位数
-    :return:
-    """
-    value = str(x)
-    idx = value.find(".")
-    if idx == -1:
-        idx = len(value) + 1
-    else:
-        idx = idx + len_ + 1
-    value = float(value[:idx])
-    return value
-
-
 """
 unNamedService: 商务通知单中【设备/服务】列 = 服务，但【服务开票名称参考】列为空时默认的"服务开票名称参考"
 cols:结果表需要的列
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+num_util的new_round、calTrunc与各流程原逐个处理的方法的结果对比（速度对比见num_util.py的命令行用法）：
+    python -m pytest RPA/func_file/test_num_util.py -q
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from num_util import benchQuantize, calTrunc, new_round
+
+
+# 原new_round（各流程func.py中的实现）
+def oldRound(_float, _len=2):
+    if isinstance(_float, float):
+        if str(_float)[::-1].find('.') <= _len:
+            return _float
+        if str(_float)[-1] == '5':
+            return round(float(str(_float)[:-1] + '6'), _len)
+        else:
+            return round(_float, _len)
+    else:
+        return round(_float, _len)
+
+
+# 原calTrunc（swtzd/func.py中的实现）
+def oldTrunc(x, len_=2):
+    value = str(x)
+    idx = value.find(".")
+    if idx == -1:
+        idx = len(value) + 1
+    else:
+        idx = idx + len_ + 1
+    value = float(value[:idx])
+    return value
+
+
+# 原calTrunc无法处理带小数点的科学计数法表示的数：截取的是尾数（如9.99e-05截取为"9.99"，2.5e-05截取为"2.5e"报错），记为nan
+def safeCall(func, x):
+    if func is oldTrunc and "e" in repr(x) and "." in repr(x):
+        return np.nan
+    try:
+        return func(x)
+    except ValueError:
+        return np.nan
+
+
+def isSame(a, b):
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def getTestArr():
+    state = np.random.RandomState(0)
+    return np.concatenate([
+        np.round(state.uniform(-1e4, 1e4, 20000), 3),  # 3位小数（含大量进位边界）
+        np.round(state.uniform(-1e4, 1e4, 20000), 2) * 1.13,  # 含税金额
+        state.uniform(-1e6, 1e6, 20000),
+        np.arange(-10000, 10000) / 1000.0,
+        state.uniform(-1e-4, 1e-4, 2000),  # 科学计数法表示的小数
+        [0.0, -0.0, 2.675, 1.005, -1.005, 0.285, 1e15, 1e16, 1.5e16, np.nan, np.inf, -np.inf]])
+
+
+expArr = np.array([1e-05, -1e-05, 5e-05, 2.5e-05, -2.5e-05, 1.5e-05, 9.99e-05, 1e-07, 5.551115123125783e-17, 1e-300,
+                   1e16, -1e16, 1.5e16, 1e20, 1.234e21])
+
+
+@pytest.mark.parametrize("newFunc, oldFunc", [(new_round, oldRound), (calTrunc, oldTrunc)])
+def test_sameAsOld(newFunc, oldFunc):
+    testArr = getTestArr()
+    oldArr = np.array([safeCall(oldFunc, float(i)) for i in testArr])
+    scalarArr = np.array([newFunc(float(i)) for i in testArr])
+    validMask = ~np.isnan(oldArr) | np.isnan(testArr)
+    assert isSame(oldArr, scalarArr)[validMask].all()
+    # 数组、Series的结果需与单个数值处理的结果完全一致
+    assert isSame(scalarArr, newFunc(testArr)).all()
+    assert isSame(scalarArr, newFunc(pd.Series(testArr)).values).all()
+
+
+@pytest.mark.parametrize("newFunc, oldFunc", [(new_round, oldRound), (calTrunc, oldTrunc)])
+@pytest.mark.parametrize("value", expArr.tolist())
+def test_exponentNotation(newFunc, oldFunc, value):
+    oldValue = safeCall(oldFunc, value)
+    newValue = newFunc(value)
+    if not np.isnan(oldValue):
+        assert newValue == oldValue and np.signbit(newValue) == np.signbit(oldValue)
+    assert isSame(newFunc(np.array([value])), np.array([newValue])).all()
+
+
+def test_integerInput():
+    assert new_round(3) == 3 and calTrunc(3) == 3
+    assert (new_round(np.array([1, 2])) == np.array([1, 2])).all()
+
+
+# 耗时对比见num_util.py的benchQuantize（命令行运行），测试中只校验其结果
+def test_benchQuantize():
+    resultList = benchQuantize(2001, sampleNum=500)
+    assert [result["方法"] for result in resultList] == ["new_round", "calTrunc"]
+    assert all(result["数量"] == 2001 for result in resultList)
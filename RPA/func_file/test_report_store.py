@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+report_store替换覆盖范围重叠的分区的测试：
+    python -m pytest RPA/func_file/test_report_store.py -q
+"""
+import pandas as pd
+
+import report_store
+
+reportType = "订单全字段报表"
+
+
+def getRowList(storeDir):
+    return report_store.queryReport(storeDir, reportType, "u1")["a"].tolist()
+
+
+# 同一天重复写入同一下载范围时替换原分区，相邻分区共用的边界日期不算重叠
+def test_replaceOverlapCover(tmp_path):
+    storeDir = str(tmp_path)
+    report_store.appendReport(storeDir, reportType, "u1", "20240101", pd.DataFrame({"a": ["h1"]}), "00000000", "20240101")
+    for rowList in (["n1", "n2"], ["n1", "n2", "n3"]):
+        report_store.appendReport(storeDir, reportType, "u1", "20240105", pd.DataFrame({"a": rowList}), "20240101",
+                                  "20240105", replaceCover=True)
+    assert getRowList(storeDir) == ["h1", "n1", "n2", "n3"]
+    assert report_store.getLastCoverDate(storeDir, reportType, "u1") == "20240105"
+    assert report_store.getLastCoverDate(storeDir, reportType, "u1", beforeDate="20240105") == "20240101"
+
+
+# 覆盖范围部分重叠的分区也需替换（如预提表重新下载当年数据）
+def test_replacePartialOverlap(tmp_path):
+    storeDir = str(tmp_path)
+    report_store.appendReport(storeDir, reportType, "u1", "20240103", pd.DataFrame({"a": ["x"]}), "20240101", "20240103")
+    report_store.appendReport(storeDir, reportType, "u2", "20240103", pd.DataFrame({"a": ["y"]}), "20240101", "20240103")
+    report_store.appendReport(storeDir, reportType, "u1", "20240105", pd.DataFrame({"a": ["z"]}), "20240102", "20240105",
+                              replaceCover=True)
+    assert getRowList(storeDir) == ["z"]
+    assert len(report_store.readManifest(storeDir, reportType)) == 2
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+xlsx_util直接修改sheet xml的方法的测试：
+    python -m pytest RPA/func_file/test_xlsx_util.py -q
+"""
+import re
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+from openpyxl.styles import Font
+from openpyxl.workbook.defined_name import DefinedName
+
+import xlsx_util
+
+
+def readValues(path, sheetName):
+    wb = openpyxl.load_workbook(path)
+    return [[cell.value for cell in row] for row in wb[sheetName].iter_rows()]
+
+
+def readSheetXml(path, sheetName):
+    with zipfile.ZipFile(path) as zin:
+        return zin.read(xlsx_util.getSheetXmlPath(zin, sheetName)).decode("utf-8")
+
+
+# 替换xlsx中某个文件的内容（模拟Excel保存的xml格式）
+def replaceZipText(path, fileName, oldText, newText):
+    with zipfile.ZipFile(path) as zin:
+        contentDict = {info.filename: zin.read(info) for info in zin.infolist()}
+    assert oldText in contentDict[fileName].decode("utf-8")
+    contentDict[fileName] = contentDict[fileName].decode("utf-8").replace(oldText, newText).encode("utf-8")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zout:
+        for fileName, content in contentDict.items():
+            zout.writestr(fileName, content)
+
+
+# 生成基础表：“数据”sheet有表头和2行带格式的数据，第4行只有E列；“其他”sheet不追加
+@pytest.fixture
+def basePath(tmp_path):
+    path = str(tmp_path / "基础表.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "数据"
+    ws.append(["编号", "名称", "金额", "日期"])
+    ws.append([1, "a", 10.5, datetime(2024, 1, 1)])
+    ws.append([2, "b", 20, datetime(2024, 1, 2)])
+    ws["E4"] = "保留"
+    for row in ws.iter_rows(min_row=2, max_row=3):
+        for cell in row:
+            cell.font = Font(bold=True)
+    wb.create_sheet("其他")["A1"] = "不变"
+    wb.defined_names["区域"] = DefinedName("区域", attr_text="数据!$A$1:$D$3")
+    wb.defined_names["引号区域"] = DefinedName("引号区域", attr_text="'数据'!$A$2")
+    wb.save(path)
+    return path
+
+
+# 在原有行之后追加（与原有行号重复时合并到原有行），公式、日期、空值、布尔值的写入
+def test_appendAfterRows(basePath, tmp_path):
+    dstPath = str(tmp_path / "结果.xlsx")
+    df_add = pd.DataFrame([[3, "c", np.nan, datetime(2024, 1, 3)], [4, "d <&>", 40.25, None], [5, " 空格 ", True, "=C2*2"]],
+                          columns=["编号", "名称", "金额", "日期"])
+    xlsx_util.appendSheetRows(basePath, dstPath, {"数据": (4, df_add)})
+
+    valueList = readValues(dstPath, "数据")
+    assert valueList[:3] == readValues(basePath, "数据")[:3]
+    assert valueList[3:] == [[3, "c", None, "2024-01-03 00:00:00", "保留"], [4, "d <&>", 40.25, None, None],
+                             [5, " 空格 ", True, "=C2*2", None]]
+    wb = openpyxl.load_workbook(dstPath)
+    assert wb["数据"]["A2"].font.b and not wb["数据"]["A5"].font.b
+    assert wb["其他"]["A1"].value == "不变"
+    assert 'ref="A1:E6"' in readSheetXml(dstPath, "数据")
+    df_read = pd.read_excel(dstPath, sheet_name="数据")
+    assert df_read.shape == (5, 5) and df_read["编号"].tolist() == [1, 2, 3, 4, 5]
+    # 追加的公式没有缓存值，打开时重新计算
+    with zipfile.ZipFile(dstPath) as zin:
+        assert 'fullCalcOnLoad="1"' in zin.read("xl/workbook.xml").decode("utf-8")
+
+
+# 修改sheet名称时同时修改定义的名称中的引用、docProps/app.xml中的sheet名称；无公式时不修改calcPr
+def test_appendRename(basePath, tmp_path):
+    dstPath = str(tmp_path / "结果.xlsx")
+    df_add = pd.DataFrame([[3, "c"]])
+    xlsx_util.appendSheetRows(basePath, dstPath, {"数据": (4, df_add)}, {"数据": "数据 (2024)", "其他": "其他"})
+
+    assert xlsx_util.getSheetNames(dstPath) == ["数据 (2024)", "其他"]
+    wb = openpyxl.load_workbook(dstPath)
+    assert wb["数据 (2024)"]["B4"].value == "c"
+    assert wb.defined_names["区域"].attr_text == "'数据 (2024)'!$A$1:$D$3"
+    assert wb.defined_names["引号区域"].attr_text == "'数据 (2024)'!$A$2"
+    assert pd.read_excel(dstPath, sheet_name="数据 (2024)").shape == (3, 5)
+    calcPrList = []
+    for path in [basePath, dstPath]:
+        with zipfile.ZipFile(path) as zin:
+            calcPrList.append(re.search(r"<calcPr\b[^>]*>", zin.read("xl/workbook.xml").decode("utf-8")).group(0))
+    assert calcPrList[0] == calcPrList[1]
+    with zipfile.ZipFile(dstPath) as zin:
+        assert "<vt:lpstr>数据</vt:lpstr>" not in zin.read("docProps/app.xml").decode("utf-8")
+
+
+# 空sheet（Excel保存为<sheetData/>）追加数据
+def test_appendEmptySheet(basePath, tmp_path):
+    with zipfile.ZipFile(basePath) as zin:
+        sheetXmlPath = xlsx_util.getSheetXmlPath(zin, "其他")
+    sheetData = re.search(r"<sheetData>.*</sheetData>", readSheetXml(basePath, "其他"), re.S).group(0)
+    replaceZipText(basePath, sheetXmlPath, sheetData, "<sheetData/>")
+    dstPath = str(tmp_path / "结果.xlsx")
+    xlsx_util.appendSheetRows(basePath, dstPath, {"其他": (2, pd.DataFrame([["x", 1.5], ["y", None]]))}, blockSize=16)
+    assert readValues(dstPath, "其他") == [[None, None], ["x", 1.5], ["y", None]]
+    df_read = pd.read_excel(dstPath, sheet_name="其他", header=None).iloc[1:]
+    assert df_read.astype(object).where(df_read.notna(), None).values.tolist() == [["x", 1.5], ["y", None]]
+
+
+# fullCalcOnLoad：已有calcPr时修改属性，没有时插入到definedNames（没有时为sheets）之后
+@pytest.mark.parametrize("workbookXml, expectXml", [
+    ('<workbook><sheets/><calcPr calcId="191029" fullCalcOnLoad="0"/></workbook>',
+     '<workbook><sheets/><calcPr calcId="191029" fullCalcOnLoad="1"/></workbook>'),
+    ('<workbook><sheets><sheet/></sheets><definedNames><definedName name="a">x!$A$1</definedName></definedNames>'
+     '</workbook>',
+     '<workbook><sheets><sheet/></sheets><definedNames><definedName name="a">x!$A$1</definedName></definedNames>'
+     '<calcPr fullCalcOnLoad="1"/></workbook>'),
+    ('<workbook><sheets><sheet/></sheets></workbook>',
+     '<workbook><sheets><sheet/></sheets><calcPr fullCalcOnLoad="1"/></workbook>'),
+])
+def test_fullCalcOnLoad(workbookXml, expectXml):
+    assert xlsx_util.updateWorkbookXml(workbookXml, {}, fullCalcFlag=True) == expectXml
+    assert xlsx_util.updateWorkbookXml(workbookXml, {}) == workbookXml
+
+
+# sheet xml中不存在的行（中间的空行、末尾之后的行、空sheet）按行号顺序插入
+def test_updateMissingRows(tmp_path):
+    srcPath, dstPath = str(tmp_path / "src.xlsx"), str(tmp_path / "dst.xlsx")
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "数据"
+    ws.append(["a", "b"])
+    ws.append([1, 2])
+    ws["A5"] = 5
+    wb.create_sheet("空表")
+    wb.save(srcPath)
+
+    xlsx_util.updateSheetCells(srcPath, dstPath, "数据", {3: {"B": "新增"}, 5: {"C": 6}, 8: {"A": "末尾"}})
+    assert readValues(dstPath, "数据") == [["a", "b", None], [1, 2, None], [None, "新增", None], [None, None, None],
+                                          [5, None, 6], [None, None, None], [None, None, None], ["末尾", None, None]]
+    assert 'ref="A1:C8"' in readSheetXml(dstPath, "数据")
+    assert pd.read_excel(dstPath, sheet_name="数据").shape == (7, 3)
+
+    xlsx_util.updateSheetCells(srcPath, dstPath, "空表", {2: {"B": 1.5}})
+    assert readValues(dstPath, "空表") == [[None, None], [None, 1.5]]
+    assert readValues(dstPath, "数据") == readValues(srcPath, "数据")
@@ -0,0 +1,471 @@
+# -*- coding: utf-8 -*-
+"""
+不依赖Excel的xlsx处理方法（直接修改xlsx压缩包中的sheet xml）：
+    updateSheetCells：修改指定sheet中的单元格值（不存在的行按行号插入），保留原有格式，其余文件内容不变
+    appendSheetRows：在指定sheet的末尾追加行（流式处理sheet xml，不读取原有行的数据），可同时修改sheet名称，其余文件内容不变
+    getSheetNames：获取xlsx中的sheet名称列表（只读取workbook.xml）
+    readFirstRows：只读方式流式读取sheet的前几行（不解析其余行）
+    writeStyledSheet：流式写入带格式（字体、数字格式、表头填充色、列宽、隐藏列、冻结窗格）的sheet，内存占用不随行数增加
+"""
+import codecs
+import posixpath
+import re
+import shutil
+import zipfile
+from copy import copy
+from datetime import date, datetime
+from xml.sax.saxutils import escape, unescape
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+rowPattern = re.compile(r'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+cellPattern = re.compile(r'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+cellRefPattern = re.compile(r'\br="([A-Z]+)(\d+)"')
+rowNumPattern = re.compile(r'\br="(\d+)"')
+styleAttrPattern = re.compile(r'\ss="\d+"')
+dimensionPattern = re.compile(r'<dimension\b[^>]*?\bref="([A-Z]*)(\d*)(?::([A-Z]+)(\d+))?"')
+numberTextPattern = r'^\s*[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?\s*$'
+dateTextPattern = r'^\d{4}[-/]\d{1,2}[-/]\d{1,2}(?: \d{1,2}:\d{2}(?::\d{2})?)?$'
+
+
+# 获取sheet名对应的xml文件路径
+def getSheetXmlPath(zin, sheetName):
+    """
+    :param zin: xlsx文件的ZipFile对象
+    :param sheetName: sheet名
+    :return: sheet的xml文件路径，如xl/worksheets/sheet1.xml
+    """
+    workbookXml = zin.read("xl/workbook.xml").decode("utf-8")
+    relsXml = zin.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+    for sheetTag in re.findall(r'<sheet\b[^>]*>', workbookXml):
+        name = re.search(r'\bname="([^"]*)"', sheetTag).group(1)
+        if name != escape(sheetName, {'"': "&quot;"}):
+            continue
+        relId = re.search(r'\br:id="([^"]*)"', sheetTag) or re.search(r'\bid="([^"]*)"', sheetTag)
+        for relTag in re.findall(r'<Relationship\b[^>]*>', relsXml):
+            if re.search(r'\bId="([^"]*)"', relTag).group(1) == relId.group(1):
+                target = re.search(r'\bTarget="([^"]*)"', relTag).group(1)
+                return target.lstrip("/") if target.startswith("/") else posixpath.normpath(
+                    posixpath.join("xl", target))
+    raise Exception(f"未找到sheet：{sheetName}")
+
+
+# 生成单元格xml
+def buildCellXml(cellRef, value, styleAttr=""):
+    """
+    :param cellRef: 单元格位置，如U2
+    :param value: 单元格值（None或""时为空单元格）
+    :param styleAttr: 单元格原有的格式属性，如 s="3"
+    :return: 单元格xml
+    """
+    if value is None or value == "":
+        return f'<c r="{cellRef}"{styleAttr}/>'
+    if isinstance(value, bool):
+        return f'<c r="{cellRef}"{styleAttr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{cellRef}"{styleAttr}><v>{repr(value)}</v></c>'
+    text = escape(str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{cellRef}"{styleAttr} t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+
+# 获取xlsx中的sheet名称列表（按sheet顺序）
+def getSheetNames(filePath):
+    with zipfile.ZipFile(filePath) as zin:
+        workbookXml = zin.read("xl/workbook.xml").decode("utf-8")
+    return [unescape(re.search(r'\bname="([^"]*)"', sheetTag).group(1), {"&quot;": '"'})
+            for sheetTag in re.findall(r'<sheet\b[^>]*>', workbookXml)]
+
+
+# 生成追加数据的单元格xml（以=开头的字符串为公式，nan等空值为空单元格，日期按文本写入）
+def buildAppendCellXml(cellRef, value, styleAttr=""):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return buildCellXml(cellRef, None, styleAttr)
+    if isinstance(value, str) and len(value) > 1 and value.startswith("="):
+        return f'<c r="{cellRef}"{styleAttr}><f>{escape(value[1:])}</f></c>'
+    if isinstance(value, (datetime, date)):
+        value = str(value)
+    return buildCellXml(cellRef, value, styleAttr)
+
+
+# 修改一行中的单元格
+def updateRowXml(rowXml, rowNum, colValueDict, cellFunc=buildCellXml):
+    """
+    :param rowXml: 行xml
+    :param rowNum: 行号
+    :param colValueDict: {列字母: 值}
+    :param cellFunc: 生成单元格xml的方法
+    :return: 修改后的行xml
+    """
+    if rowXml.endswith("/>"):
+        rowXml = rowXml[:-2] + "></row>"
+    rowStart = rowXml.index(">") + 1
+    rowEnd = rowXml.rindex("</row>")
+    cellList = []  # [(列序号, 单元格xml)]
+    for cellXml in cellPattern.findall(rowXml[rowStart:rowEnd]):
+        colLetter = cellRefPattern.search(cellXml).group(1)
+        cellList.append((column_index_from_string(colLetter), cellXml))
+    cellDict = dict(cellList)
+    for colLetter, value in colValueDict.items():
+        colIndex = column_index_from_string(colLetter)
+        styleMatch = styleAttrPattern.search(cellDict[colIndex].split(">")[0]) if colIndex in cellDict else None
+        cellDict[colIndex] = cellFunc(f"{colLetter}{rowNum}", value, styleMatch.group(0) if styleMatch else "")
+    cellXml = "".join([cellDict[colIndex] for colIndex in sorted(cellDict)])
+    return rowXml[:rowStart] + cellXml + rowXml[rowEnd:]
+
+
+# 逐块读取sheet xml，对每个完整的行调用rowFunc处理后写入输出流
+def streamSheetRows(src, dst, rowFunc, blockSize=1024 * 1024, textFunc=None):
+    """
+    :param src: sheet xml的输入流
+    :param dst: sheet xml的输出流
+    :param rowFunc: 行处理方法rowFunc(行号, 行xml)，返回处理后的行xml
+    :param blockSize: 每次读取的字节数
+    :param textFunc: 行以外的xml片段（行之前的表头部分、行之间、行之后的结尾部分，每个片段完整）的处理方法，为None时不处理
+    :return:
+    """
+    textFunc = textFunc or (lambda text: text)
+    buffer = ""
+    rowEndPattern = re.compile(r'</row>|<row\b[^>]*?/>')
+    # 分块读取时多字节字符可能被截断，使用增量解码
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        block = src.read(blockSize)
+        buffer += decoder.decode(block, final=not block)
+        # 处理缓冲区内所有完整的行
+        lastEnd = 0
+        outList = []
+        for endMatch in rowEndPattern.finditer(buffer):
+            rowStart = buffer.rfind("<row", lastEnd, endMatch.start() + 1)
+            if rowStart == -1:
+                continue
+            rowXml = buffer[rowStart:endMatch.end()]
+            if not rowPattern.fullmatch(rowXml):
+                continue
+            rowNum = int(rowNumPattern.search(rowXml[:rowXml.index(">") + 1]).group(1))
+            outList.append(textFunc(buffer[lastEnd:rowStart]) if rowStart > lastEnd else "")
+            outList.append(rowFunc(rowNum, rowXml))
+            lastEnd = endMatch.end()
+        dst.write("".join(outList).encode("utf-8"))
+        buffer = buffer[lastEnd:]
+        if not block:
+            dst.write(textFunc(buffer).encode("utf-8"))
+            break
+
+
+# 修改指定sheet中的单元格值（保留单元格原有格式，其余sheet及文件内容不变）
+def updateSheetCells(srcPath, dstPath, sheetName, cellValueDict):
+    """
+    :param srcPath: 原xlsx文件路径
+    :param dstPath: 结果xlsx文件路径
+    :param sheetName: 需要修改的sheet名
+    :param cellValueDict: {行号: {列字母: 值}}，值为None或""时清空单元格，sheet中不存在的行按行号顺序插入
+    :return: 结果xlsx文件路径
+    """
+    with zipfile.ZipFile(srcPath) as zin:
+        sheetXmlPath = getSheetXmlPath(zin, sheetName)
+        with zipfile.ZipFile(dstPath, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                outInfo = zipfile.ZipInfo(info.filename, info.date_time)
+                outInfo.compress_type = info.compress_type
+                outInfo.external_attr = info.external_attr
+                with zin.open(info) as src, zout.open(outInfo, "w") as dst:
+                    if info.filename != sheetXmlPath:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+                        continue
+                    rowFunc, textFunc = buildUpdateFuncs(cellValueDict)
+                    streamSheetRows(src, dst, rowFunc, textFunc=textFunc)
+    return dstPath
+
+
+# 扩大sheet xml表头部分中dimension的范围（使其包含指定的列数、行号）
+def extendDimension(text, colNum, rowNum):
+    """
+    :param text: 行之前的xml片段
+    :param colNum: 需包含的列数
+    :param rowNum: 需包含的最大行号
+    :return: 修改后的xml片段
+    """
+    def replaceDimension(matchObj):
+        startCol, startNum, endCol, endNum = matchObj.groups()
+        endCol, endNum = endCol or startCol or "A", int(endNum or startNum or 1)
+        endCol = get_column_letter(max(column_index_from_string(endCol), colNum))
+        newRef = f"{startCol or 'A'}{startNum or 1}:{endCol}{max(endNum, rowNum)}"
+        return matchObj.group(0)[:matchObj.start(1) - matchObj.start(0)] + newRef + '"'
+
+    return dimensionPattern.sub(replaceDimension, text, count=1)
+
+
+# 生成修改单元格的rowFunc、textFunc（sheet xml中不存在的行按行号顺序插入）
+def buildUpdateFuncs(cellValueDict):
+    """
+    :param cellValueDict: {行号: {列字母: 值}}
+    :return: (rowFunc, textFunc)，供streamSheetRows使用
+    """
+    rowNumList = sorted(cellValueDict)
+    state = {"下一行": 0}  # 下一个待检查是否需插入的行序号
+
+    # 插入行号小于rowNum且sheet xml中不存在的行
+    def flushRows(rowNum):
+        rowXmlList = []
+        while state["下一行"] < len(rowNumList) and rowNumList[state["下一行"]] < rowNum:
+            newRowNum = rowNumList[state["下一行"]]
+            rowXmlList.append(updateRowXml(f'<row r="{newRowNum}"/>', newRowNum, cellValueDict[newRowNum]))
+            state["下一行"] += 1
+        return "".join(rowXmlList)
+
+    def rowFunc(rowNum, rowXml):
+        before = flushRows(rowNum)
+        if rowNum in cellValueDict:
+            state["下一行"] += 1
+            rowXml = updateRowXml(rowXml, rowNum, cellValueDict[rowNum])
+        return before + rowXml
+
+    def textFunc(text):
+        if rowNumList and "<dimension" in text:
+            colNum = max([column_index_from_string(colLetter) for colDict in cellValueDict.values()
+                          for colLetter in colDict] or [1])
+            text = extendDimension(text, colNum, rowNumList[-1])
+        if "</sheetData>" in text:
+            text = text.replace("</sheetData>", flushRows(float("inf")) + "</sheetData>", 1)
+        elif "<sheetData/>" in text:
+            text = text.replace("<sheetData/>", "<sheetData>" + flushRows(float("inf")) + "</sheetData>", 1)
+        return text
+
+    return rowFunc, textFunc
+
+
+# 生成在sheet xml末尾追加行的rowFunc、textFunc（行号与原有行重复时合并到原有行，原有的其他单元格保留）
+def buildAppendFuncs(startRow, df):
+    """
+    :param startRow: 追加的第一行行号
+    :param df: 追加的数据（不含表头，从A列开始）
+    :return: (rowFunc, textFunc)，供streamSheetRows使用
+    """
+    letterList = [get_column_letter(i + 1) for i in range(df.shape[1])]
+    valueList = df.to_numpy(dtype=object).tolist()
+    endRow = startRow + len(valueList) - 1
+    state = {"下一行": 0}  # 下一个待写入的追加行序号
+
+    def buildRowXml(i):
+        rowNum = startRow + i
+        cellList = [buildAppendCellXml(f"{letter}{rowNum}", value) for letter, value in zip(letterList, valueList[i])]
+        return f'<row r="{rowNum}">' + "".join([cell for cell in cellList if not cell.endswith("/>")]) + "</row>"
+
+    # 写入行号小于rowNum的所有待写入的追加行
+    def flushRows(rowNum):
+        stop = min(max(rowNum - startRow, 0), len(valueList))
+        rowXml = "".join([buildRowXml(i) for i in range(state["下一行"], stop)])
+        state["下一行"] = max(state["下一行"], stop)
+        return rowXml
+
+    def rowFunc(rowNum, rowXml):
+        if rowNum < startRow:
+            return rowXml
+        before = flushRows(rowNum)
+        if rowNum <= endRow:
+            i = rowNum - startRow
+            state["下一行"] = i + 1
+            rowXml = updateRowXml(rowXml, rowNum, dict(zip(letterList, valueList[i])), buildAppendCellXml)
+        return before + rowXml
+
+    def textFunc(text):
+        if valueList and "<dimension" in text:
+            text = extendDimension(text, len(letterList), endRow)
+        if "</sheetData>" in text:
+            text = text.replace("</sheetData>", flushRows(endRow + 1) + "</sheetData>", 1)
+        elif "<sheetData/>" in text:
+            text = text.replace("<sheetData/>", "<sheetData>" + flushRows(endRow + 1) + "</sheetData>", 1)
+        return text
+
+    return rowFunc, textFunc
+
+
+# 修改workbook.xml中的sheet名称（包括定义的名称中对sheet的引用），需要时设置打开时重新计算公式
+def updateWorkbookXml(workbookXml, renameDict, fullCalcFlag=False):
+    """
+    :param workbookXml: workbook.xml内容
+    :param renameDict: {原sheet名: 新sheet名}
+    :param fullCalcFlag: 是否设置打开时重新计算全部公式（追加的公式没有缓存值）
+    :return: 修改后的workbook.xml内容
+    """
+    for oldName, newName in renameDict.items():
+        oldAttr, newAttr = escape(oldName, {'"': "&quot;"}), escape(newName, {'"': "&quot;"})
+        workbookXml = re.sub(r'(<sheet\b[^>]*?\bname=")' + re.escape(oldAttr) + '"',
+                             lambda m: m.group(1) + newAttr + '"', workbookXml, count=1)
+        newRef = escape("'" + newName.replace("'", "''") + "'!")
+        for oldRef in [escape("'" + oldName.replace("'", "''") + "'!"), escape(oldName + "!")]:
+            workbookXml = re.sub(r'(<definedName\b[^>]*>)([^<]*)', lambda m: m.group(1) + m.group(2).replace(oldRef, newRef),
+                                 workbookXml)
+    if fullCalcFlag:
+        if "<calcPr" in workbookXml:
+            workbookXml = re.sub(r'<calcPr\b([^>]*?)\s*(/?)>', lambda m: "<calcPr" + re.sub(
+                r'\sfullCalcOnLoad="[^"]*"', "", m.group(1)) + ' fullCalcOnLoad="1"' + m.group(2) + ">", workbookXml, count=1)
+        else:
+            # calcPr位于definedNames之后（没有时位于sheets之后）
+            tag = max(["</sheets>", "</externalReferences>", "</definedNames>"], key=workbookXml.rfind)
+            workbookXml = workbookXml.replace(tag, tag + '<calcPr fullCalcOnLoad="1"/>', 1)
+    return workbookXml
+
+
+# 在指定sheet的末尾追加行（不读取原有行的数据，不修改原有格式），可同时修改sheet名称，其余文件内容不变
+def appendSheetRows(srcPath, dstPath, appendDict, renameDict=None, blockSize=1024 * 1024):
+    """
+    :param srcPath: 原xlsx文件路径
+    :param dstPath: 结果xlsx文件路径（不能与原文件相同）
+    :param appendDict: {sheet名: (追加的第一行行号, 追加的数据df)}，df不写入表头，从A列开始写入
+    :param renameDict: {原sheet名: 新sheet名}
+    :param blockSize: 每次读取sheet xml的字节数
+    :return: 结果xlsx文件路径
+    """
+    renameDict = {oldName: newName for oldName, newName in (renameDict or {}).items() if oldName != newName}
+    # 追加的公式没有缓存值，需要打开时重新计算
+    fullCalcFlag = any(df.applymap(lambda x: isinstance(x, str) and x.startswith("=")).to_numpy().any()
+                       for _, df in appendDict.values() if not df.empty)
+    with zipfile.ZipFile(srcPath) as zin:
+        sheetXmlDict = {getSheetXmlPath(zin, sheetName): value for sheetName, value in appendDict.items()}
+        with zipfile.ZipFile(dstPath, "w", zipfile.ZIP_DEFLATED) as zout:
+            for info in zin.infolist():
+                outInfo = zipfile.ZipInfo(info.filename, info.date_time)
+                outInfo.compress_type = info.compress_type
+                outInfo.external_attr = info.external_attr
+                with zin.open(info) as src, zout.open(outInfo, "w") as dst:
+                    if info.filename in sheetXmlDict:
+                        rowFunc, textFunc = buildAppendFuncs(*sheetXmlDict[info.filename])
+                        streamSheetRows(src, dst, rowFunc, blockSize, textFunc)
+                    elif info.filename == "xl/workbook.xml" and (renameDict or fullCalcFlag):
+                        dst.write(updateWorkbookXml(src.read().decode("utf-8"), renameDict, fullCalcFlag).encode("utf-8"))
+                    elif info.filename == "docProps/app.xml" and renameDict:
+                        appXml = src.read().decode("utf-8")
+                        for oldName, newName in renameDict.items():
+                            appXml = appXml.replace(f"<vt:lpstr>{escape(oldName)}</vt:lpstr>",
+                                                    f"<vt:lpstr>{escape(newName)}</vt:lpstr>")
+                        dst.write(appXml.encode("utf-8"))
+                    else:
+                        shutil.copyfileobj(src, dst, 1024 * 1024)
+    return dstPath
+
+
+# 只读方式流式读取sheet的前几行（用于校验表头、文件内容等，不解析其余行）
+def readFirstRows(filePath, rowNum, sheetName=None):
+    """
+    :param filePath: xlsx文件路径
+    :param rowNum: 读取的行数
+    :param sheetName: sheet名，为None时读取第一个sheet
+    :return: 各行的值列表[(第1列值, 第2列值, ...)]，空单元格为None
+    """
+    wb = openpyxl.load_workbook(filePath, read_only=True, data_only=True)
+    try:
+        ws = wb[sheetName] if sheetName is not None else wb.worksheets[0]
+        return [tuple(row) for row in ws.iter_rows(min_row=1, max_row=rowNum, values_only=True)]
+    finally:
+        wb.close()
+
+
+# 将文本形式的数字、日期转为数值、日期（同Excel中将单元格值重新粘贴到常规格式的单元格），空值转为None
+def convertTextValues(se):
+    """
+    :param se: 列数据Series
+    :return: 转换后的值数组（object）
+    """
+    values = se.astype(object).where(se.notna(), None).values
+    strMask = pd.Series([isinstance(i, str) for i in values], dtype=bool).values
+    if not strMask.any():
+        return values
+    text = pd.Series(values[strMask], dtype=object)
+    numMask = text.str.match(numberTextPattern).values
+    dateMask = text.str.match(dateTextPattern).values
+    textValues = text.values.copy()
+    if numMask.any():
+        textValues[numMask] = pd.to_numeric(text[numMask]).astype(object).values
+    if dateMask.any():
+        dateSe = pd.to_datetime(text[dateMask], errors="coerce")
+        dateValues = textValues[dateMask]
+        validMask = dateSe.notna().values
+        dateValues[validMask] = list(dateSe[validMask].dt.to_pydatetime())
+        textValues[dateMask] = dateValues
+    values = values.copy()
+    values[strMask] = textValues
+    return values
+
+
+# 生成带格式的模板单元格
+def buildStyleCell(ws, styleDict):
+    """
+    :param ws: 流式写入的worksheet
+    :param styleDict: 格式字典{"font": Font, "fill": PatternFill, "border": Border, "alignment": Alignment, "number_format": 格式}
+    :return: 模板单元格
+    """
+    cell = WriteOnlyCell(ws)
+    for key, value in styleDict.items():
+        setattr(cell, key, value)
+    return cell
+
+
+# 流式写入带格式的sheet（同一列的内容单元格使用相同格式，整列格式同时写入列属性）
+def writeStyledSheet(df, filePath, sheetName, colStyleDict=None, headerStyleDict=None, widthDict=None,
+                     hiddenColList=None, freezeCell=None, convertColList=None, dateFormat="yyyy/m/d h:mm"):
+    """
+    :param df: 需要写入的数据
+    :param filePath: xlsx文件路径
+    :param sheetName: sheet名
+    :param colStyleDict: 内容单元格及整列的格式{列名: 格式字典}，格式字典同buildStyleCell
+    :param headerStyleDict: 表头单元格的格式{列名: 格式字典}
+    :param widthDict: 列宽{列名: 列宽}
+    :param hiddenColList: 隐藏的列名列表
+    :param freezeCell: 冻结窗格的位置，如A2（冻结首行）
+    :param convertColList: 需要将文本形式的数字、日期转为数值、日期的列名列表
+    :param dateFormat: 常规格式的列中转换得到的日期使用的格式
+    :return: xlsx文件路径
+    """
+    colStyleDict, headerStyleDict, widthDict = colStyleDict or {}, headerStyleDict or {}, widthDict or {}
+    hiddenColList, convertColList = hiddenColList or [], convertColList or []
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(sheetName)
+    columns = list(df.columns)
+
+    # 整列格式、列宽、隐藏列
+    for i, col in enumerate(columns):
+        dimension = ws.column_dimensions[get_column_letter(i + 1)]
+        for key, value in colStyleDict.get(col, {}).items():
+            setattr(dimension, key, value)
+        if col in widthDict:
+            dimension.width = widthDict[col]
+        if col in hiddenColList:
+            dimension.hidden = True
+    if freezeCell:
+        ws.freeze_panes = freezeCell
+
+    # 表头
+    headerRow = []
+    for col in columns:
+        cell = buildStyleCell(ws, headerStyleDict.get(col, {}))
+        cell.value = str(col)
+        headerRow.append(cell)
+    ws.append(headerRow)
+
+    # 每列的模板单元格（常规格式的列中的日期单独使用日期格式），写入时复制模板的格式
+    templateList, dateTemplateList = [], []
+    for col in columns:
+        styleDict = colStyleDict.get(col, {})
+        templateList.append(buildStyleCell(ws, styleDict)._style)
+        if styleDict.get("number_format", "General") == "General":
+            styleDict = dict(styleDict, number_format=dateFormat)
+        dateTemplateList.append(buildStyleCell(ws, styleDict)._style)
+    valueList = [convertTextValues(df[col]) if col in convertColList else
+                 df[col].astype(object).where(df[col].notna(), None).values for col in columns]
+    for row in zip(*valueList):
+        cellList = []
+        for value, style, dateStyle in zip(row, templateList, dateTemplateList):
+            cell = WriteOnlyCell(ws, value)
+            cell._style = copy(dateStyle if isinstance(value, datetime) else style)
+            cellList.append(cell)
+        ws.append(cellList)
+    wb.save(filePath)
+    return filePath